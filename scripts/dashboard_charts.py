@@ -0,0 +1,188 @@
+import io
+import numpy as np
+import seaborn as sns
+import matplotlib.pyplot as plt
+import streamlit as st
+from matplotlib.colors import LogNorm
+
+# =====================================================================================
+# Module: Chart rendering of the Streamlit dashboard
+# Date: October 2026
+#
+# Description:
+# Draws the dashboard charts from the aggregate tables and renders them to PNG
+# images. The images are cached by Streamlit, keyed on the chart and the content of
+# its tables, which change exactly when the data version, the filters or the backend
+# change. Reruns with the same state only send the cached image.
+#
+# Every figure is closed right after rendering, so matplotlib does not keep one
+# figure per chart and rerun in memory.
+#
+# Large data: both size-dependent charts draw pre-aggregated data with a fixed cost:
+# - duration vs. funding: a 2-D histogram of all points instead of a scatter plot
+#   once there are more points than the scatter sample holds
+# - citation distribution: a KDE computed from the histogram bins (binned KDE)
+# =====================================================================================
+
+RENDER_DPI = 150
+
+# Number of points the binned KDE curve is evaluated at
+KDE_POINTS = 200
+
+
+def binned_kde(centers, counts, width, points=KDE_POINTS):
+    """
+    Gaussian KDE of a histogram: each bin center is a kernel weighted by its count,
+    with Scott's bandwidth, but at least one bin wide (finer detail is lost in the
+    bins). Returns (x, y) scaled to counts per bin, or None if the bins hold no
+    spread. The cost depends on the number of bins only.
+    """
+    centers = np.asarray(centers, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if total <= 1:
+        return None
+    mean = np.average(centers, weights=counts)
+    std = np.sqrt(np.average((centers - mean) ** 2, weights=counts))
+    if std == 0:
+        return None
+    bandwidth = max(std * total ** (-1 / 5), width)
+    x = np.linspace(centers[0] - width / 2, centers[-1] + width / 2, points)
+    kernels = np.exp(-0.5 * ((x[:, None] - centers[None, :]) / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+    return x, kernels @ counts * width
+
+
+# -------------------------------------------------------------------------------------
+# Charts (one draw function per chart)
+# -------------------------------------------------------------------------------------
+
+def draw_projects_per_year(ax, projects_by_year):
+    sns.lineplot(x='startYear', y='projects', data=projects_by_year, marker='o', ax=ax)
+    ax.set_title('Projects per Year')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('Number of Projects')
+
+def draw_avg_funding_per_year(ax, avg_funding_by_year):
+    sns.lineplot(x='startYear', y='fundedAmount', data=avg_funding_by_year, marker='o', color='red', ax=ax)
+    ax.set_title('Average Funding Amount per Year')
+    ax.set_xlabel('Year')
+    ax.set_ylabel('€')
+
+def draw_top_countries(ax, country_counts):
+    sns.barplot(x='projects', y='country', data=country_counts, color='skyblue', ax=ax)
+    ax.set_title('Top 15 Countries by Number of Projects')
+    ax.set_xlabel('Projects')
+    ax.set_ylabel('Country')
+
+def draw_top_funders_by_count(ax, funder_counts):
+    sns.barplot(x='projects', y='funder_name', data=funder_counts, color='lightgreen', ax=ax)
+    ax.set_title('Top Funders by Project Count')
+    ax.set_xlabel('Projects')
+    ax.set_ylabel('Funder')
+
+def draw_top_funders_by_total(ax, sum_by_funder):
+    sns.barplot(x='fundedAmount', y='funder_name', data=sum_by_funder, color='teal', ax=ax)
+    ax.set_title('Top Funders by Total Funding (€)')
+    ax.set_xlabel('Total (€)')
+    ax.set_ylabel('Funder')
+
+def draw_top_funders_by_average(ax, avg_by_funder):
+    sns.barplot(x='fundedAmount', y='funder_name', data=avg_by_funder, color='steelblue', ax=ax)
+    ax.set_title('Top Funders by Average Funding (€)')
+    ax.set_xlabel('Average (€)')
+    ax.set_ylabel('Funder')
+
+def draw_duration_vs_funding(ax, valid_projects, grid):
+    if grid['count'].sum() > len(valid_projects):
+        # The scatter data is only a sample: show the density of all points instead
+        x_width = (grid['duration_right'] - grid['duration_left']).iloc[0]
+        y_width = (grid['funding_right'] - grid['funding_left']).iloc[0]
+        x_edges = np.arange(grid['duration_left'].min(), grid['duration_right'].max() + x_width / 2, x_width)
+        y_edges = np.arange(grid['funding_left'].min(), grid['funding_right'].max() + y_width / 2, y_width)
+        *_, cells = ax.hist2d(x=grid['duration_left'] + x_width / 2, y=grid['funding_left'] + y_width / 2,
+                              weights=grid['count'], bins=[x_edges, y_edges], cmin=1, norm=LogNorm(), cmap='viridis')
+        ax.figure.colorbar(cells, ax=ax, label='Projects')
+    else:
+        sns.scatterplot(data=valid_projects, x='project_duration_days', y='fundedAmount', alpha=0.5, ax=ax)
+    ax.set_title('Project Duration vs. Funding Amount')
+    ax.set_xlabel('Duration (days)')
+    ax.set_ylabel('Funding (€)')
+
+def draw_top_projects_by_publications(ax, top_pub_projects):
+    sns.barplot(x='pub_count', y='title', data=top_pub_projects, color='seagreen', ax=ax)
+    ax.set_title('Top Projects by Number of Publications')
+    ax.set_xlabel('Publications')
+    ax.set_ylabel('Project Title')
+
+def draw_top_cited_publications(ax, top_cited_pubs):
+    sns.barplot(x='citation_count', y='title', data=top_cited_pubs, color='darkred', ax=ax)
+    ax.set_title('Most Cited Publications')
+    ax.set_xlabel('Citations')
+    ax.set_ylabel('Publication Title')
+
+def draw_top_journals(ax, journal_counts):
+    sns.barplot(x='publications', y='journal', data=journal_counts, color='orchid', ax=ax)
+    ax.set_title('Top Journals by Publication Count')
+    ax.set_xlabel('Publications')
+    ax.set_ylabel('Journal')
+
+def draw_citation_distribution(ax, citation_bins):
+    if not citation_bins.empty:
+        # The histogram is precomputed: draw the bins weighted by their counts
+        edges = list(citation_bins['bin_left']) + [citation_bins['bin_right'].iloc[-1]]
+        centers = (citation_bins['bin_left'] + citation_bins['bin_right']) / 2
+        sns.histplot(x=centers, weights=citation_bins['count'], bins=edges, color='brown', ax=ax)
+        kde = binned_kde(centers, citation_bins['count'], edges[1] - edges[0])
+        if kde is not None:
+            ax.plot(*kde, color='brown')
+    ax.set_title('Distribution of Citation Counts')
+    ax.set_xlabel('Citations')
+    ax.set_ylabel('Frequency')
+
+def draw_top_projects_by_avg_citations(ax, citation_avg):
+    sns.barplot(x='citation_count', y='title', data=citation_avg, color='darkgreen', ax=ax)
+    ax.set_title('Top Projects by Average Citation Count')
+    ax.set_xlabel('Average Citations')
+    ax.set_ylabel('Project Title')
+
+# Chart name -> (figure size, draw function, aggregate tables passed to it)
+CHARTS = {
+    'projects_per_year': ((10, 4), draw_projects_per_year, ['projects_per_year']),
+    'avg_funding_per_year': ((10, 4), draw_avg_funding_per_year, ['avg_funding_per_year']),
+    'top_countries': ((8, 5), draw_top_countries, ['top_countries']),
+    'top_funders_by_count': ((8, 5), draw_top_funders_by_count, ['top_funders_by_count']),
+    'top_funders_by_total': ((8, 5), draw_top_funders_by_total, ['top_funders_by_total']),
+    'top_funders_by_average': ((8, 5), draw_top_funders_by_average, ['top_funders_by_average']),
+    'duration_vs_funding': ((8, 5), draw_duration_vs_funding, ['duration_vs_funding', 'duration_funding_grid']),
+    'top_projects_by_publications': ((10, 6), draw_top_projects_by_publications, ['top_projects_by_publications']),
+    'top_cited_publications': ((10, 6), draw_top_cited_publications, ['top_cited_publications']),
+    'top_journals': ((10, 6), draw_top_journals, ['top_journals']),
+    'citation_distribution': ((10, 6), draw_citation_distribution, ['citation_distribution']),
+    'top_projects_by_avg_citations': ((10, 6), draw_top_projects_by_avg_citations, ['top_projects_by_avg_citations']),
+}
+
+
+# -------------------------------------------------------------------------------------
+# Rendering
+# -------------------------------------------------------------------------------------
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def render_chart(name, *tables):
+    """Draws one chart from its aggregate tables and returns it as PNG bytes."""
+    figsize, draw, _ = CHARTS[name]
+    fig, ax = plt.subplots(figsize=figsize)
+    try:
+        draw(ax, *tables)
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format='png', dpi=RENDER_DPI, bbox_inches='tight')
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()
+
+def show_chart(name, load_aggregate):
+    """
+    Shows one chart. load_aggregate(table name) returns the aggregate tables of
+    the current view; only the tables of this chart are requested.
+    """
+    _, _, tables = CHARTS[name]
+    st.image(render_chart(name, *[load_aggregate(table) for table in tables]), use_container_width=True)
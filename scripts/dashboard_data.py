@@ -0,0 +1,183 @@
+import os
+import sys
+import streamlit as st
+
+# Shared helpers of the pipeline (scripts/kg_pipeline)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'kg_pipeline'))
+from dashboard_aggregates import AGGREGATES, AGGREGATES_JSON, data_version, file_signature, load_frames, read_aggregates
+from dashboard_graph import open_graph_backend
+from instrumentation import instrumented_run
+from search_index import SEARCH_INDEX_FILE, search_projects as _search_index
+try:
+    import dashboard_sql
+except ImportError:
+    # DuckDB is not installed: the dashboard works without the filters
+    dashboard_sql = None
+
+# =====================================================================================
+# Module: Data access layer of the Streamlit dashboard
+# Date: October 2026
+#
+# Description:
+# Streamlit reruns dashboard.py on every widget interaction and page load. This module
+# keeps the dashboard data in Streamlit's cache, keyed on the (path, mtime, size)
+# signature of every source file, so it is reloaded automatically as soon as the
+# pipeline rewrites a CSV. The loaded frames (only the needed columns, compact dtypes)
+# exist once per process and are shared read-only by all sessions.
+#
+# The charts are drawn from the aggregates written by 06_build_dashboard_aggregates.py.
+# Only if that artefact is missing or stale are the CSVs loaded and aggregated live.
+#
+# Every aggregate is loaded on its own (load_aggregate) and memoised per data version,
+# so a dashboard section only pays for the aggregates of the charts it shows.
+#
+# Filtered views are answered by SQL queries on the DuckDB file of dashboard_sql.py.
+# One read-only connection is shared by all sessions (st.cache_resource) and every
+# query runs on its own cursor; the small results are cached per filter combination.
+#
+# With DASHBOARD_BACKEND = "neo4j" the charts are answered by aggregation queries on
+# the live Knowledge Graph instead (see dashboard_graph.py). One driver, and so one
+# connection pool, is shared by all sessions; each result is reused for GRAPH_CACHE_TTL.
+#
+# Project search uses the full-text index of search_index.py; results are cached per
+# query until the index file changes.
+# =====================================================================================
+
+# Data source of the charts: "csv" (pipeline CSVs) or "neo4j" (live Knowledge Graph)
+DASHBOARD_BACKEND = os.environ.get('KG_DASHBOARD_BACKEND', 'csv')
+
+# Seconds a graph query result is reused before the graph is asked again
+GRAPH_CACHE_TTL = 300
+
+
+@st.cache_resource(show_spinner="Loading pipeline data...", max_entries=1)
+def _load_dashboard_data(version):
+    # 'version' is only used as cache key: a new signature means new data.
+    # cache_resource hands every session the same frames instead of a copy each.
+    # Every load writes a run report (see instrumentation.py).
+    with instrumented_run('dashboard_load_frames'):
+        return load_frames()
+
+def load_dashboard_data():
+    """
+    Returns the preprocessed dashboard data as a dict of frames and maps.
+    Cached across reruns and sessions until one of the source files changes.
+    The frames are shared by all sessions: treat them as read-only.
+    """
+    return _load_dashboard_data(data_version())
+
+
+@st.cache_data(show_spinner="Loading dashboard aggregates...", max_entries=2)
+def _read_aggregates(version, artefact_signature):
+    # The artefact is small, so it is read as a whole; None if missing or stale
+    return read_aggregates(sources=version)
+
+@st.cache_data(show_spinner="Computing aggregate...", max_entries=64)
+def _compute_aggregate(version, name):
+    return AGGREGATES[name](_load_dashboard_data(version))
+
+def aggregates_precomputed():
+    """Whether the materialised aggregates match the current source files."""
+    return _read_aggregates(data_version(), file_signature(AGGREGATES_JSON)) is not None
+
+def load_dashboard_aggregate(name):
+    """
+    Returns one aggregate table of the unfiltered dashboard: from the artefact
+    if it is fresh, else computed live from the cached CSV data.
+    """
+    version = data_version()
+    aggregates = _read_aggregates(version, file_signature(AGGREGATES_JSON))
+    if aggregates is not None:
+        return aggregates[name]
+    return _compute_aggregate(version, name)
+
+
+# -------------------------------------------------------------------------------------
+# Filtered aggregates (DuckDB)
+# -------------------------------------------------------------------------------------
+
+def filters_available():
+    return dashboard_sql is not None
+
+def filters_active(filters):
+    return filters_available() and dashboard_sql.filters_active(filters)
+
+@st.cache_resource(show_spinner="Preparing the query database...", max_entries=1)
+def _query_connection(version):
+    # A new version evicts the old connection; connect() rebuilds a stale file
+    return dashboard_sql.connect()
+
+@st.cache_data(max_entries=2)
+def _load_filter_options(version):
+    return dashboard_sql.filter_options(_query_connection(version).cursor())
+
+def load_filter_options():
+    """Returns the year range, funders, countries and maximum funding to filter by."""
+    return _load_filter_options(data_version())
+
+@st.cache_data(show_spinner="Filtering...", max_entries=256)
+def _load_filtered_aggregate(version, name, filters):
+    return dashboard_sql.query_aggregate(_query_connection(version).cursor(), name, filters)
+
+def load_filtered_aggregate(name, filters):
+    """
+    Returns one aggregate table for the projects passing the filters
+    (same columns as load_dashboard_aggregate()).
+    """
+    return _load_filtered_aggregate(data_version(), name, filters)
+
+
+# -------------------------------------------------------------------------------------
+# Live Knowledge Graph (Neo4j)
+# -------------------------------------------------------------------------------------
+
+def graph_backend_enabled():
+    return DASHBOARD_BACKEND == 'neo4j'
+
+@st.cache_resource(show_spinner="Connecting to Neo4j...")
+def _graph_backend():
+    return open_graph_backend('neo4j')
+
+@st.cache_data(show_spinner="Querying the Knowledge Graph...", ttl=GRAPH_CACHE_TTL)
+def load_graph_aggregate(name):
+    """
+    Returns one aggregate table computed by the graph database
+    (same columns as load_dashboard_aggregate()).
+    """
+    return _graph_backend().aggregate(name)
+
+def refresh_graph_aggregates():
+    """Drops the cached graph results, so the next run queries the graph again."""
+    load_graph_aggregate.clear()
+
+
+# -------------------------------------------------------------------------------------
+# Aggregates of the current view
+# -------------------------------------------------------------------------------------
+
+def load_aggregate(name, filters=None):
+    """
+    Returns one aggregate table from the configured backend: the live graph,
+    DuckDB if filters are active, else the (materialised) CSV aggregates.
+    """
+    if graph_backend_enabled():
+        return load_graph_aggregate(name)
+    if filters and filters_active(filters):
+        return load_filtered_aggregate(name, filters)
+    return load_dashboard_aggregate(name)
+
+
+# -------------------------------------------------------------------------------------
+# Project search (full-text index)
+# -------------------------------------------------------------------------------------
+
+def search_available():
+    return os.path.exists(SEARCH_INDEX_FILE)
+
+@st.cache_data(show_spinner="Searching...", max_entries=256)
+def _search_projects(index_signature, query, limit):
+    return _search_index(query, limit)
+
+def search_projects(query, limit=50):
+    """Returns the best matching projects for the query (see search_index.search_projects)."""
+    return _search_projects(file_signature(SEARCH_INDEX_FILE), query, limit)
@@ -1,7 +1,12 @@
 import json
 import os
-import csv
 from tqdm import tqdm  # For displaying a progress bar during file processing
+from instrumentation import instrumented_run, span
+from keywords import KEYWORDS_CSV, PROJECT_KEYWORD_REL_CSV, KeywordDictionary
+from pipeline_tables import PipelineTables
+from sampling import update_sample
+from search_index import SEARCH_INDEX_FILE, SearchIndexUpdate
+from surrogate_keys import KeyDictionary
 
 # =====================================================================================
 # Script: JSON to CSV Converter for Project Data
@@ -13,137 +18,183 @@ from tqdm import tqdm  # For displaying a progress bar during file processing
 # into structured CSV files for further analysis or integration. It extracts project
 # metadata, funders, countries, and their relationships, then writes them into
 # separate CSV files.
+# Projects, funders and countries get dense integer keys (first column "key" of their
+# CSV), and the relation CSVs only hold key pairs (see surrogate_keys.py).
+# The raw keyword string of every project is split into normalised keywords, which are
+# written as a keyword dictionary (keywords.csv) and project-keyword key pairs
+# (project_keyword_rel.csv), see keywords.py.
+# Finally, it writes the project sample manifest used by the later stages (see sampling.py).
+# While collecting the projects, it also updates the full-text search index over
+# project titles, summaries and keywords (see search_index.py).
+#
+# The tables are handed on through PipelineTables (see pipeline_tables.py): run on its
+# own, this script writes all of them as CSV files; run by run_pipeline.py, the later
+# stages get them in memory.
+# Every run writes a timing report (see instrumentation.py).
 #
 # NOTE:
 # - Input files must not be compressed (e.g., zipped). Unzip locally before use.
 # =====================================================================================
 
 # Directories for input (cleaned JSON) and output (CSV files)
-original_data_dir = "data\\cleaned_projects_data_april2025"
-output_dir = "data\\projects_data_csv"
+original_data_dir = "data/cleaned_projects_data_april2025"
+output_dir = "data/projects_data_csv"
+
+# Output tables
+PROJECTS_CSV = os.path.join(output_dir, 'projects.csv')
+FUNDERS_CSV = os.path.join(output_dir, 'funders.csv')
+COUNTRIES_CSV = os.path.join(output_dir, 'countries.csv')
+PROJECT_FUNDER_REL_CSV = os.path.join(output_dir, 'project_funder_rel.csv')
+PROJECT_COUNTRY_REL_CSV = os.path.join(output_dir, 'project_country_rel.csv')
+
+PROJECT_COLUMNS = [
+    'key', 'id', 'code', 'title', 'startDate', 'endDate', 'callIdentifier',
+    'keywords', 'summary', 'totalCost', 'fundedAmount'
+]
 
 # Safe extraction function: returns an empty string for None values
 def safe(value):
     return value if value is not None else ""
 
-# Collect all JSON files in the input directory
-json_files = [f for f in os.listdir(original_data_dir) if f.endswith('.json')]
-
-# Data containers for CSV output
-projects = []
-funders = {}
-countries = {}
-project_funder_rel = []
-project_country_rel = []
-
-# Prepare output CSV files
-projects_csv = open(os.path.join(output_dir, 'projects.csv'), 'w', newline='', encoding='utf-8')
-funders_csv = open(os.path.join(output_dir, 'funders.csv'), 'w', newline='', encoding='utf-8')
-countries_csv = open(os.path.join(output_dir, 'countries.csv'), 'w', newline='', encoding='utf-8')
-project_funder_rel_csv = open(os.path.join(output_dir, 'project_funder_rel.csv'), 'w', newline='', encoding='utf-8')
-project_country_rel_csv = open(os.path.join(output_dir, 'project_country_rel.csv'), 'w', newline='', encoding='utf-8')
-
-# Initialize CSV writers
-projects_writer = csv.writer(projects_csv)
-funders_writer = csv.writer(funders_csv)
-countries_writer = csv.writer(countries_csv)
-project_funder_writer = csv.writer(project_funder_rel_csv)
-project_country_writer = csv.writer(project_country_rel_csv)
-
-# Write CSV headers
-projects_writer.writerow([
-    'id', 'code', 'title', 'startDate', 'endDate', 'callIdentifier',
-    'keywords', 'summary', 'totalCost', 'fundedAmount'
-])
-funders_writer.writerow(['name', 'shortName'])
-countries_writer.writerow(['jurisdiction'])
-project_funder_writer.writerow(['project_id', 'funder_name'])
-project_country_writer.writerow(['project_id', 'country'])
-
-# Process each JSON file with progress bar
-for idx, file in enumerate(tqdm(json_files, desc="Processing JSON files", unit="file")):
-    file_path = os.path.join(original_data_dir, file)
-
-    try:
-        # Load JSON data
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-    except json.JSONDecodeError as e:
-        print(f"Error loading file {file}: {e}")
-        continue
-
-    # Validate that data is a list of projects
-    if isinstance(data, list):
-        project_data_list = data
+def extract_projects(tables, data_dir=original_data_dir):
+    """
+    Extracts the project, funder, country and keyword tables from the cleaned
+    JSON files of data_dir and hands them on via tables. Also updates the search
+    index and the sample manifest.
+    """
+    import pandas as pd
+
+    # Collect all JSON files in the input directory
+    json_files = [f for f in os.listdir(data_dir) if f.endswith('.json')]
+
+    # Data containers for the output tables
+    projects = []
+    funders = {}
+    project_funder_rel = []   # (project_key, funder_key) pairs
+    project_country_rel = []  # (project_key, country_key) pairs
+    project_keyword_rel = []  # (project_key, keyword_key) pairs
+    project_start_dates = []  # (project_id, startDate) pairs for the sample selection
+    duplicate_projects = 0    # Records of projects already seen in an earlier file
+
+    # Integer surrogate keys of projects, funders, countries and keywords
+    project_keys = KeyDictionary()
+    funder_keys = KeyDictionary()
+    country_keys = KeyDictionary()
+    keyword_dictionary = KeywordDictionary()
+
+    # Incremental update of the full-text search index (unchanged projects are skipped)
+    search_index = SearchIndexUpdate()
+
+    # Process each JSON file with progress bar
+    for idx, file in enumerate(tqdm(json_files, desc="Processing JSON files", unit="file")):
+        file_path = os.path.join(data_dir, file)
+
+        try:
+            # Load JSON data
+            with span('decode'), open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError as e:
+            print(f"Error loading file {file}: {e}")
+            continue
+
+        # Validate that data is a list of projects
+        if isinstance(data, list):
+            project_data_list = data
+        else:
+            print(f"File {file} does not contain a list of projects.")
+            continue
+
+        # Process each project in the JSON file
+        with span('transform'):
+            for project_data in project_data_list:
+                pid = safe(project_data.get("id"))
+                # A project can be in several input files: keep its first record only
+                if pid in project_keys:
+                    duplicate_projects += 1
+                    continue
+                code = safe(project_data.get("code"))
+                title = safe(project_data.get("title"))
+                start_date = safe(project_data.get("startDate"))
+                end_date = safe(project_data.get("endDate"))
+                call_identifier = safe(project_data.get("callIdentifier"))
+                keywords = safe(project_data.get("keywords"))
+                summary = safe(project_data.get("summary"))
+
+                # Extract financial information
+                granted_data = project_data.get("granted") or {}
+                total_cost = safe(granted_data.get("totalCost"))
+                funded_amount = safe(granted_data.get("fundedAmount"))
+
+                # Collect the project record
+                project_key = project_keys.key(pid)
+                projects.append([
+                    project_key, pid, code, title, start_date, end_date,
+                    call_identifier, keywords, summary,
+                    total_cost, funded_amount
+                ])
+                project_start_dates.append((pid, start_date))
+                search_index.add(pid, title, summary, keywords)
+
+                # Link project to its normalised keywords
+                for keyword_key in keyword_dictionary.project_keyword_keys(keywords):
+                    project_keyword_rel.append([project_key, keyword_key])
+
+                # Process funders
+                for fund in (project_data.get("fundings") or []):
+                    fname = safe(fund.get("name"))
+                    fshort = safe(fund.get("shortName"))
+                    fjuris = safe(fund.get("jurisdiction"))
+
+                    # Add new funder if not already recorded
+                    if fname and fname not in funders:
+                        funders[fname] = {"shortName": fshort}
+
+                    # Link project to funder
+                    if fname:
+                        project_funder_rel.append([project_key, funder_keys.key(fname)])
+
+                    # Link project to country
+                    if fjuris:
+                        project_country_rel.append([project_key, country_keys.key(fjuris)])
+
+    # Hand on the project, funder and country tables and their relationships
+    tables.write(PROJECTS_CSV, pd.DataFrame(projects, columns=PROJECT_COLUMNS))
+    tables.write(FUNDERS_CSV, pd.DataFrame(
+        [[funder_keys.key(fund_name), fund_name, fund_data['shortName']] for fund_name, fund_data in funders.items()],
+        columns=['key', 'name', 'shortName']))
+    tables.write(COUNTRIES_CSV, pd.DataFrame(
+        {'key': range(len(country_keys)), 'jurisdiction': country_keys.values}, columns=['key', 'jurisdiction']))
+    tables.write(PROJECT_FUNDER_REL_CSV, pd.DataFrame(project_funder_rel, columns=['project_key', 'funder_key']))
+    tables.write(PROJECT_COUNTRY_REL_CSV, pd.DataFrame(project_country_rel, columns=['project_key', 'country_key']))
+
+    # Hand on the keyword dictionary and project-keyword relationships
+    tables.write(KEYWORDS_CSV, keyword_dictionary.to_frame())
+    tables.write(PROJECT_KEYWORD_REL_CSV, pd.DataFrame(project_keyword_rel, columns=['project_key', 'keyword_key']))
+
+    print("CSV files have been successfully created!")
+    if duplicate_projects:
+        print(f"♻️ Skipped {duplicate_projects} duplicate project records (same project ID)")
+    print(f"🏷️ {len(keyword_dictionary)} distinct keywords in {len(project_keyword_rel)} project-keyword pairs")
+
+    # Remove projects that are gone from the search index
+    with span('search index'):
+        search_counts = search_index.finish()
+    print(f"🔎 Search index updated: {search_counts} ({SEARCH_INDEX_FILE})")
+
+    # Select the project sample for the later stages (by natural IDs and funder names)
+    project_funder_names = ((project_keys.values[project_key], funder_keys.values[funder_key])
+                            for project_key, funder_key in project_funder_rel)
+    with span('sample'):
+        sample = update_sample(project_start_dates, project_funder_names)
+    if sample is None:
+        print("Sampling disabled: all projects will be used.")
     else:
-        print(f"File {file} does not contain a list of projects.")
-        continue
-
-    # Process each project in the JSON file
-    for project_data in project_data_list:
-        pid = safe(project_data.get("id"))
-        code = safe(project_data.get("code"))
-        title = safe(project_data.get("title"))
-        start_date = safe(project_data.get("startDate"))
-        end_date = safe(project_data.get("endDate"))
-        call_identifier = safe(project_data.get("callIdentifier"))
-        keywords = safe(project_data.get("keywords"))
-        summary = safe(project_data.get("summary"))
-
-        # Extract financial information
-        granted_data = project_data.get("granted") or {}
-        total_cost = safe(granted_data.get("totalCost"))
-        funded_amount = safe(granted_data.get("fundedAmount"))
-
-        # Write project record to CSV
-        projects_writer.writerow([
-            pid, code, title, start_date, end_date,
-            call_identifier, keywords, summary,
-            total_cost, funded_amount
-        ])
-
-        # Process funders
-        for fund in (project_data.get("fundings") or []):
-            fname = safe(fund.get("name"))
-            fshort = safe(fund.get("shortName"))
-            fjuris = safe(fund.get("jurisdiction"))
-
-            # Add new funder if not already recorded
-            if fname and fname not in funders:
-                funders[fname] = {"shortName": fshort}
-
-            # Link project to funder
-            if fname:
-                project_funder_rel.append([pid, fname])
-
-            # Link project to country
-            if fjuris:
-                if fjuris not in countries:
-                    countries[fjuris] = {}
-                project_country_rel.append([pid, fjuris])
-
-# Write funder records to CSV
-for fund_name, fund_data in funders.items():
-    fund_short = fund_data['shortName']
-    funders_writer.writerow([fund_name, fund_short])
-
-# Write unique countries to CSV
-for country in countries:
-    countries_writer.writerow([country])
-
-# Write project-funder relationships to CSV
-for rel in project_funder_rel:
-    project_funder_writer.writerow(rel)
-
-# Write project-country relationships to CSV
-for rel in project_country_rel:
-    project_country_writer.writerow(rel)
-
-# Close all CSV files
-projects_csv.close()
-funders_csv.close()
-countries_csv.close()
-project_funder_rel_csv.close()
-project_country_rel_csv.close()
-
-print("CSV files have been successfully created!")
+        print(f"Sampled {len(sample)} of {len(project_start_dates)} projects (see sampling.py).")
+
+def run(tables=None):
+    with instrumented_run('02_extract_projects_to_csv'):
+        extract_projects(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
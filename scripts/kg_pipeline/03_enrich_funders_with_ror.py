@@ -1,6 +1,7 @@
-import pandas as pd
 import json
 from tqdm import tqdm  # For progress tracking during funder enrichment
+from instrumentation import instrumented_run, span
+from pipeline_tables import PipelineTables
 
 # =====================================================================================
 # Script: Funders ROR Enrichment
@@ -14,20 +15,28 @@ from tqdm import tqdm  # For progress tracking during funder enrichment
 # acronyms, geolocation, and organizational metadata.
 #
 # Input:
-# - funders.csv: CSV file containing funder names and short names.
+# - funders.csv: CSV file containing funder keys, names and short names.
 # - ror_data.csv: ROR dataset (v1.66 or newer) containing detailed metadata.
 #
 # Output:
 # - funders_enriched.csv: A CSV file combining original funder data with
-#   enriched fields from the ROR registry.
+#   enriched fields from the ROR registry (keeps the funder key of funders.csv).
+#
+# funders.csv is taken from memory when run by run_pipeline.py (see pipeline_tables.py).
+# Every run writes a timing report (see instrumentation.py).
 # =====================================================================================
 
+FUNDERS_CSV = "data/projects_data_csv/funders.csv"
+ROR_CSV = "data/ror_data/v1.66-2025-05-20-ror-data.csv"
+FUNDERS_ENRICHED_CSV = "data/projects_data_csv/funders_enriched.csv"
+
 # -------------------------------------------------------------------------------------
 # Function: parse_json_field
 # Purpose: Parses a field that may be a JSON string, a list, or a scalar.
 # Returns a list to unify data processing downstream.
 # -------------------------------------------------------------------------------------
 def parse_json_field(field):
+    import pandas as pd
     try:
         parsed = json.loads(field)
         if isinstance(parsed, list):
@@ -46,75 +55,95 @@ def parse_json_field(field):
         else:
             return [str(field)]
 
-# -------------------------------------------------------------------------------------
-# Load source datasets
-# -------------------------------------------------------------------------------------
-funders_df = pd.read_csv("data/projects_data_csv/funders.csv")
-ror_df = pd.read_csv("data/ror_data/v1.66-2025-05-20-ror-data.csv")
+def enrich_funders(tables):
+    """
+    Matches every funder of funders.csv against the ROR registry and hands on
+    funders_enriched.csv via tables.
+    """
+    import pandas as pd
 
-# -------------------------------------------------------------------------------------
-# Build a lookup dictionary from ROR data
-# Keys: normalized names, aliases, and acronyms
-# Values: full ROR records
-# -------------------------------------------------------------------------------------
-ror_lookup = {}
+    # ---------------------------------------------------------------------------------
+    # Load source datasets
+    # ---------------------------------------------------------------------------------
+    funders_df = tables.read(FUNDERS_CSV)
+    with span('read'):
+        ror_df = pd.read_csv(ROR_CSV)
 
-for _, row in ror_df.iterrows():
-    name_variants = [row.get('name', '')]
-    name_variants += parse_json_field(row.get('aliases', '[]'))
-    name_variants += parse_json_field(row.get('acronyms', '[]'))
+    # ---------------------------------------------------------------------------------
+    # Build a lookup dictionary from ROR data
+    # Keys: normalized names, aliases, and acronyms
+    # Values: full ROR records
+    # ---------------------------------------------------------------------------------
+    ror_lookup = {}
 
-    for name in name_variants:
-        key = str(name).strip().lower()
-        if key:
-            ror_lookup[key] = row
+    with span('index'):
+        for _, row in ror_df.iterrows():
+            name_variants = [row.get('name', '')]
+            name_variants += parse_json_field(row.get('aliases', '[]'))
+            name_variants += parse_json_field(row.get('acronyms', '[]'))
 
-# -------------------------------------------------------------------------------------
-# Match and enrich each funder using the ROR lookup
-# If a match is found, ROR metadata is extracted and appended
-# -------------------------------------------------------------------------------------
-enriched = []
-
-for _, funder in tqdm(funders_df.iterrows(), total=len(funders_df), desc="Enriching funders"):
-    funder_name = funder['name'].strip().lower()
-    match = ror_lookup.get(funder_name, None)
-
-    if match is not None:
-        established_raw = match.get('established', '')
-        try:
-            established = int(float(established_raw)) if established_raw != '' else ''
-        except:
-            established = ''
-
-        row = {
-            'name': funder['name'],
-            'shortName': funder['shortName'],
-            'ror_id': match['id'],
-            'ror_name': match['name'],
-            'types': match.get('types', ''),
-            'status': match.get('status', ''),
-            'aliases': match.get('aliases', ''),
-            'labels': match.get('labels', ''),
-            'acronyms': match.get('acronyms', ''),
-            'wikipedia_url': match.get('wikipedia_url', ''),
-            'links': match.get('links', ''),
-            'established': established,
-            'lat': match.get('addresses[0].lat', ''),
-            'lng': match.get('addresses[0].lng', ''),
-            'city_name': match.get('addresses[0].geonames_city.name', '')
-        }
-    else:
-        row = {k: '' for k in [
-            'ror_id', 'ror_name', 'types', 'status', 'aliases', 'labels', 'acronyms',
-            'wikipedia_url', 'links', 'established',
-            'lat', 'lng', 'city_name'
-        ]}
-        row.update({'name': funder['name'], 'shortName': funder['shortName']})
-
-    enriched.append(row)
+            for name in name_variants:
+                key = str(name).strip().lower()
+                if key:
+                    ror_lookup[key] = row
 
-# -------------------------------------------------------------------------------------
-# Save enriched funder data to CSV
-# -------------------------------------------------------------------------------------
-enriched_df = pd.DataFrame(enriched)
-enriched_df.to_csv("data/projects_data_csv/funders_enriched.csv", index=False)
+    # ---------------------------------------------------------------------------------
+    # Match and enrich each funder using the ROR lookup
+    # If a match is found, ROR metadata is extracted and appended
+    # ---------------------------------------------------------------------------------
+    enriched = []
+
+    with span('match'):
+        for _, funder in tqdm(funders_df.iterrows(), total=len(funders_df), desc="Enriching funders"):
+            funder_name = funder['name'].strip().lower()
+            match = ror_lookup.get(funder_name, None)
+
+            if match is not None:
+                established_raw = match.get('established', '')
+                try:
+                    established = int(float(established_raw)) if established_raw != '' else ''
+                except:
+                    established = ''
+
+                row = {
+                    'key': funder['key'],
+                    'name': funder['name'],
+                    'shortName': funder['shortName'],
+                    'ror_id': match['id'],
+                    'ror_name': match['name'],
+                    'types': match.get('types', ''),
+                    'status': match.get('status', ''),
+                    'aliases': match.get('aliases', ''),
+                    'labels': match.get('labels', ''),
+                    'acronyms': match.get('acronyms', ''),
+                    'wikipedia_url': match.get('wikipedia_url', ''),
+                    'links': match.get('links', ''),
+                    'established': established,
+                    'lat': match.get('addresses[0].lat', ''),
+                    'lng': match.get('addresses[0].lng', ''),
+                    'city_name': match.get('addresses[0].geonames_city.name', '')
+                }
+            else:
+                row = {'key': funder['key']}
+                row.update({k: '' for k in [
+                    'ror_id', 'ror_name', 'types', 'status', 'aliases', 'labels', 'acronyms',
+                    'wikipedia_url', 'links', 'established',
+                    'lat', 'lng', 'city_name'
+                ]})
+                row.update({'name': funder['name'], 'shortName': funder['shortName']})
+
+            enriched.append(row)
+
+    # ---------------------------------------------------------------------------------
+    # Hand on the enriched funder data (saved to CSV)
+    # ---------------------------------------------------------------------------------
+    enriched_df = pd.DataFrame(enriched)
+    tables.write(FUNDERS_ENRICHED_CSV, enriched_df)
+
+def run(tables=None):
+    with instrumented_run('03_enrich_funders_with_ror'):
+        enrich_funders(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
@@ -1,5 +1,8 @@
-import requests
-import pandas as pd
+from instrumentation import instrumented_run, span
+from pipeline_tables import PipelineTables
+from relevance import relevance_scores
+from sampling import load_sample_keys
+from surrogate_keys import KeyDictionary
 
 # =====================================================================================
 # Script: Project-Publication Matcher via CrossRef
@@ -17,20 +20,22 @@ import pandas as pd
 # - funders_enriched.csv: Canonical funder data enriched with ROR metadata
 #
 # Outputs:
-# - project_publications.csv: Metadata about discovered publications
-# - publication_project_rel.csv: Mappings between projects and related publications
+# - project_publications.csv: Metadata about discovered publications, with an integer
+#   publication key (see surrogate_keys.py)
+# - publication_project_rel.csv: (project_key, publication_key) pairs with the relevance
+#   of the publication for the project
 #
 # Notes:
 # - Only up to 5 publications per project are retrieved to reduce API load.
 # - Basic heuristics are used to match funders (exact name or alias).
-# - LIMIT parameter can restrict the number of processed projects.
+# - All hits are scored against their project's title and funders after the search
+#   (see relevance.py); hits below MIN_RELEVANCE are not linked.
+# - Only projects in the sample manifest are processed (see sampling.py).
+# - The inputs are taken from memory when run by run_pipeline.py (see pipeline_tables.py).
+# - Every run writes a timing report with the time spent in HTTP requests (see
+#   instrumentation.py).
 # =====================================================================================
 
-# -------------------------------------------------------------------------------------
-# Configuration
-# -------------------------------------------------------------------------------------
-LIMIT = 10000  # Set to None to process all projects
-
 # -------------------------------------------------------------------------------------
 # File paths
 # -------------------------------------------------------------------------------------
@@ -41,11 +46,9 @@ PUBLICATIONS_CSV = 'data/projects_data_csv/project_publications.csv'
 RELATION_CSV = 'data/projects_data_csv/publication_project_rel.csv'
 
 # -------------------------------------------------------------------------------------
-# Load data
+# Relevance filter
 # -------------------------------------------------------------------------------------
-projects_df = pd.read_csv(PROJECTS_CSV, dtype={'callIdentifier': str}, low_memory=False)
-funder_rel_df = pd.read_csv(FUNDERS_REL_CSV)
-funders_df = pd.read_csv(FUNDERS_ENRICHED_CSV)
+MIN_RELEVANCE = 0.3    # Hits scoring lower are dropped, None = keep all hits
 
 # -------------------------------------------------------------------------------------
 # Helper Function: find_best_funder_match
@@ -56,7 +59,8 @@ funders_df = pd.read_csv(FUNDERS_ENRICHED_CSV)
 #   3. Partial match with aliases (semicolon-separated list)
 # Returns the standardized funder name if matched, else None
 # -------------------------------------------------------------------------------------
-def find_best_funder_match(input_name):
+def find_best_funder_match(input_name, funders_df):
+    import pandas as pd
     if pd.isna(input_name):
         return None
 
@@ -77,75 +81,144 @@ def find_best_funder_match(input_name):
             return row['name']
     return None
 
-# -------------------------------------------------------------------------------------
-# Initialize containers
-# -------------------------------------------------------------------------------------
-publication_rows = []    # To hold unique publication metadata
-relation_rows = []       # To link publications to projects
-
-# Determine number of projects to process
-total_projects = len(projects_df) if LIMIT is None else min(LIMIT, len(projects_df))
-print(f"🔍 Starting publication search for {total_projects} projects...")
-
-# -------------------------------------------------------------------------------------
-# Main Loop: Search publications for each project using CrossRef API
-# -------------------------------------------------------------------------------------
-for idx, row in projects_df.head(LIMIT).iterrows():
-    current = idx + 1
-    project_id = row['id']
-    title_query = row['title']
-
-    # Get associated funder name (if any)
-    funder_name = funder_rel_df.loc[funder_rel_df['project_id'] == project_id, 'funder_name'].values
-    funder_name = funder_name[0] if len(funder_name) else None
-
-    # Match funder to canonical name
-    matched_funder = find_best_funder_match(funder_name) if funder_name else None
-
-    # Build CrossRef query
-    query = f'title:"{title_query}"'
-    if matched_funder:
-        query += f' funder-name:"{matched_funder}"'
-
-    url = f'https://api.crossref.org/works?query.bibliographic={query}&rows=5'
-
-    # Send request
-    response = requests.get(url)
-
-    if response.status_code == 200:
-        items = response.json().get('message', {}).get('items', [])
-        if items:
-            print(f"✅ {len(items)} hits for project ID {project_id} ({current}/{total_projects})")
-            for item in items:
-                doi = item.get('DOI', '')
-                title = item.get('title', [''])[0]
-                journal = item.get('container-title', [''])[0] if item.get('container-title') else ''
-                citation_count = item.get('is-referenced-by-count', 0)
-
-                # Avoid duplicates by DOI
-                if not any(pub['doi'] == doi for pub in publication_rows):
-                    publication_rows.append({
-                        "doi": doi,
-                        "title": title,
-                        "journal": journal,
-                        "citation_count": citation_count
-                    })
-
-                # Link publication to project
-                relation_rows.append({
-                    "project_id": project_id,
-                    "doi": doi
-                })
+def fetch_publications(tables):
+    """
+    Searches CrossRef for the publications of every (sampled) project and hands
+    on the publication and project-publication tables via tables.
+    """
+    import pandas as pd
+    import requests
+
+    # ---------------------------------------------------------------------------------
+    # Load data
+    # ---------------------------------------------------------------------------------
+    projects_df = tables.read(PROJECTS_CSV, usecols=['key', 'id', 'title'])
+    funder_rel_df = tables.read(FUNDERS_REL_CSV)
+    funders_df = tables.read(FUNDERS_ENRICHED_CSV)
+
+    # Restrict the search to the sampled projects (all projects if no sample is active)
+    sample_keys = load_sample_keys()
+    if sample_keys is not None:
+        projects_df = projects_df[projects_df['key'].isin(sample_keys)]
+
+    # First funder of every project and the names of the funders, by integer key
+    first_funder_keys = funder_rel_df.drop_duplicates('project_key').set_index('project_key')['funder_key']
+    funder_names = funders_df.set_index('key')['name']
+
+    # Names (original and ROR) of all funders of every project, for the relevance scores
+    project_funder_names = (funder_rel_df[funder_rel_df['project_key'].isin(projects_df['key'])]
+                            .merge(funders_df[['key', 'name', 'ror_name']], left_on='funder_key', right_on='key')
+                            .melt(id_vars='project_key', value_vars=['name', 'ror_name']).dropna()
+                            .groupby('project_key')['value'].agg(list).to_dict())
+
+    # ---------------------------------------------------------------------------------
+    # Initialize containers
+    # ---------------------------------------------------------------------------------
+    publication_rows = []    # To hold unique publication metadata
+    relation_rows = []       # To link publications to projects
+    publication_keys = KeyDictionary()   # DOI -> publication key
+    matched_funders = {}     # Funder key -> canonical funder name (or None)
+    project_titles = []      # Title and funder names of every searched project
+    project_funders = []
+    hits = []                # Every hit: (project index, project key, DOI, title, journal, citations)
+    hit_funders = []         # Funder names in the CrossRef metadata of every hit
+
+    # Determine number of projects to process
+    total_projects = len(projects_df)
+    print(f"🔍 Starting publication search for {total_projects} projects...")
+
+    # ---------------------------------------------------------------------------------
+    # Main Loop: Search publications for each project using CrossRef API
+    # ---------------------------------------------------------------------------------
+    for current, (_, row) in enumerate(projects_df.iterrows(), start=1):
+        project_id = row['id']
+        project_key = row['key']
+        title_query = row['title']
+        project_index = len(project_titles)
+        project_titles.append(title_query)
+        project_funders.append(project_funder_names.get(project_key, []))
+
+        # Match the project's (first) funder to its canonical name, once per funder
+        funder_key = first_funder_keys.get(project_key)
+        if funder_key is not None and funder_key not in matched_funders:
+            funder_name = funder_names.get(funder_key)
+            with span('match funder'):
+                matched_funders[funder_key] = find_best_funder_match(funder_name, funders_df) if funder_name else None
+        matched_funder = matched_funders.get(funder_key)
+
+        # Build CrossRef query
+        query = f'title:"{title_query}"'
+        if matched_funder:
+            query += f' funder-name:"{matched_funder}"'
+
+        url = f'https://api.crossref.org/works?query.bibliographic={query}&rows=5'
+
+        # Send request
+        with span('http'):
+            response = requests.get(url)
+
+        if response.status_code == 200:
+            with span('decode'):
+                items = response.json().get('message', {}).get('items', [])
+            if items:
+                print(f"✅ {len(items)} hits for project ID {project_id} ({current}/{total_projects})")
+                for item in items:
+                    doi = item.get('DOI', '')
+                    title = item.get('title', [''])[0]
+                    journal = item.get('container-title', [''])[0] if item.get('container-title') else ''
+                    citation_count = item.get('is-referenced-by-count', 0)
+                    hits.append((project_index, project_key, doi, title, journal, citation_count))
+                    hit_funders.append([funder.get('name') for funder in item.get('funder', [])])
+            else:
+                print(f"❌ No publications found for project {project_id} ({current}/{total_projects})")
         else:
-            print(f"❌ No publications found for project {project_id} ({current}/{total_projects})")
-    else:
-        print(f"⚠️ Error for project {project_id}: HTTP {response.status_code} ({current}/{total_projects})")
-
-# -------------------------------------------------------------------------------------
-# Save results to CSV
-# -------------------------------------------------------------------------------------
-pd.DataFrame(publication_rows).to_csv(PUBLICATIONS_CSV, index=False)
-pd.DataFrame(relation_rows).to_csv(RELATION_CSV, index=False)
-
-print(f"\n📄 Saved {len(publication_rows)} publications to {PUBLICATIONS_CSV}")
-print(f"🔗 Saved {len(relation_rows)} project-publication relations to {RELATION_CSV}")
+            print(f"⚠️ Error for project {project_id}: HTTP {response.status_code} ({current}/{total_projects})")
+
+    # ---------------------------------------------------------------------------------
+    # Score all hits against their projects at once and link the relevant ones
+    # ---------------------------------------------------------------------------------
+    with span('score'):
+        scores = relevance_scores(project_titles, project_funders, [hit[0] for hit in hits],
+                                  [hit[3] for hit in hits], hit_funders)
+
+    for (_, project_key, doi, title, journal, citation_count), score in zip(hits, scores.tolist()):
+        if MIN_RELEVANCE is not None and score < MIN_RELEVANCE:
+            continue
+
+        # Avoid duplicates by DOI
+        if doi not in publication_keys:
+            publication_rows.append({
+                "key": publication_keys.key(doi),
+                "doi": doi,
+                "title": title,
+                "journal": journal,
+                "citation_count": citation_count
+            })
+
+        # Link publication to project
+        relation_rows.append({
+            "project_key": project_key,
+            "publication_key": publication_keys.key(doi),
+            "relevance": round(score, 4)
+        })
+
+    print(f"🎯 Linked {len(relation_rows)} of {len(hits)} hits"
+          + (f" with relevance >= {MIN_RELEVANCE}" if MIN_RELEVANCE is not None else ""))
+
+    # ---------------------------------------------------------------------------------
+    # Hand on the results (saved to CSV unless the runner keeps them in memory only)
+    # ---------------------------------------------------------------------------------
+    tables.write(PUBLICATIONS_CSV, pd.DataFrame(publication_rows,
+                                                columns=['key', 'doi', 'title', 'journal', 'citation_count']))
+    tables.write(RELATION_CSV, pd.DataFrame(relation_rows, columns=['project_key', 'publication_key', 'relevance']))
+
+    print(f"\n📄 Saved {len(publication_rows)} publications to {PUBLICATIONS_CSV}")
+    print(f"🔗 Saved {len(relation_rows)} project-publication relations to {RELATION_CSV}")
+
+def run(tables=None):
+    with instrumented_run('04_fetch_project_publications'):
+        fetch_publications(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
@@ -1,7 +1,17 @@
-from neo4j import GraphDatabase
-import csv
+import hashlib
+import json
 import logging
+import os
+import sys
+import time
 from tqdm import tqdm
+from graph_sink import check_merge_semantics, open_graph_sink
+from import_metrics import ImportReport
+from instrumentation import instrumented_run, span
+from keywords import KEYWORD_RELATED_CSV, KEYWORDS_CSV, PROJECT_KEYWORD_REL_CSV
+from pipeline_tables import PipelineTables
+from sampling import SAMPLE_IDS_CSV, load_sample_keys
+from surrogate_keys import dictionary_list
 
 # =====================================================================================
 # Script: local neo4j Knowledge Graph creator script
@@ -13,20 +23,49 @@ from tqdm import tqdm
 # CSV files using Cypher queries. It loads structured project, funder and country data,
 # and builds corresponding graph structures.
 #
+# The loaders write through a graph sink (see graph_sink.py). Besides Neo4j, an
+# in-memory property graph and a recording stub can be selected with GRAPH_SINK, so
+# the import can be tested and benchmarked on a machine without a database. The
+# recording stub writes the statements and batch sizes to RECORDED_STATEMENTS_JSON.
+# python scripts/kg_pipeline/05_import_to_neo4j.py --check-sink checks that the
+# configured sink (e.g. a live Neo4j) writes with the MERGE semantics the in-memory
+# graph implements, and --check-import runs the loaders on small synthetic tables
+# into the in-memory graph and checks the result (see check_import).
+#
 # Inputs:
 # - projects.csv: Project node metadata
 # - funders_enriched.csv: Funder node metadata
 # - countries.csv: Country node metadata (not yet implemented)
-# - project_funder_rel.csv: Project-to-Funder relations
+# - project_funder_rel.csv: Project-to-Funder relations (all relation CSVs hold integer
+#   key pairs, which are decoded to the natural IDs with the entity CSVs)
 # - project_country_rel.csv: Project-to-Country relations
 # - project_publications.csv: Publication metadata (for enrichment)
 # - publication_project_rel.csv: Publication-to-Project relations
+# - keywords.csv, project_keyword_rel.csv: Keyword nodes and Project-to-Keyword relations
+# - keyword_related.csv: Keyword-to-Keyword relations (from 07; imported if present)
+# - funder_collaboration.csv: weighted Funder-to-Funder relations (from 08; imported if present)
 #
 # Outputs:
 # - Nodes and relationships written into local Neo4j database
 #
 # Notes:
 # - You need to create the file 'neo4j_data/neo_access.txt' with your Neo4j password
+#   (only for the "neo4j" sink)
+# - Nodes are identified by their natural IDs (project ID, funder name, ...), not by the
+#   integer keys of the CSVs: those are only stable within one extraction run.
+# - Imports are incremental: a content hash of every node/relationship that was sent
+#   is stored in IMPORT_STATE_FILE, and later runs only send rows whose hash changed.
+#   A relationship is sent again once its end nodes have been imported.
+# - keyword_related.csv and funder_collaboration.csv are written by the analytics stages
+#   07 and 08. Run them before this script, or run this script again afterwards (only
+#   the new rows are sent).
+# - Every run writes per-loader throughput, latency and Neo4j update counters to
+#   IMPORT_REPORT_JSON and IMPORT_REPORT_PROM (the citation count refresh of 10 to
+#   CITATION_REFRESH_REPORT_JSON).
+# - run() can also be called by run_pipeline.py, which hands over the tables of the
+#   earlier stages in memory instead of as CSV files (see pipeline_tables.py).
+# - The time spent reading, diffing and in write transactions is also part of the
+#   run report of instrumentation.py.
 # =====================================================================================
 
 
@@ -34,21 +73,15 @@ from tqdm import tqdm
 # Configuration
 # -------------------------------------------------------------------------------------
 
-# Set up logging to display status messages during processing
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+# Graph sink: "neo4j", "memory" (in-process property graph) or "recording" (statements only)
+GRAPH_SINK = os.environ.get('KG_GRAPH_SINK', 'neo4j')
 
 # Define Neo4j connection details
 uri = "bolt://localhost:7687"
 username = "neo4j"
 
-# Load Neo4j password from local file (must be created manually)
+# Neo4j password file (must be created manually)
 access_file = "neo4j_data/neo_access.txt"
-try:
-    with open(access_file, "r", encoding="utf-8") as f:
-        password = f.readline().strip()
-except FileNotFoundError:
-    logging.critical(f"❌ Access file not found: {access_file}")
-    exit(1)
 
 # Define CSV paths (adjust as needed)
 projects_csv_file = 'data/projects_data_csv/projects.csv'
@@ -58,18 +91,54 @@ project_funder_rel_csv_file = 'data/projects_data_csv/project_funder_rel.csv'
 project_country_rel_csv_file = 'data/projects_data_csv/project_country_rel.csv'
 publication_csv_file = 'data/projects_data_csv/project_publications.csv'
 pub_project_rel_csv_file = 'data/projects_data_csv/publication_project_rel.csv'
-
-# Optional: limit number of rows to process for testing/performance
-LIMIT_ENTRIES = 100000
-
-# Create Neo4j driver for database access
-driver = GraphDatabase.driver(uri, auth=(username, password))
+keywords_csv_file = KEYWORDS_CSV
+project_keyword_rel_csv_file = PROJECT_KEYWORD_REL_CSV
+keyword_related_csv_file = KEYWORD_RELATED_CSV
+funder_collaboration_csv_file = 'data/projects_data_csv/funder_collaboration.csv'
+
+# Only the projects of the sample manifest are imported, together with their funders,
+# countries and publications (see sampling.py; no manifest = import everything)
+
+# Delta synchronisation: fingerprints of the last imported snapshot
+IMPORT_STATE_FILE = 'neo4j_data/import_state.json'
+FULL_REIMPORT = False   # Set to True to ignore the stored fingerprints and send every row
+DELETE_REMOVED = False  # Set to True to delete nodes/relationships that are no longer in the CSVs
+
+# Import instrumentation: JSON report and Prometheus textfile written at the end of a run
+IMPORT_REPORT_JSON = 'neo4j_data/import_report.json'
+IMPORT_REPORT_PROM = 'neo4j_data/import_metrics.prom'
+# Report of the citation count refresh of 10_refresh_citation_counts.py (JSON only:
+# its run gauges would clash with those of the import in the textfile collector)
+CITATION_REFRESH_REPORT_JSON = 'neo4j_data/citation_refresh_report.json'
+
+# Statements and batch sizes captured by the "recording" sink
+RECORDED_STATEMENTS_JSON = 'neo4j_data/recorded_statements.json'
+
+# Node references used by the relationship loaders: (label, key property, CSV field)
+PROJECT_REF = ("Project", "id", "project_id")
+FUNDER_REF = ("Funder", "name", "funder_name")
+PARTNER_REF = ("Funder", "name", "partner_name")
+COUNTRY_REF = ("Country", "jurisdiction", "country")
+PUBLICATION_REF = ("Publication", "doi", "doi")
+KEYWORD_REF = ("Keyword", "name", "keyword")
+RELATED_KEYWORD_REF = ("Keyword", "name", "related_keyword")
 
 
 # -------------------------------------------------------------------------------------
 # Helper Functions
 # -------------------------------------------------------------------------------------
 
+def read_neo4j_password(path):
+    """
+    Reads the Neo4j password from the first line of the access file.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.readline().strip()
+    except FileNotFoundError:
+        logging.critical(f"❌ Access file not found: {path}")
+        exit(1)
+
 def determine_batch_size(total_rows):
     """
     Returns an appropriate batch size based on the number of rows.
@@ -98,67 +167,228 @@ def batchify(iterable, batch_size):
     for i in range(0, len(iterable), batch_size):
         yield iterable[i:i + batch_size]
 
-def load_csv_and_run_batch(csv_file, query, param_fn, limit=None, show_progress=False):
+def fingerprint(params):
     """
-    Loads data from a CSV file, prepares query parameters, and executes Cypher
-    write transactions in batches.
+    Returns a stable content hash for a dict of Cypher parameters.
+    Two rows with the same hash would write exactly the same data.
+    """
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+def load_import_state(path):
+    """
+    Loads the fingerprints of the last imported snapshot.
+    Returns an empty state if no import has been recorded yet.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except json.JSONDecodeError as e:
+        logging.warning(f"⚠️ Ignoring unreadable import state {path}: {e}")
+        return {}
+
+def save_import_state(path, state):
+    """
+    Writes the import state atomically (temporary file, flushed to disk, then
+    renamed over the old one), so an interrupted run never leaves a half-written
+    file behind.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+# Fingerprints per loader, loaded in the main block
+import_state = {}
+
+# Throughput, latency and update counters per loader
+import_report = ImportReport()
+
+# Graph sink all loaders write to, opened in import_graph()
+sink = None
+
+# Source tables: in memory if handed over by the pipeline runner, else the CSV files
+tables = PipelineTables()
+
+def run_in_batches(rows, write_fn, desc, metrics, show_progress=False):
+    """
+    Hands rows to write_fn (a graph sink method) in batches of an appropriate size.
+    Every batch is timed and its update counters are added to metrics.
+    Returns the batch size that was used.
+    """
+    total = len(rows)
+    batch_size = determine_batch_size(total)
+    bar = tqdm(total=total, desc=desc, unit="rows") if show_progress else None
+
+    for batch in batchify(rows, batch_size):
+        started = time.perf_counter()
+        with span('transaction'):
+            counters = write_fn(batch)
+        metrics.record_batch(len(batch), time.perf_counter() - started,
+                             counters.pop('attempts', 1), counters)
+        if bar:
+            bar.update(len(batch))
+
+    if bar:
+        bar.close()
+    return batch_size
+
+def sync_rows(state_key, rows, key_fields, write_fn, delete_fn=None, show_progress=False, end_nodes=()):
+    """
+    Sends only the difference between rows and the last imported snapshot.
 
     Arguments:
-    - csv_file: path to CSV file
-    - query: Cypher query string
-    - param_fn: function to map CSV row to Cypher parameters
-    - limit: max number of rows to process
+    - state_key: name under which the fingerprints are stored in the import state
+    - rows: list of parameter dicts (the current snapshot)
+    - key_fields: parameter names that identify a node or relationship
+    - write_fn: function writing a batch of rows (inserts and updates)
+    - delete_fn: function deleting a batch of rows, given their key fields
     - show_progress: whether to display tqdm progress bar
+    - end_nodes: (node state key, parameter name) of the nodes a relationship row
+      connects. Whether they have been imported is part of the row's fingerprint:
+      a relationship sent before one of its end nodes existed created nothing (its
+      MATCH found no node), so it is sent again once the node has been imported.
+
+    The import state is written once per loader, after all its batches.
     """
-    try:
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = list(csv.DictReader(file))
-            if limit:
-                reader = reader[:limit]
+    metrics = import_report.loader(state_key)
+    metrics.start()
+    previous = {} if FULL_REIMPORT else import_state.get(state_key, {})
+
+    # Later rows win, just like repeated MERGE/SET statements would
+    with span('diff'):
+        current = {}
+        imported_nodes = [(import_state.get(node_key, {}), field) for node_key, field in end_nodes]
+        for params in rows:
+            key = json.dumps([params[field] for field in key_fields], ensure_ascii=False)
+            if imported_nodes:
+                present = [json.dumps([params[field]], ensure_ascii=False) in nodes for nodes, field in imported_nodes]
+                current[key] = (fingerprint({'row': params, 'end_nodes': present}), params)
+            else:
+                current[key] = (fingerprint(params), params)
+
+        changed = [params for key, (digest, params) in current.items() if previous.get(key) != digest]
+        removed = [key for key in previous if key not in current]
+    metrics.rows_total = len(current)
+
+    batch_size = run_in_batches(changed, write_fn, f"Syncing {state_key}", metrics, show_progress)
+    metrics.rows_sent = len(changed)
+
+    deleted = []
+    if DELETE_REMOVED and delete_fn and removed:
+        delete_rows = [dict(zip(key_fields, json.loads(key))) for key in removed]
+        run_in_batches(delete_rows, delete_fn, f"Deleting {state_key}", metrics, show_progress)
+        deleted = removed
+        metrics.rows_deleted = len(deleted)
+
+    # Rows that were removed but not deleted stay in the state, so that a later
+    # run with DELETE_REMOVED can still clean them up
+    new_state = {key: digest for key, (digest, _) in current.items()}
+    for key in removed:
+        if key not in deleted:
+            new_state[key] = previous[key]
+    import_state[state_key] = new_state
+    if sink.persistent:
+        with span('write'):
+            save_import_state(IMPORT_STATE_FILE, import_state)
+    metrics.finish()
+
+    logging.info(
+        f"🔄 {state_key}: {len(changed)} sent, {len(current) - len(changed)} unchanged, "
+        f"{len(deleted)} deleted, {len(removed) - len(deleted)} stale (Batch Size: {batch_size})"
+    )
+
+def sync_nodes(label, key, rows, show_progress=False):
+    """
+    Synchronises nodes of one label, identified by the key property.
+    All other fields of a row are set as node properties.
+    """
+    sync_rows(label, rows, [key],
+              lambda batch: sink.merge_nodes(label, key, batch),
+              lambda batch: sink.delete_nodes(label, key, batch),
+              show_progress)
 
-            total = len(reader)
-            batch_size = determine_batch_size(total)
-            iterator = batchify(reader, batch_size)
-            bar = tqdm(total=total, desc=f"Loading {csv_file}", unit="rows") if show_progress else None
+def sync_relationships(rel_type, start, end, rows, show_progress=False):
+    """
+    Synchronises relationships of one type between the nodes referenced by
+    start and end (see PROJECT_REF etc.). Rows whose end nodes do not exist
+    create nothing, like a MATCH without results, and are sent again once the
+    nodes have been imported (the node loaders' state keys are their labels).
+    """
+    sync_rows(rel_type, rows, [start[2], end[2]],
+              lambda batch: sink.merge_relationships(rel_type, start, end, batch),
+              lambda batch: sink.delete_relationships(rel_type, start, end, batch),
+              show_progress, end_nodes=[(start[0], start[2]), (end[0], end[2])])
 
-            with driver.session() as session:
-                for batch in iterator:
-                    session.execute_write(lambda tx: [tx.run(query, **param_fn(row)) for row in batch])
-                    if bar:
-                        bar.update(len(batch))
+def load_csv_and_sync(csv_file, state_key, param_fn, sync_fn, keep=None):
+    """
+    Loads data from a CSV file, prepares the parameters of every row and
+    synchronises them with the graph.
 
-            if bar:
-                bar.close()
+    Arguments:
+    - csv_file: path to CSV file
+    - state_key: loader name used in the import state and report
+    - param_fn: function to map CSV row to node/relationship parameters
+    - sync_fn: function receiving the list of parameter dicts (sync_nodes/sync_relationships)
+    - keep: optional row filter, e.g. from in_sample()
+    """
+    try:
+        with span(state_key):
+            reader = tables.rows(csv_file)
+            with span('decode'):
+                if keep:
+                    reader = [row for row in reader if keep(row)]
+                params = [param_fn(row) for row in reader]
 
-        logging.info(f"✅ Processed: {csv_file} (Limit: {limit}, Batch Size: {batch_size})")
+            sync_fn(params)
+        logging.info(f"✅ Processed: {csv_file} ({len(reader)} rows)")
 
-    except FileNotFoundError:
+    except FileNotFoundError as e:
         logging.error(f"❌ File not found: {csv_file}")
+        import_report.loader(state_key).finish(error=e)
     except Exception as e:
         logging.error(f"❌ Error processing {csv_file}: {e}")
+        import_report.loader(state_key).finish(error=e)
 
 
+# -------------------------------------------------------------------------------------
+# Integer keys
+# -------------------------------------------------------------------------------------
+
+# Natural IDs by integer key per entity ('projects', 'funders', ...), loaded in run()
+natural_keys = {}
+
+def load_natural_keys():
+    """Loads the dictionaries of all entity tables (empty for a missing table)."""
+    dictionaries = [
+        ('projects', projects_csv_file, 'id'),
+        ('funders', funders_csv_file, 'name'),
+        ('countries', countries_csv_file, 'jurisdiction'),
+        ('publications', publication_csv_file, 'doi'),
+        ('keywords', keywords_csv_file, 'keyword'),
+    ]
+    for kind, csv_file, field in dictionaries:
+        natural_keys[kind] = dictionary_list(tables.rows(csv_file, ['key', field]), field) \
+            if tables.exists(csv_file) else []
+
+def natural_key(kind, row, field):
+    """Decodes the integer key in row[field] to the natural ID of the entity."""
+    return natural_keys[kind][int(row[field])]
+
 # -------------------------------------------------------------------------------------
 # Node Creation Functions
 # -------------------------------------------------------------------------------------
 
-def create_project_nodes(csv_file, limit=None):
+def create_project_nodes(csv_file, keep=None):
     """
     Creates Project nodes from the CSV file.
     Each project has metadata such as title, duration, keywords, costs, etc.
     """
-    query = """
-    MERGE (p:Project {id: $id})
-    SET p.code = $code,
-        p.title = $title,
-        p.startDate = $startDate,
-        p.endDate = $endDate,
-        p.callIdentifier = $callIdentifier,
-        p.keywords = $keywords,
-        p.summary = $summary,
-        p.totalCost = $totalCost,
-        p.fundedAmount = $fundedAmount
-    """
     def params(row):
         return {
             "id": row['id'],
@@ -173,30 +403,14 @@ def create_project_nodes(csv_file, limit=None):
             "fundedAmount": float(row['fundedAmount']) if row['fundedAmount'] else 0.0
         }
 
-    load_csv_and_run_batch(csv_file, query, params, limit, show_progress=True)
+    load_csv_and_sync(csv_file, "Project", params,
+                      lambda rows: sync_nodes("Project", "id", rows, show_progress=True), keep)
 
-def create_funder_nodes(csv_file):
+def create_funder_nodes(csv_file, keep=None):
     """
     Creates Funder nodes based on enriched metadata.
     Includes location info, aliases, ROR IDs, etc.
     """
-    query = """
-    MERGE (f:Funder {name: $name})
-    SET f.shortName = $shortName,
-        f.ror_id = $ror_id,
-        f.ror_name = $ror_name,
-        f.types = $types,
-        f.status = $status,
-        f.aliases = $aliases,
-        f.labels = $labels,
-        f.acronyms = $acronyms,
-        f.wikipedia_url = $wikipedia_url,
-        f.links = $links,
-        f.established = $established,
-        f.lat = $lat,
-        f.lng = $lng,
-        f.city_name = $city_name
-    """
     def params(row):
         return {
             "name": row['name'],
@@ -216,145 +430,530 @@ def create_funder_nodes(csv_file):
             "city_name": row.get('city_name', '')
         }
 
-    load_csv_and_run_batch(csv_file, query, params, show_progress=True)
+    load_csv_and_sync(csv_file, "Funder", params,
+                      lambda rows: sync_nodes("Funder", "name", rows, show_progress=True), keep)
 
 # -------------------------------------------------------------------------------------
 # Node Creation: Countries
 # -------------------------------------------------------------------------------------
 
-def create_country_nodes(csv_file):
+def create_country_nodes(csv_file, keep=None):
     """
     Create Country nodes from CSV data.
     Each country node has a 'jurisdiction' property used as a unique identifier.
     """
-    query = "MERGE (c:Country {jurisdiction: $jurisdiction})"
-    load_csv_and_run_batch(csv_file, query, lambda row: {
+    load_csv_and_sync(csv_file, "Country", lambda row: {
         "jurisdiction": row['jurisdiction']
-    }, show_progress=True)
+    }, lambda rows: sync_nodes("Country", "jurisdiction", rows, show_progress=True), keep)
 
 # -------------------------------------------------------------------------------------
 # Relationship Creation Functions
 # -------------------------------------------------------------------------------------
 
-def create_project_funder_relationship(csv_file, limit=None):
+def create_project_funder_relationship(csv_file, keep=None):
     """
     Create FUNDED_BY relationships between Project and Funder nodes.
     Requires matching by project ID and funder name.
     """
-    query = """
-    MATCH (p:Project {id: $project_id})
-    MATCH (f:Funder {name: $funder_name})
-    MERGE (p)-[:FUNDED_BY]->(f)
-    """
-    load_csv_and_run_batch(csv_file, query, lambda row: {
-        "project_id": row['project_id'],
-        "funder_name": row['funder_name']
-    }, limit, show_progress=True)
+    load_csv_and_sync(csv_file, "FUNDED_BY", lambda row: {
+        "project_id": natural_key('projects', row, 'project_key'),
+        "funder_name": natural_key('funders', row, 'funder_key')
+    }, lambda rows: sync_relationships("FUNDED_BY", PROJECT_REF, FUNDER_REF, rows, show_progress=True), keep)
 
-def create_project_country_relationship(csv_file, limit=None):
+def create_project_country_relationship(csv_file, keep=None):
     """
     Create LOCATED_IN relationships between Project and Country nodes.
     Matches by project ID and country jurisdiction.
     """
-    query = """
-    MATCH (p:Project {id: $project_id})
-    MATCH (c:Country {jurisdiction: $country})
-    MERGE (p)-[:LOCATED_IN]->(c)
-    """
-    load_csv_and_run_batch(csv_file, query, lambda row: {
-        "project_id": row['project_id'],
-        "country": row['country']
-    }, limit, show_progress=True)
+    load_csv_and_sync(csv_file, "LOCATED_IN", lambda row: {
+        "project_id": natural_key('projects', row, 'project_key'),
+        "country": natural_key('countries', row, 'country_key')
+    }, lambda rows: sync_relationships("LOCATED_IN", PROJECT_REF, COUNTRY_REF, rows, show_progress=True), keep)
 
 # -------------------------------------------------------------------------------------
 # Node Creation: Publications
 # -------------------------------------------------------------------------------------
 
-def create_publication_nodes(csv_file):
+def publication_params(row):
+    """Parameters of a Publication node: DOI, title, journal, and citation count."""
+    return {
+        "doi": row['doi'],
+        "title": row.get('title', ''),
+        "journal": row.get('journal', ''),
+        # A table with missing counts stores them as floats ("3.0")
+        "citation_count": int(float(row['citation_count'])) if row.get('citation_count') else 0
+    }
+
+def create_publication_nodes(csv_file, keep=None):
     """
     Create Publication nodes from CSV data.
     Each publication has a DOI, title, journal, and citation count.
     """
-    query = """
-    MERGE (pub:Publication {doi: $doi})
-    SET pub.title = $title,
-        pub.journal = $journal,
-        pub.citation_count = $citation_count
+    load_csv_and_sync(csv_file, "Publication", publication_params,
+                      lambda rows: sync_nodes("Publication", "doi", rows, show_progress=True), keep)
+
+def refresh_publication_citations(rows, citation_counts):
     """
-    def params(row):
-        return {
-            "doi": row['doi'],
-            "title": row.get('title', ''),
-            "journal": row.get('journal', ''),
-            "citation_count": int(row['citation_count']) if row.get('citation_count') else 0
-        }
-    load_csv_and_run_batch(csv_file, query, params, show_progress=True)
+    Sets only the citation_count of Publication nodes that were already imported
+    (called by 10_refresh_citation_counts.py).
+    - rows: publication CSV rows (dicts of strings) before the refresh
+    - citation_counts: refreshed citation count by DOI
+    Nodes that were in sync with their row get the fingerprint of the refreshed
+    row, so the next import does not send them again. Returns the number of
+    updated nodes.
+    """
+    global sink
+    sink = connect_graph_sink()
+    if sink.persistent:
+        import_state.update(load_import_state(IMPORT_STATE_FILE))
+    imported = import_state.setdefault("Publication", {})
+
+    # Imported publications whose citation count changed
+    updates, digests = [], {}
+    for row in rows:
+        params = publication_params(row)
+        key = json.dumps([params['doi']], ensure_ascii=False)
+        count = citation_counts.get(params['doi'], params['citation_count'])
+        if key not in imported or count == params['citation_count']:
+            continue
+        updates.append({"doi": params['doi'], "citation_count": count})
+        if imported[key] == fingerprint(params):
+            digests[key] = fingerprint({**params, "citation_count": count})
+
+    metrics = import_report.loader("Publication.citation_count")
+    metrics.start()
+    run_in_batches(updates, lambda batch: sink.merge_nodes("Publication", "doi", batch),
+                   "Refreshing citation counts", metrics, show_progress=True)
+    metrics.rows_total, metrics.rows_sent = len(rows), len(updates)
+    metrics.finish()
+    sink.close()
+
+    imported.update(digests)
+    if sink.persistent and digests:
+        save_import_state(IMPORT_STATE_FILE, import_state)
+    logging.info(f"🔄 Publication.citation_count: {len(updates)} nodes updated, "
+                 f"{metrics.counters['properties_set']} properties set")
+    write_import_report(CITATION_REFRESH_REPORT_JSON)
+    return len(updates)
 
 # -------------------------------------------------------------------------------------
 # Relationship: Project ↔ Publication
 # -------------------------------------------------------------------------------------
 
-def create_project_publication_relationship(csv_file):
+def create_project_publication_relationship(csv_file, keep=None):
     """
     Create HAS_PUBLICATION relationships between Project and Publication nodes.
-    Matches by project ID and publication DOI.
-    """
-    query = """
-    MATCH (p:Project {id: $project_id})
-    MATCH (pub:Publication {doi: $doi})
-    MERGE (p)-[:HAS_PUBLICATION]->(pub)
+    Matches by project ID and publication DOI; the relationship carries the
+    relevance score of the publication for the project (see relevance.py).
     """
-    load_csv_and_run_batch(csv_file, query, lambda row: {
-        "project_id": row['project_id'],
-        "doi": row['doi']
-    }, show_progress=True)
+    load_csv_and_sync(csv_file, "HAS_PUBLICATION", lambda row: {
+        "project_id": natural_key('projects', row, 'project_key'),
+        "doi": natural_key('publications', row, 'publication_key'),
+        "relevance": float(row['relevance']) if row.get('relevance') else None
+    }, lambda rows: sync_relationships("HAS_PUBLICATION", PROJECT_REF, PUBLICATION_REF, rows, show_progress=True),
+        keep)
 
 # -------------------------------------------------------------------------------------
 # Relationship: Funder ↔ Publication (via project)
 # -------------------------------------------------------------------------------------
 
-def create_funder_publication_relationship(publication_rel_csv, funder_rel_csv):
+def derive_funder_publication_pairs(publication_rel_csv, funder_rel_csv, project_keys=None):
+    """
+    Derives the distinct (funder, publication) pairs as a set join of
+    project → funders and project → publications on the integer keys.
+    Co-funded projects contribute one pair per funder, rows with an empty
+    funder name or DOI are dropped, and duplicate pairs are sent only once.
+    If project_keys is given, only these projects are joined.
+    """
+    # Build mapping of project key → set of funder keys
+    funders_by_project = {}
+    for row in tables.rows(funder_rel_csv):
+        funders_by_project.setdefault(int(row['project_key']), set()).add(int(row['funder_key']))
+
+    key_pairs = set()
+    for row in tables.rows(publication_rel_csv):
+        project_key = int(row['project_key'])
+        if project_keys is not None and project_key not in project_keys:
+            continue
+        for funder_key in funders_by_project.get(project_key, ()):
+            key_pairs.add((funder_key, int(row['publication_key'])))
+
+    pairs = {(natural_keys['funders'][funder_key], natural_keys['publications'][publication_key])
+             for funder_key, publication_key in key_pairs}
+    return [{"funder_name": funder_name, "doi": doi} for funder_name, doi in sorted(pairs) if funder_name and doi]
+
+def create_funder_publication_relationship(publication_rel_csv, funder_rel_csv, project_keys=None):
     """
     Create ACKNOWLEDGED_IN relationships between Funders and Publications.
     Uses project → funder and project → publication mappings to infer connections.
     """
-    # Build mapping of project_id → funder_name
-    funder_map = {}
-    with open(funder_rel_csv, 'r', encoding='utf-8') as f:
-        for row in csv.DictReader(f):
-            funder_map[row['project_id']] = row['funder_name']
+    try:
+        with span("ACKNOWLEDGED_IN"):
+            with span('decode'):
+                pairs = derive_funder_publication_pairs(publication_rel_csv, funder_rel_csv, project_keys)
+            sync_relationships("ACKNOWLEDGED_IN", FUNDER_REF, PUBLICATION_REF, pairs, show_progress=True)
+        logging.info(f"✅ Processed: {len(pairs)} funder-publication pairs")
+
+    except FileNotFoundError as e:
+        logging.error(f"❌ File not found: {e.filename}")
+        import_report.loader("ACKNOWLEDGED_IN").finish(error=e)
+    except Exception as e:
+        logging.error(f"❌ Error deriving funder-publication relationships: {e}")
+        import_report.loader("ACKNOWLEDGED_IN").finish(error=e)
 
-    # Define Cypher query for linking funders to publications
-    query = """
-    MATCH (f:Funder {name: $funder_name})
-    MATCH (pub:Publication {doi: $doi})
-    MERGE (f)-[:ACKNOWLEDGED_IN]->(pub)
+# -------------------------------------------------------------------------------------
+# Relationship: Funder ↔ Funder (precomputed collaboration)
+# -------------------------------------------------------------------------------------
+
+def create_funder_collaboration_relationship(csv_file, keep=None):
     """
-    def params(row):
-        return {
-            "funder_name": funder_map.get(row['project_id'], ''),
-            "doi": row['doi']
-        }
+    Create weighted COLLABORATES_WITH relationships between funders that share
+    projects or publications (see 08_build_funder_collaboration.py).
+    Every funder pair has one relationship; query it without direction.
+    """
+    if not tables.exists(csv_file):
+        logging.info(f"ℹ️ {csv_file} not found, skipping COLLABORATES_WITH (run 08_build_funder_collaboration.py)")
+        return
+    load_csv_and_sync(csv_file, "COLLABORATES_WITH", lambda row: {
+        "funder_name": natural_key('funders', row, 'funder_key'),
+        "partner_name": natural_key('funders', row, 'partner_key'),
+        "shared_projects": int(row['shared_projects']),
+        "shared_publications": int(row['shared_publications']),
+        "weight": float(row['weight'])
+    }, lambda rows: sync_relationships("COLLABORATES_WITH", FUNDER_REF, PARTNER_REF, rows, show_progress=True),
+        keep)
+
+# -------------------------------------------------------------------------------------
+# Keywords
+# -------------------------------------------------------------------------------------
+
+def create_keyword_nodes(csv_file, keep=None):
+    """
+    Create Keyword nodes from the keyword dictionary.
+    Keywords are identified by their normalised text (see keywords.py).
+    """
+    load_csv_and_sync(csv_file, "Keyword", lambda row: {
+        "name": row['keyword']
+    }, lambda rows: sync_nodes("Keyword", "name", rows, show_progress=True), keep)
+
+def create_project_keyword_relationship(csv_file, keep=None):
+    """
+    Create HAS_KEYWORD relationships between Project and Keyword nodes.
+    Matches by project ID and normalised keyword.
+    """
+    load_csv_and_sync(csv_file, "HAS_KEYWORD", lambda row: {
+        "project_id": natural_key('projects', row, 'project_key'),
+        "keyword": natural_key('keywords', row, 'keyword_key')
+    }, lambda rows: sync_relationships("HAS_KEYWORD", PROJECT_REF, KEYWORD_REF, rows, show_progress=True), keep)
+
+def create_keyword_related_relationship(csv_file, keep=None):
+    """
+    Create RELATED_TO relationships from every keyword to its most related
+    keywords (by co-occurrence in projects, see 07_build_keyword_cooccurrence.py).
+    """
+    if not tables.exists(csv_file):
+        logging.info(f"ℹ️ {csv_file} not found, skipping RELATED_TO (run 07_build_keyword_cooccurrence.py)")
+        return
+    load_csv_and_sync(csv_file, "RELATED_TO", lambda row: {
+        "keyword": natural_key('keywords', row, 'keyword_key'),
+        "related_keyword": natural_key('keywords', row, 'related_keyword_key'),
+        "cooccurrences": int(row['cooccurrences']),
+        "jaccard": float(row['jaccard'])
+    }, lambda rows: sync_relationships("RELATED_TO", KEYWORD_REF, RELATED_KEYWORD_REF, rows, show_progress=True),
+        keep)
+
+# -------------------------------------------------------------------------------------
+# Sampling
+# -------------------------------------------------------------------------------------
 
-    load_csv_and_run_batch(publication_rel_csv, query, params, show_progress=True)
+# Keys of the sampled slice (None = import everything), set in import_graph()
+sample_scope = None
+
+def build_sample_scope(sample_keys):
+    """
+    Collects the keys of the funders, countries, publications and keywords
+    linked to the sampled projects, so that only nodes relevant to the slice
+    are imported.
+    """
+    scope = {'projects': sample_keys, 'funders': set(), 'countries': set(), 'publications': set(),
+             'keywords': set()}
+    linked = [
+        (project_funder_rel_csv_file, 'funder_key', 'funders'),
+        (project_country_rel_csv_file, 'country_key', 'countries'),
+        (pub_project_rel_csv_file, 'publication_key', 'publications'),
+        (project_keyword_rel_csv_file, 'keyword_key', 'keywords'),
+    ]
+    for csv_file, field, kind in linked:
+        try:
+            for row in tables.rows(csv_file, ['project_key', field]):
+                if int(row['project_key']) in sample_keys:
+                    scope[kind].add(int(row[field]))
+        except FileNotFoundError:
+            pass
+    return scope
+
+def in_sample(kind, *fields):
+    """
+    Returns a row filter keeping rows whose integer key fields all belong to the
+    sampled projects/funders/countries/publications/keywords, or None if no
+    sample is active. Relationships between two nodes of the same kind pass both
+    key fields: a pair with one end outside the sample would match no node.
+    """
+    if sample_scope is None:
+        return None
+    keys = sample_scope[kind]
+    return lambda row: all(int(row[field]) in keys for field in fields)
 
 # -------------------------------------------------------------------------------------
 # Main Execution
 # -------------------------------------------------------------------------------------
 
-if __name__ == "__main__":
+def connect_graph_sink():
+    """Opens the configured graph sink; only the Neo4j sink needs credentials."""
+    if GRAPH_SINK == 'neo4j':
+        graph_sink = open_graph_sink(GRAPH_SINK, uri, auth=(username, read_neo4j_password(access_file)))
+    else:
+        graph_sink = open_graph_sink(GRAPH_SINK)
+    logging.info(f"🔌 Writing to graph sink: {GRAPH_SINK}")
+    # Empty counters of a sink that counts nothing are no sign of failed writes
+    import_report.counts_writes = graph_sink.counts_writes
+    return graph_sink
+
+def import_graph(graph_sink=None):
+    """
+    Imports all source tables into the graph sink and writes the import report.
+    graph_sink replaces the configured sink, e.g. a MemoryGraphSink that is
+    inspected afterwards (see check_import).
+    """
+    global sink, sample_scope
+
+    sink = graph_sink or connect_graph_sink()
+
+    # Load fingerprints of the previous import (empty on the first run).
+    # In-process sinks start empty, so they always receive the full snapshot.
+    if sink.persistent:
+        import_state.update(load_import_state(IMPORT_STATE_FILE))
+
+    # Dictionaries to decode the integer keys of the relation CSVs
+    load_natural_keys()
+
+    # Restrict the import to the sampled slice, if a sample is active
+    sample_keys = load_sample_keys()
+    sample_scope = None if sample_keys is None else build_sample_scope(sample_keys)
+    if sample_keys is not None:
+        logging.info(f"🎯 Importing sample of {len(sample_keys)} projects")
+
     # Create node types
-    create_project_nodes(projects_csv_file, limit=LIMIT_ENTRIES)
-    create_funder_nodes(funders_csv_file)
-    create_country_nodes(countries_csv_file)
+    create_project_nodes(projects_csv_file, keep=in_sample('projects', 'key'))
+    create_funder_nodes(funders_csv_file, keep=in_sample('funders', 'key'))
+    create_country_nodes(countries_csv_file, keep=in_sample('countries', 'key'))
 
     # Create relationships between nodes
-    create_project_funder_relationship(project_funder_rel_csv_file, limit=LIMIT_ENTRIES)
-    create_project_country_relationship(project_country_rel_csv_file, limit=LIMIT_ENTRIES)
-    create_publication_nodes(publication_csv_file)
-    create_project_publication_relationship(pub_project_rel_csv_file)
-    create_funder_publication_relationship(pub_project_rel_csv_file, project_funder_rel_csv_file)
-
-    # Clean up and close Neo4j connection
-    driver.close()
+    create_project_funder_relationship(project_funder_rel_csv_file, keep=in_sample('projects', 'project_key'))
+    create_project_country_relationship(project_country_rel_csv_file, keep=in_sample('projects', 'project_key'))
+    create_publication_nodes(publication_csv_file, keep=in_sample('publications', 'key'))
+    create_project_publication_relationship(pub_project_rel_csv_file, keep=in_sample('projects', 'project_key'))
+    create_funder_publication_relationship(pub_project_rel_csv_file, project_funder_rel_csv_file, sample_keys)
+
+    create_funder_collaboration_relationship(funder_collaboration_csv_file,
+                                             keep=in_sample('funders', 'funder_key', 'partner_key'))
+
+    # Keywords and their co-occurrence
+    create_keyword_nodes(keywords_csv_file, keep=in_sample('keywords', 'key'))
+    create_project_keyword_relationship(project_keyword_rel_csv_file, keep=in_sample('projects', 'project_key'))
+    create_keyword_related_relationship(keyword_related_csv_file,
+                                        keep=in_sample('keywords', 'keyword_key', 'related_keyword_key'))
+
+    # Clean up and close the graph sink (Neo4j connection)
+    sink.close()
+    if hasattr(sink, 'summary'):
+        logging.info(f"🧮 Graph contents: {sink.summary()}")
+    if hasattr(sink, 'write_json'):
+        for item in sink.write_json(RECORDED_STATEMENTS_JSON):
+            logging.info(f"📝 {item['batches']} batches, {item['rows']} rows "
+                         f"(max batch {max(item['batch_sizes'])}): {' '.join(item['statement'].split())}")
+        logging.info(f"📝 Recorded statements written to {RECORDED_STATEMENTS_JSON}")
+
+    write_import_report(IMPORT_REPORT_JSON, IMPORT_REPORT_PROM)
     logging.info("✅ Knowledge Graph successfully created and extended!")
+
+def write_import_report(json_path, prom_path=None):
+    """Writes the instrumentation report and points out suspicious loaders."""
+    import_report.write_json(json_path)
+    if prom_path:
+        import_report.write_prometheus(prom_path)
+    for hint in import_report.warnings():
+        logging.warning(f"⚠️ {hint}")
+    logging.info(f"📊 Import report written to {' and '.join(filter(None, [json_path, prom_path]))}")
+
+def check_graph_sink():
+    """
+    Checks that the configured graph sink writes with Neo4j's MERGE semantics
+    (see check_merge_semantics in graph_sink.py). Returns True if it does.
+    """
+    graph_sink = connect_graph_sink()
+    if not hasattr(graph_sink, 'snapshot') or not graph_sink.counts_writes:
+        logging.error(f"❌ The {GRAPH_SINK} sink does not write a graph that can be checked")
+        return False
+    try:
+        mismatches = check_merge_semantics(graph_sink)
+    finally:
+        graph_sink.close()
+    for mismatch in mismatches:
+        logging.error(f"❌ {mismatch}")
+    if not mismatches:
+        logging.info(f"✅ The {GRAPH_SINK} sink matches Neo4j's MERGE semantics")
+    return not mismatches
+
+# -------------------------------------------------------------------------------------
+# Import check
+# -------------------------------------------------------------------------------------
+
+# Graph of the synthetic tables of write_check_tables(): node counts per label and
+# relationship counts per type, for the sampled projects p1, p2 and for all projects
+CHECK_SAMPLE_KEYS = [0, 1]
+CHECK_SAMPLED_GRAPH = {
+    'Project': 2, 'Funder': 2, 'Country': 2, 'Publication': 2, 'Keyword': 2,
+    'FUNDED_BY': 3, 'LOCATED_IN': 2, 'HAS_PUBLICATION': 2, 'ACKNOWLEDGED_IN': 3,
+    'COLLABORATES_WITH': 1, 'HAS_KEYWORD': 2,
+}
+CHECK_FULL_GRAPH = {
+    'Project': 3, 'Funder': 3, 'Country': 2, 'Publication': 3, 'Keyword': 3,
+    'FUNDED_BY': 4, 'LOCATED_IN': 3, 'HAS_PUBLICATION': 4, 'ACKNOWLEDGED_IN': 5,
+    'COLLABORATES_WITH': 2, 'HAS_KEYWORD': 4, 'RELATED_TO': 2,
+}
+
+def write_check_tables(sample_keys=None, unreadable_citation=False):
+    """
+    Writes the synthetic source tables of check_import() to the CSV paths (relative
+    to the working directory): projects p1-p3, funders F1-F3, two countries,
+    publications d1-d3 and three keywords with their relations. Some funder and
+    keyword pairs link a sampled to an unsampled node. sample_keys writes a sample
+    manifest of these project keys. With unreadable_citation the citation count of
+    d3 cannot be parsed, so the Publication loader fails.
+    """
+    import csv
+    tables_rows = {
+        projects_csv_file: (
+            ['key', 'id', 'code', 'title', 'startDate', 'endDate', 'callIdentifier', 'keywords', 'summary',
+             'totalCost', 'fundedAmount'],
+            [[key, f'p{key + 1}', f'C{key + 1}', f'Project {key + 1}', '2020-01-01', '2022-12-31', 'CALL',
+              '', '', '1000.0', '800.0'] for key in range(3)]),
+        funders_csv_file: (['key', 'name', 'shortName'], [[0, 'F1', 'F1'], [1, 'F2', 'F2'], [2, 'F3', 'F3']]),
+        countries_csv_file: (['key', 'jurisdiction'], [[0, 'DE'], [1, 'FR']]),
+        project_funder_rel_csv_file: (['project_key', 'funder_key'], [[0, 0], [1, 1], [1, 0], [2, 2]]),
+        project_country_rel_csv_file: (['project_key', 'country_key'], [[0, 0], [1, 1], [2, 1]]),
+        publication_csv_file: (['key', 'doi', 'title', 'journal', 'citation_count'], [
+            [0, '10.1/d1', 'Paper 1', 'J', '3'],
+            [1, '10.1/d2', 'Paper 2', '', '0'],
+            [2, '10.1/d3', 'Paper 3', 'J', 'n/a' if unreadable_citation else '7'],
+        ]),
+        pub_project_rel_csv_file: (['project_key', 'publication_key', 'relevance'],
+                                   [[0, 0, 0.9], [1, 1, 0.8], [2, 2, 0.7], [2, 0, 0.6]]),
+        keywords_csv_file: (['key', 'keyword'], [[0, 'graphs'], [1, 'energy'], [2, 'climate']]),
+        project_keyword_rel_csv_file: (['project_key', 'keyword_key'], [[0, 0], [1, 1], [2, 2], [2, 1]]),
+        keyword_related_csv_file: (['keyword_key', 'related_keyword_key', 'cooccurrences', 'jaccard'],
+                                   [[1, 2, 1, 0.5], [2, 1, 1, 0.5]]),
+        funder_collaboration_csv_file: (['funder_key', 'partner_key', 'shared_projects', 'shared_publications',
+                                         'weight'], [[0, 1, 1, 1, 1.0], [0, 2, 0, 1, 0.5]]),
+    }
+    if sample_keys is not None:
+        tables_rows[SAMPLE_IDS_CSV] = (['project_key', 'project_id'], [[key, f'p{key + 1}'] for key in sample_keys])
+    elif os.path.exists(SAMPLE_IDS_CSV):
+        os.remove(SAMPLE_IDS_CSV)
+
+    for path, (header, rows) in tables_rows.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(header)
+            writer.writerows(rows)
+
+def check_import():
+    """
+    Runs import_graph() on the synthetic tables of write_check_tables() into one
+    MemoryGraphSink, five times in a temporary working directory, and compares
+    the graph and the import report with the expected result:
+    1. sampled import: only the sampled slice, and no loader sends a row that
+       matches no node (e.g. a funder pair with one funder outside the sample)
+    2. the same again: no row is sent
+    3. full import while the Publication loader fails
+    4. full import: the relationships to d3 are sent again and created
+    5. the same again: no row is sent
+    Returns a list of mismatches (empty if all is as expected).
+    """
+    import contextlib
+    import io
+    import tempfile
+    from graph_sink import MemoryGraphSink
+    global tables, import_report
+
+    runs = [
+        ("sampled import", CHECK_SAMPLE_KEYS, False, CHECK_SAMPLED_GRAPH),
+        ("sampled import again", CHECK_SAMPLE_KEYS, False, CHECK_SAMPLED_GRAPH),
+        ("full import, Publication loader failing", None, True,
+         {**CHECK_FULL_GRAPH, 'Publication': 2, 'HAS_PUBLICATION': 3, 'ACKNOWLEDGED_IN': 4}),
+        ("full import", None, False, CHECK_FULL_GRAPH),
+        ("full import again", None, False, CHECK_FULL_GRAPH),
+    ]
+    graph = MemoryGraphSink()
+    mismatches = []
+    cwd = os.getcwd()
+    import_state.clear()
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        # The loaders' logs and progress bars would only hide the result
+        logging.disable(logging.CRITICAL)
+        try:
+            for step, (name, sample_keys, unreadable_citation, expected) in enumerate(runs, start=1):
+                write_check_tables(sample_keys, unreadable_citation)
+                tables = PipelineTables()
+                import_report = ImportReport()
+                with contextlib.redirect_stderr(io.StringIO()):
+                    import_graph(graph)
+
+                summary = graph.summary()
+                if summary != expected:
+                    mismatches.append(f"{step}. {name}: graph {summary}, expected {expected}")
+                sent = {loader.name: loader.rows_sent for loader in import_report.loaders.values() if loader.rows_sent}
+                if name.endswith("again") and sent:
+                    mismatches.append(f"{step}. {name}: rows sent {sent}, expected none")
+                if not unreadable_citation:
+                    mismatches += [f"{step}. {name}: {hint}" for hint in import_report.warnings()]
+        finally:
+            logging.disable(logging.NOTSET)
+            os.chdir(cwd)
+    return mismatches
+
+
+def run(source_tables=None):
+    """
+    Imports all tables into the graph sink. source_tables hands over tables
+    in memory (see pipeline_tables.py); by default the CSV files are read.
+    """
+    global tables
+    if source_tables is not None:
+        tables = source_tables
+
+    # Set up logging to display status messages during processing
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+
+    with instrumented_run('05_import_to_neo4j'):
+        import_graph()
+
+
+if __name__ == "__main__":
+    # --check-sink: only check the configured graph sink (e.g. KG_GRAPH_SINK=memory)
+    if '--check-sink' in sys.argv[1:]:
+        logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+        sys.exit(0 if check_graph_sink() else 1)
+    # --check-import: run the loaders on synthetic tables into an in-memory graph
+    if '--check-import' in sys.argv[1:]:
+        logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+        problems = check_import()
+        for problem in problems:
+            logging.error(f"❌ {problem}")
+        if not problems:
+            logging.info("✅ The loaders import the synthetic tables as expected, the repeated runs send nothing")
+        sys.exit(1 if problems else 0)
+    run()
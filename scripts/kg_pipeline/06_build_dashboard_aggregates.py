@@ -0,0 +1,62 @@
+from instrumentation import instrumented_run, span
+
+# =====================================================================================
+# Script: Dashboard Aggregate Materialisation
+# Date: October 2026
+#
+# Description:
+# This script computes the aggregates behind all dashboard charts once, after the
+# extraction and enrichment steps, and writes them to a small versioned JSON artefact.
+# The dashboard reads this artefact at startup instead of loading and aggregating the
+# full CSVs, so its start time and memory no longer depend on the dataset size.
+#
+# Inputs:
+# - projects.csv, funders.csv, countries.csv, project_funder_rel.csv, project_country_rel.csv,
+#   project_publications.csv, publication_project_rel.csv, sample_project_ids.csv
+#
+# Output:
+# - dashboard_aggregates.json: one small table per chart, plus the aggregate version
+#   and the signatures (path, mtime, size) of the source files
+# - dashboard.duckdb: typed tables queried by the dashboard filters
+#
+# Notes:
+# - If a source CSV is rewritten later, the artefact becomes stale and the dashboard
+#   falls back to computing the aggregates live until this script is run again.
+#   The DuckDB file is rebuilt by the dashboard itself on the first filter query.
+# - Run by run_pipeline.py, the aggregates are computed from the tables in memory. The
+#   dashboard itself reads the CSV files, so its source tables must be persisted, and
+#   the DuckDB database is always built from them.
+# - Every run writes a timing report (see instrumentation.py).
+# =====================================================================================
+
+def build_dashboard_aggregates(tables=None):
+    """
+    Materialises the dashboard aggregates and the DuckDB database. tables hands
+    over the source tables in memory (see pipeline_tables.py).
+    """
+    from dashboard_aggregates import AGGREGATES_JSON, compute_aggregates, data_version, load_frames, write_aggregates
+    from dashboard_sql import DUCKDB_FILE, build_database
+
+    # Record the source signatures before reading, so a file rewritten while this
+    # script runs makes the artefact stale instead of silently mixing versions
+    sources = data_version()
+
+    frames = load_frames(tables)
+    with span('aggregate'):
+        aggregates = compute_aggregates(frames)
+    with span('write'):
+        write_aggregates(aggregates, sources)
+
+    print(f"📊 Saved {len(aggregates)} dashboard aggregates to {AGGREGATES_JSON}")
+
+    with span('duckdb'):
+        build_database()
+    print(f"🦆 Saved the dashboard query database to {DUCKDB_FILE}")
+
+def run(tables=None):
+    with instrumented_run('06_build_dashboard_aggregates'):
+        build_dashboard_aggregates(tables)
+
+
+if __name__ == "__main__":
+    run()
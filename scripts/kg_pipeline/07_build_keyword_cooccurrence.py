@@ -0,0 +1,160 @@
+import time
+from instrumentation import instrumented_run, span
+from keywords import KEYWORD_RELATED_CSV, KEYWORD_TRENDS_CSV, PROJECT_KEYWORD_REL_CSV
+from pipeline_tables import PipelineTables
+from sampling import load_sample_keys
+
+# =====================================================================================
+# Script: Keyword Co-occurrence and Trends
+# Date: October 2026
+#
+# Description:
+# This script computes which keywords are used together and how keyword use develops
+# over the years, from the normalised project-keyword pairs written by
+# 02_extract_projects_to_csv.py. Both are sparse matrix products on the integer keys
+# instead of loops over projects:
+# - X is the project x keyword incidence matrix (CSR, one 1 per project-keyword pair)
+# - co-occurrence C = X^T X: C[a, b] = number of projects having keywords a and b
+# - trends T = X^T Y, with Y the project x start year incidence matrix
+#
+# For every keyword, the TOP_RELATED keywords with the highest Jaccard similarity
+# (shared projects / projects having either keyword) are kept; the top-N selection
+# is one vectorised sort over all non-zeros of C.
+#
+# Inputs:
+# - project_keyword_rel.csv, projects.csv (start dates), sample_project_ids.csv
+#
+# Output:
+# - keyword_related.csv: keyword_key, related_keyword_key, cooccurrences, jaccard
+#   (imported by 05 as RELATED_TO relationships between Keyword nodes)
+# - keyword_trends.csv: keyword_key, year, projects
+#
+# Run by run_pipeline.py, the inputs come from memory (see pipeline_tables.py).
+# Every run writes a timing report (see instrumentation.py).
+# =====================================================================================
+
+# -------------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------------
+PROJECTS_CSV = 'data/projects_data_csv/projects.csv'
+
+TOP_RELATED = 10            # Related keywords kept per keyword
+MIN_KEYWORD_PROJECTS = 2    # Keywords of fewer projects get no related keywords
+MIN_COOCCURRENCES = 2       # Minimum number of shared projects of two related keywords
+
+
+def load_incidence(rel_csv=PROJECT_KEYWORD_REL_CSV, project_keys=None, tables=None):
+    """
+    Reads the project-keyword pairs (restricted to project_keys, if given).
+    Returns the incidence matrix X (projects x keywords, CSR) and the project
+    keys of its rows. Columns are keyword keys.
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+    pairs = (tables or PipelineTables()).read(rel_csv, dtype={'project_key': np.int32, 'keyword_key': np.int32})
+    if project_keys is not None:
+        pairs = pairs[pairs['project_key'].isin(project_keys)]
+    rows, projects = pd.factorize(pairs['project_key'])
+    columns = pairs['keyword_key'].to_numpy()
+    n_keywords = int(columns.max()) + 1 if len(columns) else 0
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)),
+                                  shape=(len(projects), n_keywords))
+    # A pair listed twice still counts once
+    incidence.sum_duplicates()
+    incidence.data[:] = 1
+    return incidence, projects
+
+def cooccurrence(incidence, min_keyword_projects=MIN_KEYWORD_PROJECTS):
+    """
+    Returns the keyword co-occurrence matrix C = X^T X (CSR, diagonal removed)
+    and the number of projects per keyword. Keywords of fewer than
+    min_keyword_projects projects are left out of the product.
+    """
+    import numpy as np
+    keyword_projects = np.asarray(incidence.sum(axis=0)).ravel()
+    frequent = (keyword_projects >= min_keyword_projects).astype(np.int32)
+    kept = incidence.copy()
+    kept.data *= frequent[kept.indices]
+    kept.eliminate_zeros()
+    matrix = (kept.T @ kept).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return matrix, keyword_projects
+
+def top_related(matrix, keyword_projects, top=TOP_RELATED, min_cooccurrences=MIN_COOCCURRENCES):
+    """
+    Selects the `top` related keywords of every keyword by Jaccard similarity.
+    Returns a frame keyword_key, related_keyword_key, cooccurrences, jaccard.
+    """
+    import numpy as np
+    import pandas as pd
+    keyword = np.repeat(np.arange(matrix.shape[0], dtype=np.int32), np.diff(matrix.indptr))
+    related = matrix.indices
+    counts = matrix.data
+    keep = counts >= min_cooccurrences
+    keyword, related, counts = keyword[keep], related[keep], counts[keep]
+    jaccard = counts / (keyword_projects[keyword] + keyword_projects[related] - counts)
+
+    # Sort by keyword, then best first; the rank is the position within the keyword's run
+    order = np.lexsort((related, -jaccard, keyword))
+    keyword, related, counts, jaccard = keyword[order], related[order], counts[order], jaccard[order]
+    starts = np.searchsorted(keyword, keyword, side='left')
+    best = np.arange(len(keyword)) - starts < top
+    return pd.DataFrame({
+        'keyword_key': keyword[best],
+        'related_keyword_key': related[best],
+        'cooccurrences': counts[best],
+        'jaccard': jaccard[best].round(4),
+    })
+
+def keyword_trends(incidence, projects, projects_csv=PROJECTS_CSV, tables=None):
+    """
+    Returns the number of projects per keyword and start year as a frame
+    keyword_key, year, projects (only non-zero counts).
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+    start_dates = (tables or PipelineTables()).read(projects_csv, usecols=['key', 'startDate'],
+                                                    dtype={'key': np.int32, 'startDate': str}).set_index('key')['startDate']
+    start_dates = start_dates[~start_dates.index.duplicated()]  # first row of a key listed twice
+    years = pd.to_numeric(start_dates.reindex(projects).str[:4], errors='coerce').to_numpy()
+    dated = ~np.isnan(years)
+    year_codes, year_values = pd.factorize(years[dated].astype(np.int32), sort=True)
+    by_year = sparse.csr_matrix((np.ones(len(year_codes), dtype=np.int32), (np.flatnonzero(dated), year_codes)),
+                                shape=(len(projects), len(year_values)))
+    trends = (incidence.T @ by_year).tocoo()
+    return pd.DataFrame({
+        'keyword_key': trends.row,
+        'year': np.asarray(year_values)[trends.col],
+        'projects': trends.data,
+    }).sort_values(['keyword_key', 'year'])
+
+
+def build_keyword_cooccurrence(tables):
+    """Computes the related keywords and keyword trends and hands them on via tables."""
+    started = time.perf_counter()
+    incidence, projects = load_incidence(project_keys=load_sample_keys(), tables=tables)
+    print(f"🏷️ Loaded {incidence.nnz} project-keyword pairs of {len(projects)} projects")
+
+    with span('cooccurrence'):
+        matrix, keyword_projects = cooccurrence(incidence)
+        related = top_related(matrix, keyword_projects)
+    tables.write(KEYWORD_RELATED_CSV, related)
+    print(f"🔗 Saved {len(related)} related keyword pairs to {KEYWORD_RELATED_CSV} "
+          f"({matrix.nnz} co-occurring pairs in total)")
+
+    with span('trends'):
+        trends = keyword_trends(incidence, projects, tables=tables)
+    tables.write(KEYWORD_TRENDS_CSV, trends)
+    print(f"📈 Saved {len(trends)} keyword-year counts to {KEYWORD_TRENDS_CSV}")
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+
+def run(tables=None):
+    with instrumented_run('07_build_keyword_cooccurrence'):
+        build_keyword_cooccurrence(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,143 @@
+import time
+from instrumentation import instrumented_run, span
+from pipeline_tables import PipelineTables
+from sampling import load_sample_keys
+
+# =====================================================================================
+# Script: Funder Collaboration Network
+# Date: October 2026
+#
+# Description:
+# This script computes how strongly funders collaborate, offline and from the relation
+# CSVs, so that the Knowledge Graph can answer "who works with whom" with one hop
+# (Funder)-[:COLLABORATES_WITH]-(Funder) instead of the 4-hop pattern
+# Funder<-Project->Publication<-Project->Funder, which explodes on hub funders.
+#
+# Both weights are sparse matrix products of incidence matrices over the integer keys:
+# - F: project x funder (FUNDED_BY), P: publication x project (HAS_PUBLICATION)
+# - shared projects     = F^T F            (projects funded by both funders)
+# - shared publications = A^T A, A = P F   (publications acknowledging both funders,
+#                                           i.e. two ACKNOWLEDGED_IN relationships)
+# Only the upper triangle is kept: every funder pair appears once.
+#
+# Inputs:
+# - project_funder_rel.csv, publication_project_rel.csv, sample_project_ids.csv
+#
+# Output:
+# - funder_collaboration.csv: funder_key, partner_key, shared_projects,
+#   shared_publications, weight (keys of funders.csv; imported by 05 as
+#   COLLABORATES_WITH relationships)
+#
+# Run by run_pipeline.py, the inputs come from memory (see pipeline_tables.py).
+# Every run writes a timing report (see instrumentation.py).
+# =====================================================================================
+
+# -------------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------------
+PROJECT_FUNDER_REL_CSV = 'data/projects_data_csv/project_funder_rel.csv'
+PUBLICATION_PROJECT_REL_CSV = 'data/projects_data_csv/publication_project_rel.csv'
+FUNDER_COLLABORATION_CSV = 'data/projects_data_csv/funder_collaboration.csv'
+
+# weight = SHARED_PROJECT_WEIGHT * shared_projects + SHARED_PUBLICATION_WEIGHT * shared_publications
+SHARED_PROJECT_WEIGHT = 1.0
+SHARED_PUBLICATION_WEIGHT = 1.0
+MIN_WEIGHT = 1.0    # Funder pairs with a lower weight are not written
+
+
+def incidence_matrix(rows, columns, shape):
+    """Returns a 0/1 CSR matrix with a 1 at every (row, column) pair."""
+    import numpy as np
+    from scipy import sparse
+    matrix = sparse.csr_matrix((np.ones(len(rows), dtype=np.int32), (rows, columns)), shape=shape)
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+def load_incidence(funder_rel_csv=PROJECT_FUNDER_REL_CSV, publication_rel_csv=PUBLICATION_PROJECT_REL_CSV,
+                   project_keys=None, tables=None):
+    """
+    Reads the relation tables (restricted to project_keys, if given) and returns
+    the incidence matrices F (project x funder) and P (publication x project).
+    The columns of F are the funder keys.
+    """
+    import numpy as np
+    import pandas as pd
+    tables = tables or PipelineTables()
+    project_funders = tables.read(funder_rel_csv, dtype={'project_key': np.int32, 'funder_key': np.int32})
+    try:
+        publications = tables.read(publication_rel_csv, usecols=['project_key', 'publication_key'],
+                                   dtype={'project_key': np.int32, 'publication_key': np.int32})
+    except FileNotFoundError:
+        publications = pd.DataFrame({'project_key': [], 'publication_key': []}, dtype=np.int32)
+    if project_keys is not None:
+        project_funders = project_funders[project_funders['project_key'].isin(project_keys)]
+        publications = publications[publications['project_key'].isin(project_keys)]
+
+    projects = pd.Index(pd.unique(pd.concat([project_funders['project_key'], publications['project_key']])))
+    publication_codes, publication_keys = pd.factorize(publications['publication_key'])
+    n_funders = int(project_funders['funder_key'].max()) + 1 if len(project_funders) else 0
+
+    funded = incidence_matrix(projects.get_indexer(project_funders['project_key']),
+                              project_funders['funder_key'].to_numpy(), (len(projects), n_funders))
+    published = incidence_matrix(publication_codes, projects.get_indexer(publications['project_key']),
+                                 (len(publication_keys), len(projects)))
+    return funded, published
+
+def pair_counts(matrix, name):
+    """Returns the upper triangle of a funder x funder matrix as a frame a, b, name."""
+    import pandas as pd
+    from scipy import sparse
+    pairs = sparse.triu(matrix, k=1).tocoo()
+    return pd.DataFrame({'a': pairs.row, 'b': pairs.col, name: pairs.data})
+
+def funder_collaboration(funded, published):
+    """
+    Computes the shared projects and shared publications of every funder pair.
+    Returns a frame funder_key, partner_key, shared_projects,
+    shared_publications, weight, strongest pairs first.
+    """
+    import numpy as np
+    import pandas as pd
+    shared_projects = pair_counts(funded.T @ funded, 'shared_projects')
+
+    acknowledged = published @ funded
+    acknowledged.data[:] = 1
+    shared_publications = pair_counts(acknowledged.T @ acknowledged, 'shared_publications')
+
+    pairs = shared_projects.merge(shared_publications, on=['a', 'b'], how='outer').fillna(0)
+    pairs = pairs.astype({'shared_projects': np.int64, 'shared_publications': np.int64})
+    pairs['weight'] = (SHARED_PROJECT_WEIGHT * pairs['shared_projects']
+                       + SHARED_PUBLICATION_WEIGHT * pairs['shared_publications'])
+    pairs = pairs[pairs['weight'] >= MIN_WEIGHT].sort_values('weight', ascending=False)
+
+    return pd.DataFrame({
+        'funder_key': pairs['a'].to_numpy(),
+        'partner_key': pairs['b'].to_numpy(),
+        'shared_projects': pairs['shared_projects'].to_numpy(),
+        'shared_publications': pairs['shared_publications'].to_numpy(),
+        'weight': pairs['weight'].to_numpy(),
+    })
+
+
+def build_funder_collaboration(tables):
+    """Computes the funder collaboration network and hands it on via tables."""
+    started = time.perf_counter()
+    funded, published = load_incidence(project_keys=load_sample_keys(), tables=tables)
+    funder_count = int((funded.getnnz(axis=0) > 0).sum())
+    print(f"🏦 Loaded {funded.nnz} project-funder and {published.nnz} publication-project pairs "
+          f"({funder_count} funders)")
+
+    with span('transform'):
+        collaboration = funder_collaboration(funded, published)
+    tables.write(FUNDER_COLLABORATION_CSV, collaboration)
+    print(f"🤝 Saved {len(collaboration)} collaborating funder pairs to {FUNDER_COLLABORATION_CSV}")
+    print(f"✅ Done in {time.perf_counter() - started:.1f}s")
+
+def run(tables=None):
+    with instrumented_run('08_build_funder_collaboration'):
+        build_funder_collaboration(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
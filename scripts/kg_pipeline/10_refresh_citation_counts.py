@@ -0,0 +1,156 @@
+import importlib
+import logging
+from tqdm import tqdm
+from instrumentation import instrumented_run, span
+from pipeline_tables import PipelineTables
+
+# =====================================================================================
+# Script: Citation Count Refresh via CrossRef
+# Date: October 2026
+#
+# Description:
+# The citation counts in project_publications.csv are a snapshot of the time when
+# 04_fetch_project_publications.py found the publications. This script refreshes only
+# the citation counts of the publications that are already known, without searching
+# CrossRef by project title again:
+# - the known DOIs are looked up in batches of DOI_BATCH_SIZE per request
+#   (filter=doi:a,doi:b,...), returning only the DOI and the citation count
+# - all requests go through one requests.Session: one pooled keep-alive connection,
+#   retries with backoff on rate limits (429) and server errors
+# - 100 DOIs per request instead of one title search per project: a refresh costs a
+#   small fraction of the requests of a full re-fetch
+#
+# Inputs:
+# - project_publications.csv: Publications found by 04 (DOI and citation count)
+#
+# Outputs:
+# - project_publications.csv: the same table with refreshed citation counts
+# - Publication nodes: citation_count of the publications already imported by
+#   05_import_to_neo4j.py (same graph sink and import state)
+#
+# Notes:
+# - DOIs CrossRef does not return (or batches that fail) keep their citation count.
+# - Only the nodes whose count changed are written, and the import state is updated,
+#   so the next run of 05 does not send these publications again. The metrics of this
+#   write go to the citation refresh report of 05 (CITATION_REFRESH_REPORT_JSON).
+# - Run 06 afterwards to update the dashboard aggregates.
+# - Every run writes a timing report with the time spent in HTTP requests (see
+#   instrumentation.py).
+# =====================================================================================
+
+# -------------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------------
+PUBLICATIONS_CSV = 'data/projects_data_csv/project_publications.csv'
+
+CROSSREF_WORKS_URL = 'https://api.crossref.org/works'
+DOI_BATCH_SIZE = 100       # DOIs per request
+HTTP_RETRIES = 3           # Retries per request on 429/5xx and connection errors
+HTTP_TIMEOUT = 30          # Seconds per request
+
+UPDATE_GRAPH = True        # Also update the Publication nodes (graph sink of 05)
+
+
+def crossref_session():
+    """
+    Returns a requests.Session for the CrossRef API with a pooled keep-alive
+    connection and retries with exponential backoff.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retries = Retry(total=HTTP_RETRIES, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                    allowed_methods=('GET',), raise_on_status=False)
+    session = requests.Session()
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=retries))
+    return session
+
+def fetch_citation_counts(session, dois):
+    """
+    Looks up one batch of DOIs with a single CrossRef request.
+    Returns the citation count by lower-case DOI (DOIs are case-insensitive),
+    or None if the request failed.
+    """
+    import requests
+
+    params = {
+        'filter': ','.join(f'doi:{doi}' for doi in dois),
+        'select': 'DOI,is-referenced-by-count',
+        'rows': len(dois),
+    }
+    try:
+        with span('http'):
+            response = session.get(CROSSREF_WORKS_URL, params=params, timeout=HTTP_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"⚠️ Request failed for {len(dois)} DOIs: {e}")
+        return None
+    if response.status_code != 200:
+        print(f"⚠️ Error for {len(dois)} DOIs: HTTP {response.status_code}")
+        return None
+
+    with span('decode'):
+        items = response.json().get('message', {}).get('items', [])
+    return {item['DOI'].lower(): item.get('is-referenced-by-count', 0) for item in items if item.get('DOI')}
+
+def refresh_citation_counts(tables):
+    """
+    Refreshes the citation counts of all known publications in
+    project_publications.csv and (if UPDATE_GRAPH) in the graph.
+    """
+    # ---------------------------------------------------------------------------------
+    # Load the known DOIs
+    # ---------------------------------------------------------------------------------
+    publications_df = tables.read(PUBLICATIONS_CSV)
+    previous_rows = tables.rows(PUBLICATIONS_CSV) if UPDATE_GRAPH else []
+
+    # A comma would split the DOI in the filter list; such DOIs keep their count
+    dois = [doi for doi in publications_df['doi'].dropna().unique() if ',' not in doi]
+    batches = [dois[start:start + DOI_BATCH_SIZE] for start in range(0, len(dois), DOI_BATCH_SIZE)]
+    print(f"🔍 Refreshing citation counts of {len(dois)} publications in {len(batches)} requests...")
+
+    # ---------------------------------------------------------------------------------
+    # Query CrossRef batch by batch
+    # ---------------------------------------------------------------------------------
+    counts = {}
+    failed = 0
+    with crossref_session() as session:
+        for batch in tqdm(batches, desc="Fetching citation counts", unit="batch"):
+            found = fetch_citation_counts(session, batch)
+            if found is None:
+                failed += 1
+            else:
+                counts.update(found)
+
+    # ---------------------------------------------------------------------------------
+    # Update the citation counts that changed
+    # ---------------------------------------------------------------------------------
+    with span('transform'):
+        refreshed = publications_df['doi'].str.lower().map(counts)
+        # A missing count is stored as 0, so 0 is not a change
+        previous = publications_df['citation_count'].fillna(0)
+        publications_df['citation_count'] = refreshed.fillna(previous).astype('int64')
+        changed = publications_df[publications_df['citation_count'] != previous]
+    print(f"📈 {len(changed)} of {len(publications_df)} citation counts changed "
+          f"({len(publications_df) - refreshed.notna().sum()} not returned, {failed} failed requests)")
+
+    if changed.empty:
+        return
+    tables.write(PUBLICATIONS_CSV, publications_df)
+    print(f"📄 Saved refreshed citation counts to {PUBLICATIONS_CSV}")
+
+    if UPDATE_GRAPH:
+        importer = importlib.import_module('05_import_to_neo4j')
+        with span('graph'):
+            updated = importer.refresh_publication_citations(
+                previous_rows, dict(zip(changed['doi'], changed['citation_count'].tolist())))
+        print(f"🔗 Updated citation_count of {updated} Publication nodes")
+
+def run(tables=None):
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
+    with instrumented_run('10_refresh_citation_counts'):
+        refresh_citation_counts(tables or PipelineTables())
+
+
+if __name__ == "__main__":
+    run()
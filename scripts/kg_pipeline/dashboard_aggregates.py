@@ -0,0 +1,365 @@
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+from instrumentation import span
+from pipeline_tables import PipelineTables
+from sampling import SAMPLE_IDS_CSV, load_sample_keys
+from surrogate_keys import key_lookup
+
+# =====================================================================================
+# Module: Dashboard aggregates
+# Date: October 2026
+#
+# Description:
+# Loads the pipeline CSVs for the dashboard and computes the small aggregate tables
+# behind every dashboard chart. The same functions are used by the materialisation
+# stage (06_build_dashboard_aggregates.py), which writes all aggregates to a versioned
+# JSON artefact, and by the dashboard itself when that artefact is missing or stale.
+#
+# An artefact is fresh if it was built by the current AGGREGATES_VERSION from source
+# files with the same (path, mtime, size) signatures as the ones on disk now.
+#
+# The relation CSVs hold integer key pairs: they are filtered and joined on the keys
+# and decoded to project IDs, funder names, countries and DOIs with the dictionary
+# tables (projects, funders, countries, project_publications) only once.
+#
+# Run by run_pipeline.py, the materialisation stage reads the source tables from memory
+# (see pipeline_tables.py); the dashboard always reads the CSVs.
+# =====================================================================================
+
+# Bump whenever an aggregate changes its definition or columns
+AGGREGATES_VERSION = 2
+
+DATA_DIR = 'data/projects_data_csv'
+AGGREGATES_JSON = os.path.join(DATA_DIR, 'dashboard_aggregates.json')
+
+# Source files of the dashboard
+SOURCE_FILES = {
+    'projects': os.path.join(DATA_DIR, 'projects.csv'),
+    'funders': os.path.join(DATA_DIR, 'funders.csv'),
+    'countries': os.path.join(DATA_DIR, 'countries.csv'),
+    'project_funders': os.path.join(DATA_DIR, 'project_funder_rel.csv'),
+    'project_countries': os.path.join(DATA_DIR, 'project_country_rel.csv'),
+    'project_publications': os.path.join(DATA_DIR, 'project_publications.csv'),
+    'publication_project_rel': os.path.join(DATA_DIR, 'publication_project_rel.csv'),
+    'sample': SAMPLE_IDS_CSV,
+}
+
+# Columns the dashboard reads from each source CSV, with their dtypes. Everything else
+# (e.g. the long summary and keywords texts of projects.csv) is never loaded, and
+# repeated strings are stored once as categories.
+SOURCE_COLUMNS = {
+    'projects': {'key': 'int32', 'id': 'object', 'title': 'object', 'startDate': 'object', 'endDate': 'object',
+                 'fundedAmount': 'float64'},
+    'funders': {'key': 'int32', 'name': 'object'},
+    'countries': {'key': 'int32', 'jurisdiction': 'object'},
+    'project_funders': {'project_key': 'int32', 'funder_key': 'int32'},
+    'project_countries': {'project_key': 'int32', 'country_key': 'int32'},
+    'project_publications': {'key': 'int32', 'doi': 'object', 'title': 'object', 'journal': 'category',
+                             'citation_count': 'object'},
+    'publication_project_rel': {'project_key': 'int32', 'publication_key': 'int32'},
+}
+
+# Columns of the tables passed to prepare_frames (relation tables: decoded natural IDs)
+PROJECT_COLUMNS = ['id', 'title', 'startDate', 'endDate', 'fundedAmount']
+PUBLICATION_COLUMNS = ['doi', 'title', 'journal', 'citation_count']
+
+# Upper bound of points kept for the duration vs. funding scatter plot
+SCATTER_MAX_POINTS = 5000
+
+# Cells (duration, funding) of the 2-D histogram that replaces the scatter plot
+# when there are more points than SCATTER_MAX_POINTS
+GRID_BINS = (60, 40)
+
+
+# -------------------------------------------------------------------------------------
+# Source files
+# -------------------------------------------------------------------------------------
+
+def file_signature(path):
+    """
+    Returns (path, mtime, size) of a file; missing files get (path, None, None).
+    Any rewrite of the file changes its signature.
+    """
+    try:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        return (path, None, None)
+
+def data_version():
+    """Returns the signatures of all source files."""
+    return tuple(file_signature(path) for path in SOURCE_FILES.values())
+
+def read_table(name, tables=None):
+    """Reads the needed columns of one source table with compact dtypes."""
+    columns = SOURCE_COLUMNS[name]
+    return (tables or PipelineTables()).read(SOURCE_FILES[name], usecols=list(columns), dtype=columns)
+
+def decode_keys(keys, dictionary, column):
+    """
+    Decodes a column of integer keys with a dictionary table (key and natural ID
+    column) into a categorical of the natural IDs, without hashing any string.
+    Keys missing from the dictionary become NaN; a key listed twice is decoded with
+    its first row, as the categories must be unique.
+    """
+    dictionary = dictionary.dropna(subset=[column]).drop_duplicates(subset='key')
+    keys = np.asarray(keys, dtype=np.int64)
+    lookup = key_lookup(dictionary['key'], size=keys.max() + 1 if len(keys) else 0)
+    return pd.Categorical.from_codes(lookup[keys], categories=pd.Index(dictionary[column].to_numpy(dtype=object)))
+
+def load_frames(tables=None):
+    """
+    Reads the pipeline tables (from tables if given, else the CSVs), restricts
+    them to the project sample, decodes the integer keys and adds the derived
+    columns, maps and joins used by the charts.
+    Returns a dict of frames and maps.
+    """
+    projects = read_table('projects', tables)
+    funders = read_table('funders', tables)
+    countries = read_table('countries', tables)
+    project_funders = read_table('project_funders', tables)
+    project_countries = read_table('project_countries', tables)
+    project_publications = read_table('project_publications', tables)
+    publication_project_rel = read_table('publication_project_rel', tables)
+
+    # Sampling: show the same project slice that 04 and 05 processed
+    sample_keys = load_sample_keys()
+    if sample_keys is not None:
+        sample_keys = np.fromiter(sample_keys, dtype=np.int64)
+        projects = projects[projects['key'].isin(sample_keys)]
+        project_funders = project_funders[project_funders['project_key'].isin(sample_keys)]
+        project_countries = project_countries[project_countries['project_key'].isin(sample_keys)]
+        publication_project_rel = publication_project_rel[publication_project_rel['project_key'].isin(sample_keys)]
+        project_publications = project_publications[
+            project_publications['key'].isin(publication_project_rel['publication_key'])]
+
+    with span('decode'):
+        funder_names = pd.DataFrame({'project_id': decode_keys(project_funders['project_key'], projects, 'id'),
+                                     'funder_name': decode_keys(project_funders['funder_key'], funders, 'name')})
+        country_names = pd.DataFrame({'project_id': decode_keys(project_countries['project_key'], projects, 'id'),
+                                      'country': decode_keys(project_countries['country_key'], countries,
+                                                             'jurisdiction')})
+        publication_dois = pd.DataFrame({
+            'project_id': decode_keys(publication_project_rel['project_key'], projects, 'id'),
+            'doi': np.asarray(decode_keys(publication_project_rel['publication_key'], project_publications, 'doi'),
+                              dtype=object)})
+
+    with span('transform'):
+        return prepare_frames(projects, funder_names, country_names, project_publications, publication_dois,
+                              is_sample=sample_keys is not None)
+
+def _categories(series):
+    """Repeated strings as a category of only the values still present."""
+    return series.astype('category').cat.remove_unused_categories()
+
+def prepare_frames(projects, project_funders, project_countries, project_publications,
+                   publication_project_rel, is_sample=False):
+    """
+    Adds the derived columns, maps and joins used by the charts to the raw tables
+    (same columns as the CSVs) and converts them to compact dtypes: real datetimes,
+    downcast numbers and categories for repeated strings.
+    Returns a dict of frames and maps; the frames are shared, so treat them as read-only.
+    """
+    projects = projects[PROJECT_COLUMNS].copy()
+    projects['startDate'] = pd.to_datetime(projects['startDate'], errors='coerce')
+    projects['endDate'] = pd.to_datetime(projects['endDate'], errors='coerce')
+    projects['fundedAmount'] = pd.to_numeric(projects['fundedAmount'], errors='coerce', downcast='float')
+    projects['startYear'] = projects['startDate'].dt.year.astype('Int16')
+    projects['project_duration_days'] = pd.to_numeric((projects['endDate'] - projects['startDate']).dt.days,
+                                                      downcast='float')
+
+    # Project IDs in the relation tables point into one shared dictionary of projects
+    project_ids = pd.CategoricalDtype(pd.unique(projects['id']))
+    project_funders = project_funders[['project_id', 'funder_name']].assign(
+        project_id=lambda df: df['project_id'].astype(project_ids),
+        funder_name=lambda df: _categories(df['funder_name']))
+    project_countries = project_countries[['project_id', 'country']].assign(
+        project_id=lambda df: df['project_id'].astype(project_ids),
+        country=lambda df: _categories(df['country']))
+    publication_project_rel = publication_project_rel[['project_id', 'doi']].assign(
+        project_id=lambda df: df['project_id'].astype(project_ids))
+    project_publications = project_publications[PUBLICATION_COLUMNS].copy()
+    project_publications['journal'] = _categories(project_publications['journal'])
+    project_publications['citation_count'] = pd.to_numeric(
+        pd.to_numeric(project_publications['citation_count'], errors='coerce').fillna(0), downcast='integer')
+
+    titles = projects.set_index('id')['title']
+    return {
+        'projects': projects,
+        'project_funders': project_funders,
+        'project_countries': project_countries,
+        'project_publications': project_publications,
+        'publication_project_rel': publication_project_rel,
+        'is_sample': is_sample,
+        'project_titles': titles[~titles.index.duplicated()],
+        # Joins used by several charts, restricted to the columns they need
+        'funder_funding': pd.merge(project_funders, projects[['id', 'fundedAmount']],
+                                   left_on='project_id', right_on='id', how='left')[['funder_name', 'fundedAmount']],
+        'publication_citations': pd.merge(publication_project_rel, project_publications[['doi', 'citation_count']],
+                                          on='doi', how='left')[['project_id', 'citation_count']],
+    }
+
+
+# -------------------------------------------------------------------------------------
+# Aggregates (one per chart)
+# -------------------------------------------------------------------------------------
+
+def _labels(index):
+    # Plain strings: a categorical column would make seaborn draw every category
+    return index.astype(object)
+
+def _with_titles(df, titles):
+    df['project_id'] = df['project_id'].astype(object)
+    df['title'] = df['project_id'].map(titles).fillna(df['project_id'])
+    return df
+
+def kpis(frames):
+    years = frames['projects']['startYear']
+    return pd.DataFrame([{
+        'total_projects': len(frames['projects']),
+        'earliest_year': int(years.min()) if years.notna().any() else None,
+        'latest_year': int(years.max()) if years.notna().any() else None,
+        'is_sample': frames['is_sample'],
+    }])
+
+def projects_per_year(frames):
+    counts = frames['projects']['startYear'].value_counts().sort_index()
+    return pd.DataFrame({'startYear': counts.index, 'projects': counts.values})
+
+def avg_funding_per_year(frames):
+    means = frames['projects'].groupby('startYear')['fundedAmount'].mean()
+    return pd.DataFrame({'startYear': means.index, 'fundedAmount': means.values})
+
+def top_countries(frames):
+    counts = frames['project_countries']['country'].value_counts().head(15)
+    return pd.DataFrame({'country': _labels(counts.index), 'projects': counts.values})
+
+def top_funders_by_count(frames):
+    counts = frames['project_funders']['funder_name'].value_counts().head(10)
+    return pd.DataFrame({'funder_name': _labels(counts.index), 'projects': counts.values})
+
+def top_funders_by_total(frames):
+    sums = frames['funder_funding'].groupby('funder_name', observed=True)['fundedAmount'].sum().sort_values(ascending=False).head(10)
+    return pd.DataFrame({'funder_name': _labels(sums.index), 'fundedAmount': sums.values})
+
+def top_funders_by_average(frames):
+    means = frames['funder_funding'].groupby('funder_name', observed=True)['fundedAmount'].mean().sort_values(ascending=False).head(10)
+    return pd.DataFrame({'funder_name': _labels(means.index), 'fundedAmount': means.values})
+
+def _duration_and_funding(projects):
+    valid = projects[(projects['project_duration_days'] > 0) & (projects['fundedAmount'] > 0)]
+    return valid[['project_duration_days', 'fundedAmount']]
+
+def duration_vs_funding(frames):
+    valid = _duration_and_funding(frames['projects'])
+    # Keep the artefact small: a fixed random subset is enough for a scatter plot
+    if len(valid) > SCATTER_MAX_POINTS:
+        valid = valid.sample(SCATTER_MAX_POINTS, random_state=0)
+    return valid.reset_index(drop=True)
+
+def duration_funding_grid(frames, bins=GRID_BINS):
+    """Counts of all (duration, funding) points per cell; empty cells are left out."""
+    valid = _duration_and_funding(frames['projects'])
+    columns = ['duration_left', 'duration_right', 'funding_left', 'funding_right', 'count']
+    if valid.empty:
+        return pd.DataFrame({column: [] for column in columns})
+    counts, x_edges, y_edges = np.histogram2d(valid['project_duration_days'], valid['fundedAmount'], bins=bins)
+    i, j = np.nonzero(counts)
+    return pd.DataFrame({
+        'duration_left': x_edges[i], 'duration_right': x_edges[i + 1],
+        'funding_left': y_edges[j], 'funding_right': y_edges[j + 1],
+        'count': counts[i, j].astype(int),
+    })
+
+def top_projects_by_publications(frames):
+    counts = frames['publication_project_rel']['project_id'].value_counts().head(10)
+    top = pd.DataFrame({'project_id': _labels(counts.index), 'pub_count': counts.values})
+    return _with_titles(top, frames['project_titles'])
+
+def top_cited_publications(frames):
+    top = frames['project_publications'].sort_values(by='citation_count', ascending=False).head(10)
+    return top[['doi', 'title', 'citation_count']].reset_index(drop=True)
+
+def top_journals(frames):
+    counts = frames['project_publications']['journal'].value_counts().dropna().head(10)
+    return pd.DataFrame({'journal': _labels(counts.index), 'publications': counts.values})
+
+def citation_distribution(frames, bins=30):
+    citations = frames['project_publications']['citation_count']
+    if citations.empty:
+        return pd.DataFrame({'bin_left': [], 'bin_right': [], 'count': []})
+    counts, edges = np.histogram(citations, bins=bins)
+    return pd.DataFrame({'bin_left': edges[:-1], 'bin_right': edges[1:], 'count': counts})
+
+def top_projects_by_avg_citations(frames):
+    means = frames['publication_citations'].groupby('project_id', observed=True)['citation_count'].mean()
+    top = means.sort_values(ascending=False).head(10).reset_index()
+    return _with_titles(top, frames['project_titles'])
+
+# Aggregate name -> function computing it from the loaded frames
+AGGREGATES = {
+    'kpis': kpis,
+    'projects_per_year': projects_per_year,
+    'avg_funding_per_year': avg_funding_per_year,
+    'top_countries': top_countries,
+    'top_funders_by_count': top_funders_by_count,
+    'top_funders_by_total': top_funders_by_total,
+    'top_funders_by_average': top_funders_by_average,
+    'duration_vs_funding': duration_vs_funding,
+    'duration_funding_grid': duration_funding_grid,
+    'top_projects_by_publications': top_projects_by_publications,
+    'top_cited_publications': top_cited_publications,
+    'top_journals': top_journals,
+    'citation_distribution': citation_distribution,
+    'top_projects_by_avg_citations': top_projects_by_avg_citations,
+}
+
+def compute_aggregates(frames):
+    """Computes every dashboard aggregate. Returns a dict name -> DataFrame."""
+    return {name: fn(frames) for name, fn in AGGREGATES.items()}
+
+
+# -------------------------------------------------------------------------------------
+# Artefact
+# -------------------------------------------------------------------------------------
+
+def write_aggregates(aggregates, sources, path=AGGREGATES_JSON):
+    """
+    Writes the aggregates together with the version and the source signatures
+    they were computed from.
+    """
+    artefact = {
+        'version': AGGREGATES_VERSION,
+        'created': time.time(),
+        'sources': [list(signature) for signature in sources],
+        'aggregates': {name: json.loads(df.to_json(orient='split', index=False))
+                       for name, df in aggregates.items()},
+    }
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(artefact, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def read_aggregates(path=AGGREGATES_JSON, sources=None):
+    """
+    Reads the artefact. Returns None if it is missing, was written by another
+    AGGREGATES_VERSION or (if sources is given) was computed from other data.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            artefact = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if artefact.get('version') != AGGREGATES_VERSION:
+        return None
+    if sources is not None and artefact.get('sources') != [list(signature) for signature in sources]:
+        return None
+    if set(artefact.get('aggregates', {})) != set(AGGREGATES):
+        return None
+
+    return {name: pd.DataFrame(table['data'], columns=table['columns'])
+            for name, table in artefact['aggregates'].items()}
@@ -0,0 +1,399 @@
+import os
+import re
+import sys
+import numpy as np
+import pandas as pd
+from dashboard_aggregates import AGGREGATES, GRID_BINS, SCATTER_MAX_POINTS, prepare_frames
+from sampling import load_sample_ids
+
+# =====================================================================================
+# Module: Dashboard aggregates from the Knowledge Graph
+# Date: October 2026
+#
+# Description:
+# Answers the dashboard aggregates from the graph built by 05_import_to_neo4j.py
+# instead of the intermediate CSVs, so the dashboard shows what is in the graph now,
+# even if the graph was updated without re-running the CSV stages.
+#
+# - Neo4jGraphBackend:  one Cypher query per chart; counting, summing, averaging and
+#                       binning happen on the server, only the small result is sent
+# - MemoryGraphBackend: local stand-in that computes the same tables from a
+#                       MemoryGraphSink (graph_sink.py), for tests without a server
+#
+# Every aggregate has the same columns as the pandas aggregate of the same name in
+# dashboard_aggregates.py, so the dashboard draws all backends the same way. Values
+# follow the graph: e.g. 05 stores a missing funded amount as 0.0, which counts in
+# the funding averages.
+#
+# check_graph_queries() checks the Cypher side of this without a server: every query
+# must RETURN the columns of its pandas aggregate (computed by MemoryGraphBackend on a
+# small test graph) and only use the parameters Neo4jGraphBackend passes. The grid and
+# histogram binning is checked by applying the binning the queries describe to the
+# test graph and comparing it with np.histogram2d/np.histogram. The Cypher itself only
+# runs on a server, so other values are not checked.
+#   python dashboard_graph.py --check-queries
+# =====================================================================================
+
+# Neo4j server of the live backend (the one 05_import_to_neo4j.py writes to)
+NEO4J_URI = os.environ.get('KG_NEO4J_URI', 'bolt://localhost:7687')
+NEO4J_USER = 'neo4j'
+NEO4J_ACCESS_FILE = 'neo4j_data/neo_access.txt'
+
+# Number of bins of the citation histogram (as np.histogram in dashboard_aggregates.py)
+CITATION_BINS = 30
+
+# Start year of a project: the graph stores dates as ISO strings
+_START_YEAR = "toInteger(left(p.startDate, 4))"
+
+# Funded projects with a positive duration in days (p, days)
+_VALID_DURATIONS = """
+        MATCH (p:Project)
+        WHERE p.fundedAmount > 0
+          AND left(p.startDate, 10) =~ '\\\\d{4}-\\\\d{2}-\\\\d{2}'
+          AND left(p.endDate, 10) =~ '\\\\d{4}-\\\\d{2}-\\\\d{2}'
+        WITH p, duration.inDays(date(left(p.startDate, 10)), date(left(p.endDate, 10))).days AS days
+        WHERE days > 0
+"""
+
+# Parameters Neo4jGraphBackend.aggregate() passes to every query
+QUERY_PARAMETERS = ('is_sample', 'max_points', 'bins', 'grid_x', 'grid_y')
+
+# Columns of the queries whose rows are reshaped before they are drawn
+RAW_QUERY_COLUMNS = {'citation_distribution': ['lo', 'hi', 'bin', 'count']}
+
+# Aggregate name -> Cypher query (parameters: QUERY_PARAMETERS)
+GRAPH_QUERIES = {
+    'kpis': f"""
+        MATCH (p:Project)
+        WITH {_START_YEAR} AS year
+        RETURN count(*) AS total_projects, min(year) AS earliest_year, max(year) AS latest_year,
+               $is_sample AS is_sample
+    """,
+    'projects_per_year': f"""
+        MATCH (p:Project)
+        WITH {_START_YEAR} AS startYear
+        WHERE startYear IS NOT NULL
+        RETURN startYear, count(*) AS projects
+        ORDER BY startYear
+    """,
+    'avg_funding_per_year': f"""
+        MATCH (p:Project)
+        WITH {_START_YEAR} AS startYear, p.fundedAmount AS fundedAmount
+        WHERE startYear IS NOT NULL
+        RETURN startYear, avg(fundedAmount) AS fundedAmount
+        ORDER BY startYear
+    """,
+    'top_countries': """
+        MATCH (:Project)-[:LOCATED_IN]->(c:Country)
+        RETURN c.jurisdiction AS country, count(*) AS projects
+        ORDER BY projects DESC, country LIMIT 15
+    """,
+    'top_funders_by_count': """
+        MATCH (:Project)-[:FUNDED_BY]->(f:Funder)
+        RETURN f.name AS funder_name, count(*) AS projects
+        ORDER BY projects DESC, funder_name LIMIT 10
+    """,
+    'top_funders_by_total': """
+        MATCH (p:Project)-[:FUNDED_BY]->(f:Funder)
+        RETURN f.name AS funder_name, sum(p.fundedAmount) AS fundedAmount
+        ORDER BY fundedAmount DESC, funder_name LIMIT 10
+    """,
+    'top_funders_by_average': """
+        MATCH (p:Project)-[:FUNDED_BY]->(f:Funder)
+        RETURN f.name AS funder_name, avg(p.fundedAmount) AS fundedAmount
+        ORDER BY fundedAmount DESC, funder_name LIMIT 10
+    """,
+    'duration_vs_funding': _VALID_DURATIONS + """
+        RETURN days AS project_duration_days, p.fundedAmount AS fundedAmount
+        ORDER BY rand() LIMIT $max_points
+    """,
+    # Same cells as np.histogram2d; only non-empty cells are returned
+    'duration_funding_grid': _VALID_DURATIONS + """
+        WITH min(days) AS x_min, max(days) AS x_max, min(p.fundedAmount) AS y_min, max(p.fundedAmount) AS y_max
+        WHERE x_min IS NOT NULL
+        WITH CASE WHEN x_min = x_max THEN x_min - 0.5 ELSE toFloat(x_min) END AS x_lo,
+             CASE WHEN x_min = x_max THEN x_max + 0.5 ELSE toFloat(x_max) END AS x_hi,
+             CASE WHEN y_min = y_max THEN y_min - 0.5 ELSE toFloat(y_min) END AS y_lo,
+             CASE WHEN y_min = y_max THEN y_max + 0.5 ELSE toFloat(y_max) END AS y_hi
+        """ + _VALID_DURATIONS.replace("WITH p,", "WITH x_lo, x_hi, y_lo, y_hi, p,") + """
+        WITH x_lo, x_hi, y_lo, y_hi,
+             toInteger(floor((days - x_lo) / (x_hi - x_lo) * $grid_x)) AS i,
+             toInteger(floor((p.fundedAmount - y_lo) / (y_hi - y_lo) * $grid_y)) AS j
+        WITH x_lo, x_hi, y_lo, y_hi,
+             CASE WHEN i >= $grid_x THEN $grid_x - 1 ELSE i END AS i,
+             CASE WHEN j >= $grid_y THEN $grid_y - 1 ELSE j END AS j
+        WITH x_lo, x_hi, y_lo, y_hi, i, j, count(*) AS count
+        RETURN x_lo + i * (x_hi - x_lo) / $grid_x AS duration_left,
+               x_lo + (i + 1) * (x_hi - x_lo) / $grid_x AS duration_right,
+               y_lo + j * (y_hi - y_lo) / $grid_y AS funding_left,
+               y_lo + (j + 1) * (y_hi - y_lo) / $grid_y AS funding_right,
+               count
+        ORDER BY i, j
+    """,
+    'top_projects_by_publications': """
+        MATCH (p:Project)-[:HAS_PUBLICATION]->(:Publication)
+        RETURN p.id AS project_id, count(*) AS pub_count, coalesce(p.title, p.id) AS title
+        ORDER BY pub_count DESC, project_id LIMIT 10
+    """,
+    'top_cited_publications': """
+        MATCH (u:Publication)
+        RETURN u.doi AS doi, u.title AS title, u.citation_count AS citation_count
+        ORDER BY citation_count DESC, doi LIMIT 10
+    """,
+    'top_journals': """
+        MATCH (u:Publication)
+        WHERE u.journal <> ''
+        RETURN u.journal AS journal, count(*) AS publications
+        ORDER BY publications DESC, journal LIMIT 10
+    """,
+    # Same bins as np.histogram: equal width between min and max, last bin closed,
+    # and a +-0.5 range if all values are equal. Only non-empty bins are returned.
+    'citation_distribution': """
+        MATCH (u:Publication)
+        WITH min(u.citation_count) AS lo, max(u.citation_count) AS hi
+        WHERE lo IS NOT NULL
+        WITH CASE WHEN lo = hi THEN lo - 0.5 ELSE toFloat(lo) END AS lo,
+             CASE WHEN lo = hi THEN hi + 0.5 ELSE toFloat(hi) END AS hi
+        MATCH (u:Publication)
+        WITH lo, hi, toInteger(floor((u.citation_count - lo) / (hi - lo) * $bins)) AS bin
+        WITH lo, hi, CASE WHEN bin >= $bins THEN $bins - 1 ELSE bin END AS bin
+        RETURN lo, hi, bin, count(*) AS count
+    """,
+    'top_projects_by_avg_citations': """
+        MATCH (p:Project)-[:HAS_PUBLICATION]->(u:Publication)
+        RETURN p.id AS project_id, avg(u.citation_count) AS citation_count, coalesce(p.title, p.id) AS title
+        ORDER BY citation_count DESC, project_id LIMIT 10
+    """,
+}
+
+
+def _histogram_from_bins(rows, bins=CITATION_BINS):
+    """Expands the non-empty (lo, hi, bin, count) rows to the full histogram table."""
+    if not rows:
+        return pd.DataFrame({'bin_left': [], 'bin_right': [], 'count': []})
+    edges = np.linspace(rows[0]['lo'], rows[0]['hi'], bins + 1)
+    counts = np.zeros(bins, dtype=int)
+    for row in rows:
+        counts[row['bin']] = row['count']
+    return pd.DataFrame({'bin_left': edges[:-1], 'bin_right': edges[1:], 'count': counts})
+
+
+# -------------------------------------------------------------------------------------
+# Neo4j
+# -------------------------------------------------------------------------------------
+
+class Neo4jGraphBackend:
+    """
+    Runs the aggregate queries on a Neo4j server. Create one instance per process:
+    its driver keeps a pool of connections that all queries share. The driver
+    is imported lazily, so the module loads without the neo4j package.
+    """
+
+    def __init__(self, uri, auth, max_pool_size=10, database=None):
+        from neo4j import GraphDatabase
+        self.driver = GraphDatabase.driver(uri, auth=auth, max_connection_pool_size=max_pool_size)
+        self.database = database
+
+    def run(self, query, **params):
+        """
+        Runs a read query on a pooled connection.
+        Returns (rows as dicts, column names).
+        """
+        from neo4j import RoutingControl
+        records, _, keys = self.driver.execute_query(query, params, database_=self.database,
+                                                     routing_=RoutingControl.READ)
+        return [record.data() for record in records], keys
+
+    def aggregate(self, name):
+        """Returns one aggregate table as a DataFrame."""
+        rows, columns = self.run(GRAPH_QUERIES[name], is_sample=load_sample_ids() is not None,
+                                 max_points=SCATTER_MAX_POINTS, bins=CITATION_BINS,
+                                 grid_x=GRID_BINS[0], grid_y=GRID_BINS[1])
+        if name == 'citation_distribution':
+            return _histogram_from_bins(rows)
+        return pd.DataFrame(rows, columns=columns)
+
+    def close(self):
+        self.driver.close()
+
+
+# -------------------------------------------------------------------------------------
+# Local stand-in
+# -------------------------------------------------------------------------------------
+
+class MemoryGraphBackend:
+    """
+    Computes the aggregates from a MemoryGraphSink, e.g. one filled by the loaders
+    of 05_import_to_neo4j.py with KG_GRAPH_SINK=memory. The graph is turned back
+    into tables and aggregated with the functions of dashboard_aggregates.py;
+    the Cypher queries are not run (see check_graph_queries()).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def _nodes(self, label, columns):
+        rows = [[props.get(column) for column in columns]
+                for (node_label, _, _), props in self.graph.nodes.items() if node_label == label]
+        return pd.DataFrame(rows, columns=columns)
+
+    def _relationships(self, rel_type, columns):
+        rows = [(start[2], end[2]) for (type_, start, end) in self.graph.relationships if type_ == rel_type]
+        return pd.DataFrame(rows, columns=columns)
+
+    def frames(self):
+        projects = self._nodes('Project', ['id', 'title', 'startDate', 'endDate', 'fundedAmount'])
+        publications = self._nodes('Publication', ['doi', 'title', 'journal', 'citation_count'])
+        publications['journal'] = publications['journal'].replace('', None)
+        return prepare_frames(
+            projects,
+            self._relationships('FUNDED_BY', ['project_id', 'funder_name']),
+            self._relationships('LOCATED_IN', ['project_id', 'country']),
+            publications,
+            self._relationships('HAS_PUBLICATION', ['project_id', 'doi']),
+            is_sample=load_sample_ids() is not None,
+        )
+
+    def aggregate(self, name):
+        return AGGREGATES[name](self.frames())
+
+    def close(self):
+        pass
+
+
+def neo4j_auth(path=NEO4J_ACCESS_FILE):
+    """Returns (user, password); the password is the first line of the access file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return (NEO4J_USER, f.readline().strip())
+
+def open_graph_backend(kind, uri=NEO4J_URI, auth=None, graph=None):
+    """
+    Creates a graph backend by name: "neo4j" (auth defaults to the access file)
+    or "memory" (needs a MemoryGraphSink as graph).
+    """
+    if kind == 'neo4j':
+        return Neo4jGraphBackend(uri, auth or neo4j_auth())
+    if kind == 'memory':
+        return MemoryGraphBackend(graph)
+    raise ValueError(f"Unknown graph backend: {kind}")
+
+
+# -------------------------------------------------------------------------------------
+# Query check
+# -------------------------------------------------------------------------------------
+
+def query_columns(query):
+    """Returns the column names of the final RETURN clause of a Cypher query."""
+    clause = re.split(r'\bORDER BY\b|\bLIMIT\b', query.rsplit('RETURN', 1)[1])[0]
+    items, depth, current = [], 0, ''
+    for char in clause:
+        depth += (char == '(') - (char == ')')
+        if char == ',' and depth == 0:
+            items.append(current)
+            current = ''
+        else:
+            current += char
+    items.append(current)
+    return [re.split(r'\bAS\b', item)[-1].strip() for item in items]
+
+def _cypher_bins(values, bins):
+    """
+    Bins values as the grid and histogram queries do: equal width between min and
+    max (+-0.5 if all values are equal), the maximum in the last bin.
+    Returns (lo, hi, bin of every value).
+    """
+    lo, hi = float(values.min()), float(values.max())
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+    return lo, hi, np.minimum(np.floor((values - lo) / (hi - lo) * bins).astype(int), bins - 1)
+
+def check_graph_queries():
+    """
+    Compares every query of GRAPH_QUERIES with the pandas aggregate of the same name,
+    i.e. the columns the dashboard charts read. The pandas columns come from
+    MemoryGraphBackend on a small test graph, so no server is needed. The bins of
+    duration_funding_grid and citation_distribution, as their queries compute them,
+    are compared with the pandas values.
+    Returns a list of mismatches (empty if all queries match).
+    """
+    from graph_sink import MemoryGraphSink
+
+    mismatches = [f"{name}: no Cypher query" for name in AGGREGATES if name not in GRAPH_QUERIES]
+    mismatches += [f"{name}: no pandas aggregate" for name in GRAPH_QUERIES if name not in AGGREGATES]
+
+    # Every node and relationship type the queries read, with the properties 05 sets
+    graph = MemoryGraphSink()
+    graph.merge_nodes('Project', 'id', [
+        {'id': 'p1', 'title': 'A', 'startDate': '2020-01-01', 'endDate': '2022-01-01', 'fundedAmount': 1000.0},
+        {'id': 'p2', 'title': 'B', 'startDate': '2021-03-01', 'endDate': '2021-09-01', 'fundedAmount': 250.0},
+        {'id': 'p3', 'title': 'C', 'startDate': '2019-06-15', 'endDate': '2023-06-14', 'fundedAmount': 4000.0},
+        {'id': 'p4', 'title': 'D', 'startDate': '2022-01-01', 'endDate': '2021-01-01', 'fundedAmount': 500.0},
+    ])
+    graph.merge_nodes('Funder', 'name', [{'name': 'F1'}, {'name': 'F2'}])
+    graph.merge_nodes('Country', 'jurisdiction', [{'jurisdiction': 'DE'}])
+    graph.merge_nodes('Publication', 'doi', [
+        {'doi': 'd1', 'title': 'T', 'journal': 'J', 'citation_count': 3},
+        {'doi': 'd2', 'title': 'U', 'journal': '', 'citation_count': 0},
+        {'doi': 'd3', 'title': 'V', 'journal': 'J', 'citation_count': 7},
+        {'doi': 'd4', 'title': 'W', 'journal': 'K', 'citation_count': 30},
+    ])
+    project, publication = ('Project', 'id', 'project_id'), ('Publication', 'doi', 'doi')
+    graph.merge_relationships('FUNDED_BY', project, ('Funder', 'name', 'funder_name'), [
+        {'project_id': 'p1', 'funder_name': 'F1'}, {'project_id': 'p2', 'funder_name': 'F2'}])
+    graph.merge_relationships('LOCATED_IN', project, ('Country', 'jurisdiction', 'country'), [
+        {'project_id': 'p1', 'country': 'DE'}])
+    graph.merge_relationships('HAS_PUBLICATION', project, publication, [
+        {'project_id': 'p1', 'doi': 'd1'}, {'project_id': 'p2', 'doi': 'd2'}])
+    backend = MemoryGraphBackend(graph)
+
+    for name, query in GRAPH_QUERIES.items():
+        unknown = sorted(set(re.findall(r'\$(\w+)', query)) - set(QUERY_PARAMETERS))
+        if unknown:
+            mismatches.append(f"{name}: unknown parameters {unknown}")
+        if name not in AGGREGATES:
+            continue
+        columns = query_columns(query)
+        if name in RAW_QUERY_COLUMNS:
+            if columns != RAW_QUERY_COLUMNS[name]:
+                mismatches.append(f"{name}: returns {columns}, expected {RAW_QUERY_COLUMNS[name]}")
+            # The bins are expanded to the full histogram before they are drawn
+            columns = list(_histogram_from_bins([{'lo': 0.0, 'hi': 1.0, 'bin': 0, 'count': 1}]).columns)
+        expected = list(backend.aggregate(name).columns)
+        if columns != expected:
+            mismatches.append(f"{name}: returns {columns}, the charts read {expected}")
+
+    # Binning of the queries (as the rows they return) against the pandas aggregates
+    frames = backend.frames()
+    lo, hi, bins = _cypher_bins(frames['project_publications']['citation_count'].to_numpy(), CITATION_BINS)
+    counts = np.bincount(bins, minlength=CITATION_BINS)
+    histogram = _histogram_from_bins([{'lo': lo, 'hi': hi, 'bin': b, 'count': int(c)}
+                                      for b, c in enumerate(counts) if c])
+
+    projects = frames['projects']
+    valid = projects[(projects['project_duration_days'] > 0) & (projects['fundedAmount'] > 0)]
+    x_lo, x_hi, i = _cypher_bins(valid['project_duration_days'].to_numpy(float), GRID_BINS[0])
+    y_lo, y_hi, j = _cypher_bins(valid['fundedAmount'].to_numpy(float), GRID_BINS[1])
+    cells = pd.DataFrame({'i': i, 'j': j}).value_counts().sort_index()
+    i, j = cells.index.get_level_values('i').to_numpy(), cells.index.get_level_values('j').to_numpy()
+    x_width, y_width = (x_hi - x_lo) / GRID_BINS[0], (y_hi - y_lo) / GRID_BINS[1]
+    grid = pd.DataFrame({
+        'duration_left': x_lo + i * x_width, 'duration_right': x_lo + (i + 1) * x_width,
+        'funding_left': y_lo + j * y_width, 'funding_right': y_lo + (j + 1) * y_width,
+        'count': cells.to_numpy(),
+    })
+
+    for name, table in (('citation_distribution', histogram), ('duration_funding_grid', grid)):
+        expected = backend.aggregate(name)
+        if table.shape != expected.shape or not np.allclose(table.to_numpy(float), expected.to_numpy(float)):
+            mismatches.append(f"{name}: the bins of the query differ from the pandas aggregate")
+    return mismatches
+
+
+if __name__ == "__main__":
+    if '--check-queries' in sys.argv[1:]:
+        problems = check_graph_queries()
+        for problem in problems:
+            print(f"❌ {problem}")
+        print("✅ All graph queries return the dashboard columns and bins" if not problems
+              else f"⚠️ {len(problems)} graph query mismatches")
+        sys.exit(1 if problems else 0)
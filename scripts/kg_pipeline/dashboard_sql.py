@@ -0,0 +1,329 @@
+import json
+import os
+import duckdb
+from dashboard_aggregates import GRID_BINS, SCATTER_MAX_POINTS, SOURCE_FILES, data_version
+from sampling import load_sample_keys
+
+# =====================================================================================
+# Module: Filtered dashboard aggregates on DuckDB
+# Date: October 2026
+#
+# Description:
+# Answers the dashboard aggregates as SQL against an embedded columnar database
+# (DuckDB) instead of pandas frames, so interactive filters (year range, funders,
+# countries, minimum funding) stay fast on millions of projects. Only the small
+# aggregate results are ever converted to pandas.
+#
+# The pipeline CSVs are copied once into typed, column-pruned tables of a DuckDB file
+# (DUCKDB_FILE). The file remembers the source signatures it was built from and is
+# rebuilt automatically when the pipeline rewrites a CSV.
+#
+# Every query returns the same columns as the pandas aggregate of the same name in
+# dashboard_aggregates.py, so the dashboard draws both the same way.
+# =====================================================================================
+
+DUCKDB_FILE = 'data/projects_data_csv/dashboard.duckdb'
+
+# Filters of the dashboard; None / empty list = no restriction
+NO_FILTERS = {
+    'year_from': None,
+    'year_to': None,
+    'funders': [],
+    'countries': [],
+    'min_funding': None,
+}
+
+
+def filters_active(filters):
+    return any(filters.get(name) not in (None, []) for name in NO_FILTERS)
+
+
+# -------------------------------------------------------------------------------------
+# Database
+# -------------------------------------------------------------------------------------
+
+def _read_csv(path):
+    # all_varchar: the typed casts below decide how values are parsed
+    return f"read_csv('{path}', header = true, all_varchar = true)"
+
+def build_database(path=DUCKDB_FILE):
+    """
+    Copies the columns the dashboard needs from the pipeline CSVs into typed
+    DuckDB tables, restricted to the project sample.
+    - Projects, funders, countries and publications are joined on the integer
+      keys of the CSVs, so no join compares long ID strings
+    - Projects are stored sorted by start year, so year filters can skip whole
+      row groups, and carry their publication count and average citations
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    sources = data_version()
+
+    con = duckdb.connect(tmp_path)
+    sample_keys = load_sample_keys()
+    con.execute("CREATE TEMP TABLE sample_keys (project_key INTEGER)")
+    if sample_keys is not None:
+        con.executemany("INSERT INTO sample_keys VALUES (?)", [[key] for key in sample_keys])
+    params = {'sampled': sample_keys is not None}
+
+    con.execute(f"""
+        CREATE TEMP TABLE raw_projects AS
+        SELECT CAST(key AS INTEGER) AS project_key,
+               id,
+               title,
+               year(try_cast(startDate AS DATE)) AS startYear,
+               try_cast(fundedAmount AS DOUBLE) AS fundedAmount,
+               date_diff('day', try_cast(startDate AS DATE), try_cast(endDate AS DATE)) AS project_duration_days
+        FROM {_read_csv(SOURCE_FILES['projects'])}
+        WHERE (NOT $sampled OR CAST(key AS INTEGER) IN (SELECT project_key FROM sample_keys))
+    """, params)
+    con.execute(f"""
+        CREATE TEMP TABLE raw_rel AS
+        SELECT CAST(project_key AS INTEGER) AS project_key, CAST(publication_key AS INTEGER) AS ukey
+        FROM {_read_csv(SOURCE_FILES['publication_project_rel'])}
+        WHERE CAST(project_key AS INTEGER) IN (SELECT project_key FROM raw_projects)
+    """)
+    con.execute(f"""
+        CREATE TABLE publications AS
+        SELECT CAST(key AS INTEGER) AS ukey,
+               doi,
+               title,
+               nullif(journal, '') AS journal,
+               coalesce(try_cast(citation_count AS DOUBLE), 0) AS citation_count
+        FROM {_read_csv(SOURCE_FILES['project_publications'])}
+        WHERE CAST(key AS INTEGER) IN (SELECT ukey FROM raw_rel)
+    """)
+
+    # Publication statistics per project (pandas: rel LEFT JOIN publications)
+    con.execute("""
+        CREATE TABLE projects AS
+        SELECT CAST(row_number() OVER (ORDER BY p.startYear, p.id) AS INTEGER) AS pkey,
+               p.*,
+               coalesce(s.pub_count, 0) AS pub_count,
+               s.avg_citations
+        FROM raw_projects p
+        LEFT JOIN (
+            SELECT r.project_key, count(*) AS pub_count, avg(u.citation_count) AS avg_citations
+            FROM raw_rel r LEFT JOIN publications u USING (ukey)
+            GROUP BY r.project_key
+        ) s USING (project_key)
+        ORDER BY pkey
+    """)
+    con.execute("""
+        CREATE TABLE publication_project_rel AS
+        SELECT p.pkey, r.ukey
+        FROM raw_rel r JOIN projects p USING (project_key) JOIN publications u USING (ukey)
+    """)
+
+    # Funders and countries: the dictionary CSVs (only the used entries) plus integer
+    # relation tables
+    for table, source, relation_key, column, field, key in (
+            ('funders', 'project_funders', 'funder_key', 'name', 'funder_name', 'fkey'),
+            ('countries', 'project_countries', 'country_key', 'jurisdiction', 'country', 'ckey')):
+        con.execute(f"""
+            CREATE TEMP TABLE raw_{source} AS
+            SELECT CAST(project_key AS INTEGER) AS project_key, CAST({relation_key} AS INTEGER) AS {key}
+            FROM {_read_csv(SOURCE_FILES[source])}
+            WHERE CAST(project_key AS INTEGER) IN (SELECT project_key FROM raw_projects)
+        """)
+        con.execute(f"""
+            CREATE TABLE {table} AS
+            SELECT CAST(key AS INTEGER) AS {key}, {column} AS {field}
+            FROM {_read_csv(SOURCE_FILES[table])}
+            WHERE {column} IS NOT NULL AND CAST(key AS INTEGER) IN (SELECT {key} FROM raw_{source})
+        """)
+        con.execute(f"""
+            CREATE TABLE {source} AS
+            SELECT p.pkey, r.{key}
+            FROM raw_{source} r JOIN projects p USING (project_key) JOIN {table} d USING ({key})
+        """)
+
+    con.execute("CREATE TABLE meta (sources VARCHAR, is_sample BOOLEAN)")
+    con.execute("INSERT INTO meta VALUES (?, ?)", [json.dumps(sources), sample_keys is not None])
+    con.close()
+    os.replace(tmp_path, path)
+
+def database_is_fresh(path=DUCKDB_FILE):
+    if not os.path.exists(path):
+        return False
+    try:
+        con = duckdb.connect(path, read_only=True)
+        try:
+            stored = con.execute("SELECT sources FROM meta").fetchone()[0]
+        finally:
+            con.close()
+    except duckdb.Error:
+        return False
+    return json.loads(stored) == json.loads(json.dumps(data_version()))
+
+def connect(path=DUCKDB_FILE):
+    """
+    Returns a read-only connection to the dashboard database, (re)building it
+    first if it is missing or stale. Use connection.cursor() per thread.
+    """
+    if not database_is_fresh(path):
+        build_database(path)
+    return duckdb.connect(path, read_only=True)
+
+
+# -------------------------------------------------------------------------------------
+# Aggregates
+# -------------------------------------------------------------------------------------
+
+# Projects that pass the filters; every aggregate query starts from this CTE
+FILTERED_PROJECTS = """
+WITH fp AS (
+    SELECT * FROM projects
+    WHERE (CAST($year_from AS INTEGER) IS NULL OR startYear >= $year_from)
+      AND (CAST($year_to AS INTEGER) IS NULL OR startYear <= $year_to)
+      AND (CAST($min_funding AS DOUBLE) IS NULL OR fundedAmount >= $min_funding)
+      AND (len(CAST($funders AS VARCHAR[])) = 0 OR pkey IN (
+            SELECT pkey FROM project_funders JOIN funders USING (fkey)
+            WHERE list_contains(CAST($funders AS VARCHAR[]), funder_name)))
+      AND (len(CAST($countries AS VARCHAR[])) = 0 OR pkey IN (
+            SELECT pkey FROM project_countries JOIN countries USING (ckey)
+            WHERE list_contains(CAST($countries AS VARCHAR[]), country)))
+), fpub AS (
+    SELECT * FROM publications
+    WHERE ukey IN (SELECT r.ukey FROM publication_project_rel r JOIN fp USING (pkey))
+)
+"""
+
+QUERIES = {
+    'kpis': """
+        SELECT count(*) AS total_projects,
+               min(startYear) AS earliest_year,
+               max(startYear) AS latest_year,
+               (SELECT is_sample FROM meta) AS is_sample
+        FROM fp
+    """,
+    'projects_per_year': """
+        SELECT startYear, count(*) AS projects
+        FROM fp WHERE startYear IS NOT NULL
+        GROUP BY startYear ORDER BY startYear
+    """,
+    'avg_funding_per_year': """
+        SELECT startYear, avg(fundedAmount) AS fundedAmount
+        FROM fp WHERE startYear IS NOT NULL
+        GROUP BY startYear ORDER BY startYear
+    """,
+    'top_countries': """
+        SELECT any_value(c.country) AS country, count(*) AS projects
+        FROM project_countries pc JOIN fp USING (pkey) JOIN countries c USING (ckey)
+        GROUP BY ckey ORDER BY projects DESC, country LIMIT 15
+    """,
+    'top_funders_by_count': """
+        SELECT any_value(f.funder_name) AS funder_name, count(*) AS projects
+        FROM project_funders pf JOIN fp USING (pkey) JOIN funders f USING (fkey)
+        GROUP BY fkey ORDER BY projects DESC, funder_name LIMIT 10
+    """,
+    'top_funders_by_total': """
+        SELECT any_value(f.funder_name) AS funder_name, coalesce(sum(fp.fundedAmount), 0) AS fundedAmount
+        FROM project_funders pf JOIN fp USING (pkey) JOIN funders f USING (fkey)
+        GROUP BY fkey ORDER BY fundedAmount DESC, funder_name LIMIT 10
+    """,
+    'top_funders_by_average': """
+        SELECT any_value(f.funder_name) AS funder_name, avg(fp.fundedAmount) AS fundedAmount
+        FROM project_funders pf JOIN fp USING (pkey) JOIN funders f USING (fkey)
+        GROUP BY fkey ORDER BY fundedAmount DESC NULLS LAST, funder_name LIMIT 10
+    """,
+    'duration_vs_funding': f"""
+        SELECT project_duration_days, fundedAmount
+        FROM fp WHERE project_duration_days > 0 AND fundedAmount > 0
+        USING SAMPLE reservoir({SCATTER_MAX_POINTS} ROWS) REPEATABLE (0)
+    """,
+    # Same cells as np.histogram2d: equal width between min and max, last cell closed
+    'duration_funding_grid': f"""
+        , valid AS (
+            SELECT project_duration_days AS x, fundedAmount AS y
+            FROM fp WHERE project_duration_days > 0 AND fundedAmount > 0
+        ), bounds AS (
+            SELECT CASE WHEN min(x) = max(x) THEN min(x) - 0.5 ELSE min(x) END AS x_lo,
+                   CASE WHEN min(x) = max(x) THEN max(x) + 0.5 ELSE max(x) END AS x_hi,
+                   CASE WHEN min(y) = max(y) THEN min(y) - 0.5 ELSE min(y) END AS y_lo,
+                   CASE WHEN min(y) = max(y) THEN max(y) + 0.5 ELSE max(y) END AS y_hi
+            FROM valid
+        ), cells AS (
+            SELECT least(CAST(floor((x - x_lo) / (x_hi - x_lo) * {GRID_BINS[0]}) AS INTEGER), {GRID_BINS[0] - 1}) AS i,
+                   least(CAST(floor((y - y_lo) / (y_hi - y_lo) * {GRID_BINS[1]}) AS INTEGER), {GRID_BINS[1] - 1}) AS j,
+                   count(*) AS count
+            FROM valid, bounds GROUP BY i, j
+        )
+        SELECT x_lo + i * (x_hi - x_lo) / {GRID_BINS[0]} AS duration_left,
+               x_lo + (i + 1) * (x_hi - x_lo) / {GRID_BINS[0]} AS duration_right,
+               y_lo + j * (y_hi - y_lo) / {GRID_BINS[1]} AS funding_left,
+               y_lo + (j + 1) * (y_hi - y_lo) / {GRID_BINS[1]} AS funding_right,
+               count
+        FROM cells, bounds ORDER BY i, j
+    """,
+    'top_projects_by_publications': """
+        SELECT id AS project_id, pub_count, coalesce(title, id) AS title
+        FROM fp WHERE pub_count > 0
+        ORDER BY pub_count DESC, id LIMIT 10
+    """,
+    'top_cited_publications': """
+        SELECT doi, title, citation_count
+        FROM fpub ORDER BY citation_count DESC, doi LIMIT 10
+    """,
+    'top_journals': """
+        SELECT journal, count(*) AS publications
+        FROM fpub WHERE journal IS NOT NULL
+        GROUP BY journal ORDER BY publications DESC, journal LIMIT 10
+    """,
+    'citation_distribution': """
+        , bounds AS (
+            SELECT min(citation_count) AS lo, max(citation_count) AS hi FROM fpub
+        ), bins AS (
+            SELECT range AS bin FROM range(30)
+        ), counts AS (
+            SELECT least(CAST(floor((citation_count - lo) / nullif(hi - lo, 0) * 30) AS INTEGER), 29) AS bin,
+                   count(*) AS count
+            FROM fpub, bounds GROUP BY 1
+        )
+        SELECT lo + bins.bin * (hi - lo) / 30 AS bin_left,
+               lo + (bins.bin + 1) * (hi - lo) / 30 AS bin_right,
+               coalesce(counts.count, 0) AS count
+        FROM bins CROSS JOIN bounds LEFT JOIN counts ON counts.bin = bins.bin
+        WHERE lo IS NOT NULL
+        ORDER BY bins.bin
+    """,
+    'top_projects_by_avg_citations': """
+        SELECT id AS project_id, avg_citations AS citation_count, coalesce(title, id) AS title
+        FROM fp WHERE pub_count > 0
+        ORDER BY avg_citations DESC NULLS LAST, id LIMIT 10
+    """,
+}
+
+def _params(filters):
+    params = dict(NO_FILTERS)
+    params.update({name: filters[name] for name in NO_FILTERS if name in filters})
+    params['funders'] = list(params['funders'] or [])
+    params['countries'] = list(params['countries'] or [])
+    return params
+
+def query_aggregate(con, name, filters):
+    """Runs one aggregate query with the given filters. Returns a small DataFrame."""
+    # The histogram queries continue the WITH clause with more CTEs
+    return con.execute(FILTERED_PROJECTS + QUERIES[name], _params(filters)).df()
+
+def query_aggregates(con, filters):
+    """Runs every aggregate query. Returns a dict name -> DataFrame."""
+    return {name: query_aggregate(con, name, filters) for name in QUERIES}
+
+def filter_options(con):
+    """Returns the values offered by the dashboard filters."""
+    years = con.execute("SELECT min(startYear), max(startYear) FROM projects").fetchone()
+    funders = [row[0] for row in con.execute(
+        "SELECT any_value(funder_name) FROM project_funders JOIN funders USING (fkey) "
+        "GROUP BY fkey ORDER BY count(*) DESC").fetchall()]
+    countries = [row[0] for row in con.execute(
+        "SELECT any_value(country) FROM project_countries JOIN countries USING (ckey) "
+        "GROUP BY ckey ORDER BY count(*) DESC").fetchall()]
+    max_funding = con.execute("SELECT max(fundedAmount) FROM projects").fetchone()[0]
+    return {
+        'year_range': years,
+        'funders': funders,
+        'countries': countries,
+        'max_funding': max_funding or 0.0,
+    }
@@ -0,0 +1,195 @@
+import numpy as np
+
+# =====================================================================================
+# Module: Vectorised graph algorithms on the CSR graph snapshot
+# Date: October 2026
+#
+# Description:
+# Whole-graph analytics over a GraphSnapshot (graph_snapshot.py), written as NumPy
+# array operations over all edges at once instead of Python loops over nodes:
+# - pagerank:             power iteration, one bincount over the edges per iteration
+# - connected_components: parallel hooking and pointer jumping (Shiloach-Vishkin style)
+# - k_hop_counts:         breadth-first search that expands the whole frontier at once
+# - degree_stats:         degree distribution of the sources or targets of an edge block
+#
+# All functions take global node IDs and an optional list of edge types (default: all
+# blocks of the snapshot), so e.g. a funder-publication graph is just
+# types=['ACKNOWLEDGED_IN'].
+# =====================================================================================
+
+
+def adjacency(snapshot, types=None, directed=False):
+    """
+    Combines edge blocks into one CSR adjacency (indptr, indices) over the global
+    node IDs. Undirected adjacency lists every edge in both directions.
+    """
+    sources, targets = [], []
+    for rel_type in types or snapshot.edge_types:
+        block_sources, block_targets = snapshot.edges(rel_type)
+        sources.append(block_sources)
+        targets.append(block_targets)
+        if not directed:
+            sources.append(block_targets)
+            targets.append(block_sources)
+    sources = np.concatenate(sources) if sources else np.empty(0, dtype=np.int64)
+    targets = np.concatenate(targets) if targets else np.empty(0, dtype=np.int64)
+
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(snapshot.node_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=snapshot.node_count), out=indptr[1:])
+    return indptr, targets[order]
+
+def _gather_neighbours(indptr, indices, nodes):
+    """Returns the concatenated adjacency lists of the given nodes."""
+    starts = indptr[nodes]
+    lengths = indptr[nodes + 1] - starts
+    total = lengths.sum()
+    if total == 0:
+        return np.empty(0, dtype=indices.dtype)
+    # Position of every gathered entry: start of its row + offset within the row
+    row_offsets = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return indices[np.repeat(starts, lengths) + np.arange(total) - row_offsets]
+
+
+# -------------------------------------------------------------------------------------
+# PageRank
+# -------------------------------------------------------------------------------------
+
+def pagerank(snapshot, types=None, directed=True, damping=0.85, tolerance=1e-8, max_iterations=100):
+    """
+    Returns the PageRank of every node (array indexed by global ID, sums to 1).
+    The rank of nodes without outgoing edges is spread evenly over all nodes.
+    Stops when the L1 change of an iteration is below tolerance.
+    """
+    indptr, indices = adjacency(snapshot, types, directed)
+    n = snapshot.node_count
+    if n == 0:
+        return np.empty(0)
+    out_degree = np.diff(indptr)
+    sources = np.repeat(np.arange(n), out_degree)
+    dangling = out_degree == 0
+    inverse_degree = np.divide(1.0, out_degree, out=np.zeros(n), where=~dangling)
+
+    rank = np.full(n, 1.0 / n)
+    for _ in range(max_iterations):
+        contribution = rank * inverse_degree
+        spread = (damping * rank[dangling].sum() + (1.0 - damping)) / n
+        new_rank = damping * np.bincount(indices, weights=contribution[sources], minlength=n) + spread
+        change = np.abs(new_rank - rank).sum()
+        rank = new_rank
+        if change < tolerance:
+            break
+    return rank
+
+
+# -------------------------------------------------------------------------------------
+# Connected components
+# -------------------------------------------------------------------------------------
+
+def connected_components(snapshot, types=None):
+    """
+    Returns the component of every node (array indexed by global ID); the
+    component ID is the smallest global node ID in the component. Edge
+    direction is ignored.
+    """
+    parent = np.arange(snapshot.node_count, dtype=np.int64)
+    sources, targets = [], []
+    for rel_type in types or snapshot.edge_types:
+        block_sources, block_targets = snapshot.edges(rel_type)
+        sources.append(block_sources)
+        targets.append(block_targets)
+    if not sources:
+        return parent
+    sources, targets = np.concatenate(sources), np.concatenate(targets)
+
+    while len(sources):
+        # Every node points at the root of its tree (fully compressed), so the ends of an
+        # edge are in the same component exactly if their parents are equal
+        lower = np.minimum(parent[sources], parent[targets])
+        higher = np.maximum(parent[sources], parent[targets])
+        crossing = lower != higher
+        if not crossing.any():
+            break
+        sources, targets = sources[crossing], targets[crossing]
+        # Hook the higher root below the lowest root it is connected to
+        np.minimum.at(parent, higher[crossing], lower[crossing])
+        # Pointer jumping until every node points at its root again
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+    return parent
+
+def component_sizes(components):
+    """Returns (component IDs, sizes), largest component first."""
+    ids, sizes = np.unique(components, return_counts=True)
+    order = np.argsort(-sizes, kind='stable')
+    return ids[order], sizes[order]
+
+
+# -------------------------------------------------------------------------------------
+# k-hop neighbourhoods
+# -------------------------------------------------------------------------------------
+
+def k_hop_counts(snapshot, source, k, types=None, directed=False, adjacency_lists=None):
+    """
+    Returns the number of nodes first reached at each hop 1..k from the source
+    node (the k-hop neighbourhood size is the sum). Pass adjacency_lists (from
+    adjacency()) when calling this for many sources.
+    """
+    indptr, indices = adjacency_lists or adjacency(snapshot, types, directed)
+    visited = np.zeros(snapshot.node_count, dtype=bool)
+    visited[source] = True
+    frontier = np.array([source], dtype=np.int64)
+    counts = []
+    for _ in range(k):
+        neighbours = _gather_neighbours(indptr, indices, frontier)
+        frontier = np.unique(neighbours[~visited[neighbours]])
+        visited[frontier] = True
+        counts.append(len(frontier))
+        if not len(frontier):
+            counts.extend([0] * (k - len(counts)))
+            break
+    return counts
+
+
+# -------------------------------------------------------------------------------------
+# Degree statistics
+# -------------------------------------------------------------------------------------
+
+def degrees(snapshot, rel_type, side='target'):
+    """
+    Returns the degree of every node of one edge block's source or target
+    label (array indexed by local ID): out-degree for 'source', in-degree
+    for 'target'.
+    """
+    info = snapshot.manifest['blocks'][rel_type]
+    indptr, indices = snapshot.block(rel_type)
+    if side == 'source':
+        return np.diff(indptr)
+    return np.bincount(indices, minlength=snapshot.labels[info['target']]['count'])
+
+def degree_stats(snapshot, rel_type, side='target', top=10):
+    """
+    Summarises the degree distribution of one side of an edge block: count,
+    mean, percentiles, maximum and the `top` nodes with the highest degree
+    as (key, degree) pairs.
+    """
+    label = snapshot.manifest['blocks'][rel_type][side]
+    degree = degrees(snapshot, rel_type, side)
+    if not len(degree):
+        return {'label': label, 'nodes': 0}
+    best = np.argsort(-degree, kind='stable')[:top]
+    keys = snapshot.keys(label)
+    return {
+        'label': label,
+        'nodes': int(len(degree)),
+        'isolated': int((degree == 0).sum()),
+        'mean': float(degree.mean()),
+        'median': float(np.median(degree)),
+        'p90': float(np.percentile(degree, 90)),
+        'p99': float(np.percentile(degree, 99)),
+        'max': int(degree.max()),
+        'top': [(keys[i], int(degree[i])) for i in best],
+    }
@@ -0,0 +1,424 @@
+import json
+import os
+import time
+from import_metrics import COUNTER_FIELDS, MATCH_FIELDS
+
+# =====================================================================================
+# Module: Graph sinks for the Knowledge Graph import
+# Date: October 2026
+#
+# Description:
+# The loaders in 05_import_to_neo4j.py describe what they write (merge nodes, merge
+# relationships, delete them again) and hand batches of rows to a graph sink:
+#
+# - Neo4jGraphSink:     writes to a Neo4j server with one UNWIND statement per batch
+# - MemoryGraphSink:    in-process property graph with the same MERGE/MATCH semantics,
+#                       for testing and benchmarking the import without a database
+# - RecordingGraphSink: captures the generated Cypher statements and batch shapes
+#                       (written to a JSON file by 05 with write_json)
+#
+# check_merge_semantics() runs a fixed sequence of loader-shaped batches through a sink
+# and compares the counters and the resulting graph with Neo4j's MERGE/MATCH/SET
+# semantics, so the in-memory graph can be checked offline and against a live server
+# (python scripts/kg_pipeline/05_import_to_neo4j.py --check-sink).
+#
+# Every write method returns the update counters of the batch (same names as
+# Neo4j's result.consume().counters), the nodes/relationships a MERGE matched
+# (MATCH_FIELDS) and the number of transaction attempts. Sinks with counts_writes =
+# False report no counters at all.
+#
+# A node reference is a tuple (label, key_property, row_field): the node with the
+# given label whose key_property equals row[row_field].
+# =====================================================================================
+
+def _empty_counters():
+    counters = {field: 0 for field in COUNTER_FIELDS + MATCH_FIELDS}
+    counters['attempts'] = 1
+    return counters
+
+
+def _property_fields(rows, exclude):
+    """Returns the row fields that are written as properties, in a stable order."""
+    return [field for field in rows[0] if field not in exclude] if rows else []
+
+
+# -------------------------------------------------------------------------------------
+# Cypher statements (shared by the Neo4j and the recording sink)
+# -------------------------------------------------------------------------------------
+
+def merge_nodes_cypher(label, key, fields):
+    query = f"UNWIND $rows AS row\nMERGE (n:{label} {{{key}: row.{key}}})"
+    if fields:
+        query += "\nSET " + ",\n    ".join(f"n.{field} = row.{field}" for field in fields)
+    return query + "\nRETURN count(*) AS merged"
+
+def merge_relationships_cypher(rel_type, start, end, fields):
+    (start_label, start_key, start_field), (end_label, end_key, end_field) = start, end
+    query = (
+        f"UNWIND $rows AS row\n"
+        f"MATCH (a:{start_label} {{{start_key}: row.{start_field}}})\n"
+        f"MATCH (b:{end_label} {{{end_key}: row.{end_field}}})\n"
+        f"MERGE (a)-[r:{rel_type}]->(b)"
+    )
+    if fields:
+        query += "\nSET " + ",\n    ".join(f"r.{field} = row.{field}" for field in fields)
+    return query + "\nRETURN count(*) AS merged"
+
+def delete_nodes_cypher(label, key):
+    return f"UNWIND $rows AS row\nMATCH (n:{label} {{{key}: row.{key}}})\nDETACH DELETE n"
+
+def delete_relationships_cypher(rel_type, start, end):
+    (start_label, start_key, start_field), (end_label, end_key, end_field) = start, end
+    return (
+        f"UNWIND $rows AS row\n"
+        f"MATCH (:{start_label} {{{start_key}: row.{start_field}}})"
+        f"-[r:{rel_type}]->(:{end_label} {{{end_key}: row.{end_field}}})\n"
+        f"DELETE r"
+    )
+
+
+# -------------------------------------------------------------------------------------
+# Neo4j
+# -------------------------------------------------------------------------------------
+
+class Neo4jGraphSink:
+    """
+    Writes batches to Neo4j. The driver is imported lazily, so the import
+    logic can be loaded on machines without the neo4j package or server.
+    """
+    persistent = True
+    counts_writes = True
+
+    def __init__(self, uri, auth):
+        from neo4j import GraphDatabase
+        self.driver = GraphDatabase.driver(uri, auth=auth)
+
+    def run(self, query, rows):
+        """
+        Executes one statement with $rows in a write transaction. The number of
+        rows a MERGE statement returns is reported as 'merged'.
+        """
+        attempt = {'count': 0, 'counters': {}}
+
+        def work(tx):
+            # The driver calls this again on transient errors, so only the
+            # counters of the final (committed) attempt are kept
+            attempt['count'] += 1
+            result = tx.run(query, rows=rows)
+            records = list(result)
+            counters = result.consume().counters
+            attempt['counters'] = {field: getattr(counters, field) for field in COUNTER_FIELDS}
+            attempt['counters']['merged'] = records[0]['merged'] if records else 0
+
+        with self.driver.session() as session:
+            session.execute_write(work)
+
+        result = dict(attempt['counters'])
+        result['attempts'] = attempt['count']
+        return result
+
+    def merge_nodes(self, label, key, rows):
+        counters = self.run(merge_nodes_cypher(label, key, _property_fields(rows, {key})), rows)
+        counters['nodes_matched'] = counters.pop('merged') - counters['nodes_created']
+        return counters
+
+    def merge_relationships(self, rel_type, start, end, rows):
+        fields = _property_fields(rows, {start[2], end[2]})
+        counters = self.run(merge_relationships_cypher(rel_type, start, end, fields), rows)
+        counters['relationships_matched'] = counters.pop('merged') - counters['relationships_created']
+        return counters
+
+    def delete_nodes(self, label, key, rows):
+        return self.run(delete_nodes_cypher(label, key), rows)
+
+    def delete_relationships(self, rel_type, start, end, rows):
+        return self.run(delete_relationships_cypher(rel_type, start, end), rows)
+
+    def snapshot(self, keys, rel_types):
+        """
+        Reads the nodes of the labels in keys (label -> key property) and the
+        relationships of rel_types between them, in MemoryGraphSink's format.
+        """
+        nodes, relationships = {}, {}
+
+        def node_id(labels, properties):
+            label = next(label for label in labels if label in keys)
+            return (label, keys[label], properties[keys[label]])
+
+        with self.driver.session() as session:
+            for label in keys:
+                for record in session.run(f"MATCH (n:{label}) RETURN labels(n) AS labels, properties(n) AS props"):
+                    nodes[node_id(record['labels'], record['props'])] = dict(record['props'])
+            for rel_type in rel_types:
+                query = (f"MATCH (a)-[r:{rel_type}]->(b) RETURN labels(a) AS a_labels, properties(a) AS a, "
+                         f"labels(b) AS b_labels, properties(b) AS b, properties(r) AS props")
+                for record in session.run(query):
+                    rel_id = (rel_type, node_id(record['a_labels'], record['a']), node_id(record['b_labels'], record['b']))
+                    relationships[rel_id] = dict(record['props'])
+        return nodes, relationships
+
+    def close(self):
+        self.driver.close()
+
+
+# -------------------------------------------------------------------------------------
+# In-process property graph
+# -------------------------------------------------------------------------------------
+
+class MemoryGraphSink:
+    """
+    Minimal in-memory property graph with Neo4j's MERGE semantics:
+    - merging a node creates it if its key is unknown, then sets the properties
+      (a None value removes the property, like SET n.x = null)
+    - merging a relationship only happens if both end nodes exist (MATCH),
+      and at most one relationship of a type exists between two nodes
+    - deleting a node also deletes its relationships (DETACH DELETE)
+    """
+    persistent = False
+    counts_writes = True
+
+    def __init__(self):
+        self.nodes = {}          # (label, key, value) -> properties
+        self.relationships = {}  # (rel_type, start node, end node) -> properties
+
+    def _set_properties(self, target, row, fields, counters):
+        for field in fields:
+            value = row[field]
+            if value is None:
+                target.pop(field, None)
+            else:
+                target[field] = value
+            counters['properties_set'] += 1
+
+    def merge_nodes(self, label, key, rows):
+        counters = _empty_counters()
+        for row in rows:
+            node_id = (label, key, row[key])
+            if node_id not in self.nodes:
+                self.nodes[node_id] = {key: row[key]}
+                counters['nodes_created'] += 1
+                counters['properties_set'] += 1
+            else:
+                counters['nodes_matched'] += 1
+            self._set_properties(self.nodes[node_id], row, _property_fields([row], {key}), counters)
+        return counters
+
+    def merge_relationships(self, rel_type, start, end, rows):
+        counters = _empty_counters()
+        for row in rows:
+            a = (start[0], start[1], row[start[2]])
+            b = (end[0], end[1], row[end[2]])
+            if a not in self.nodes or b not in self.nodes:
+                continue
+            rel_id = (rel_type, a, b)
+            if rel_id not in self.relationships:
+                self.relationships[rel_id] = {}
+                counters['relationships_created'] += 1
+            else:
+                counters['relationships_matched'] += 1
+            self._set_properties(self.relationships[rel_id], row,
+                                 _property_fields([row], {start[2], end[2]}), counters)
+        return counters
+
+    def delete_nodes(self, label, key, rows):
+        counters = _empty_counters()
+        doomed = {(label, key, row[key]) for row in rows} & self.nodes.keys()
+        for rel_id in [rel_id for rel_id in self.relationships if rel_id[1] in doomed or rel_id[2] in doomed]:
+            del self.relationships[rel_id]
+            counters['relationships_deleted'] += 1
+        for node_id in doomed:
+            del self.nodes[node_id]
+            counters['nodes_deleted'] += 1
+        return counters
+
+    def delete_relationships(self, rel_type, start, end, rows):
+        counters = _empty_counters()
+        for row in rows:
+            rel_id = (rel_type, (start[0], start[1], row[start[2]]), (end[0], end[1], row[end[2]]))
+            if self.relationships.pop(rel_id, None) is not None:
+                counters['relationships_deleted'] += 1
+        return counters
+
+    def snapshot(self, keys, rel_types):
+        """Copies the nodes of the labels in keys and the relationships of rel_types."""
+        nodes = {node_id: dict(props) for node_id, props in self.nodes.items() if node_id[0] in keys}
+        relationships = {rel_id: dict(props) for rel_id, props in self.relationships.items()
+                         if rel_id[0] in rel_types}
+        return nodes, relationships
+
+    def summary(self):
+        """Returns node counts per label and relationship counts per type."""
+        counts = {}
+        for label, _, _ in self.nodes:
+            counts[label] = counts.get(label, 0) + 1
+        for rel_type, _, _ in self.relationships:
+            counts[rel_type] = counts.get(rel_type, 0) + 1
+        return counts
+
+    def close(self):
+        pass
+
+
+# -------------------------------------------------------------------------------------
+# Recording stub
+# -------------------------------------------------------------------------------------
+
+class RecordingGraphSink:
+    """
+    Records every statement and the shape of its batch (row count, fields).
+    If an inner sink is given, the batches are forwarded to it as well and its
+    counters are returned; without one, nothing is counted.
+    """
+    persistent = False
+
+    def __init__(self, inner=None):
+        self.inner = inner
+        self.counts_writes = inner is not None and inner.counts_writes
+        self.statements = []
+
+    def _record(self, query, rows, method, *args):
+        started = time.perf_counter()
+        counters = getattr(self.inner, method)(*args, rows) if self.inner else _empty_counters()
+        self.statements.append({
+            'statement': query,
+            'rows': len(rows),
+            'fields': sorted(rows[0]) if rows else [],
+            'seconds': time.perf_counter() - started
+        })
+        return counters
+
+    def merge_nodes(self, label, key, rows):
+        query = merge_nodes_cypher(label, key, _property_fields(rows, {key}))
+        return self._record(query, rows, 'merge_nodes', label, key)
+
+    def merge_relationships(self, rel_type, start, end, rows):
+        query = merge_relationships_cypher(rel_type, start, end, _property_fields(rows, {start[2], end[2]}))
+        return self._record(query, rows, 'merge_relationships', rel_type, start, end)
+
+    def delete_nodes(self, label, key, rows):
+        return self._record(delete_nodes_cypher(label, key), rows, 'delete_nodes', label, key)
+
+    def delete_relationships(self, rel_type, start, end, rows):
+        query = delete_relationships_cypher(rel_type, start, end)
+        return self._record(query, rows, 'delete_relationships', rel_type, start, end)
+
+    def statement_summary(self):
+        """
+        Returns one entry per distinct statement: the statement, its row fields,
+        the number of batches and rows and the size of every batch, in order.
+        """
+        summary = {}
+        for entry in self.statements:
+            item = summary.setdefault(entry['statement'], {
+                'statement': entry['statement'], 'fields': entry['fields'],
+                'batches': 0, 'rows': 0, 'batch_sizes': [], 'seconds': 0.0
+            })
+            item['batches'] += 1
+            item['rows'] += entry['rows']
+            item['batch_sizes'].append(entry['rows'])
+            item['seconds'] += entry['seconds']
+        return list(summary.values())
+
+    def write_json(self, path):
+        """Writes the statement summary to path; returns the summary."""
+        summary = self.statement_summary()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'statements': summary}, f, indent=2, ensure_ascii=False)
+        return summary
+
+    def close(self):
+        if self.inner:
+            self.inner.close()
+
+
+def open_graph_sink(kind, uri=None, auth=None):
+    """
+    Creates a graph sink by name: "neo4j", "memory" or "recording".
+    """
+    if kind == 'neo4j':
+        return Neo4jGraphSink(uri, auth)
+    if kind == 'memory':
+        return MemoryGraphSink()
+    if kind == 'recording':
+        return RecordingGraphSink()
+    raise ValueError(f"Unknown graph sink: {kind}")
+
+
+# -------------------------------------------------------------------------------------
+# MERGE semantics check
+# -------------------------------------------------------------------------------------
+
+# Scratch labels with the shapes of the Project/Publication node loaders and the
+# HAS_PUBLICATION relationship loader of 05, so a check never touches imported data
+CHECK_PROJECT_REF = ("SinkCheckProject", "id", "project_id")
+CHECK_PUBLICATION_REF = ("SinkCheckPublication", "doi", "doi")
+CHECK_REL_TYPE = "SINK_CHECK_HAS_PUBLICATION"
+
+def check_merge_semantics(sink):
+    """
+    Writes a fixed sequence of batches through sink and compares the counters
+    (created, matched, deleted) and the resulting graph with what Neo4j's
+    MERGE/MATCH/SET semantics give:
+    - MERGE creates unknown nodes and matches known ones; SET x = null removes x
+    - a relationship row whose end node does not exist creates nothing (MATCH)
+    - merging an existing relationship matches it and updates its properties
+    The scratch nodes are deleted again. The sink needs counts_writes and a
+    snapshot() method. Returns a list of mismatches (empty if all is as expected).
+    """
+    project, publication = CHECK_PROJECT_REF, CHECK_PUBLICATION_REF
+    mismatches = []
+
+    def expect(step, counters, **expected):
+        for field, value in expected.items():
+            if counters.get(field, 0) != value:
+                mismatches.append(f"{step}: {field} = {counters.get(field, 0)}, expected {value}")
+
+    # Node loaders
+    counters = sink.merge_nodes(project[0], project[1], [{"id": "p1", "title": "A"}, {"id": "p2", "title": "B"}])
+    expect("create projects", counters, nodes_created=2, nodes_matched=0)
+    counters = sink.merge_nodes(publication[0], publication[1], [
+        {"doi": "d1", "title": "T", "citation_count": 3},
+        {"doi": "d2", "title": "U", "citation_count": 1},
+    ])
+    expect("create publications", counters, nodes_created=2, nodes_matched=0)
+    counters = sink.merge_nodes(publication[0], publication[1], [{"doi": "d1", "title": "T", "citation_count": None}])
+    expect("update publication", counters, nodes_created=0, nodes_matched=1)
+
+    # Relationship loader
+    counters = sink.merge_relationships(CHECK_REL_TYPE, project, publication, [
+        {"project_id": "p1", "doi": "d1", "relevance": 0.5},
+        {"project_id": "p1", "doi": "missing", "relevance": 0.9},
+    ])
+    expect("create relationships", counters, relationships_created=1, relationships_matched=0)
+    counters = sink.merge_relationships(CHECK_REL_TYPE, project, publication, [
+        {"project_id": "p1", "doi": "d1", "relevance": 0.7},
+        {"project_id": "p2", "doi": "d2", "relevance": None},
+    ])
+    expect("merge relationships", counters, relationships_created=1, relationships_matched=1)
+
+    # Resulting graph
+    p1, p2 = (project[0], project[1], "p1"), (project[0], project[1], "p2")
+    d1, d2 = (publication[0], publication[1], "d1"), (publication[0], publication[1], "d2")
+    expected_nodes = {
+        p1: {"id": "p1", "title": "A"},
+        p2: {"id": "p2", "title": "B"},
+        d1: {"doi": "d1", "title": "T"},
+        d2: {"doi": "d2", "title": "U", "citation_count": 1},
+    }
+    expected_relationships = {
+        (CHECK_REL_TYPE, p1, d1): {"relevance": 0.7},
+        (CHECK_REL_TYPE, p2, d2): {},
+    }
+    nodes, relationships = sink.snapshot({project[0]: project[1], publication[0]: publication[1]}, [CHECK_REL_TYPE])
+    if nodes != expected_nodes:
+        mismatches.append(f"nodes: {nodes}, expected {expected_nodes}")
+    if relationships != expected_relationships:
+        mismatches.append(f"relationships: {relationships}, expected {expected_relationships}")
+
+    # Clean up: deleting a node also deletes its relationships
+    counters = sink.delete_nodes(publication[0], publication[1], [{"doi": "d1"}, {"doi": "d2"}])
+    expect("delete publications", counters, nodes_deleted=2, relationships_deleted=2)
+    counters = sink.delete_nodes(project[0], project[1], [{"id": "p1"}, {"id": "p2"}])
+    expect("delete projects", counters, nodes_deleted=2)
+    return mismatches
@@ -0,0 +1,247 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from pipeline_tables import PipelineTables
+from surrogate_keys import key_lookup
+
+# =====================================================================================
+# Module: Compact CSR snapshot of the Knowledge Graph
+# Date: October 2026
+#
+# Description:
+# Stores the Project/Funder/Country/Publication graph as integer arrays that can be
+# memory-mapped, so whole-graph analytics (graph_algorithms.py) run in-process with
+# NumPy instead of Neo4j GDS or Python loops over the CSVs.
+#
+# Format (one directory, SNAPSHOT_DIR):
+# - manifest.json: labels with node count and offset, edge blocks, format version
+# - <Label>.keys.txt: the key of every node of the label (Project.id, Funder.name, ...),
+#   one per line; the line number is the node's local ID
+# - <TYPE>.indptr.npy, <TYPE>.indices.npy: one typed edge block per relationship type
+#   in CSR form. Row i lists the local IDs of the targets of source node i.
+#
+# Every node also has a global ID: offset of its label + local ID. The labels are laid
+# out one after the other in LABELS order.
+#
+# The snapshot mirrors what 05_import_to_neo4j.py imports: only sampled projects and
+# the nodes linked to them, relationships only between existing nodes, no duplicates.
+# The edges are built from the integer keys of the relation CSVs; local IDs are the
+# ranks of the kept keys, and the natural IDs are only read for the key files.
+# =====================================================================================
+
+SNAPSHOT_DIR = 'data/graph_snapshot'
+SNAPSHOT_VERSION = 1
+
+CSV_DIR = 'data/projects_data_csv'
+
+# Node label -> (key property, dictionary CSV, natural ID column); in global ID order
+LABELS = {
+    'Project': ('id', 'projects.csv', 'id'),
+    'Funder': ('name', 'funders.csv', 'name'),
+    'Country': ('jurisdiction', 'countries.csv', 'jurisdiction'),
+    'Publication': ('doi', 'project_publications.csv', 'doi'),
+}
+
+# Relationship type -> (source label, target label, CSV file, source key column, target key column)
+# ACKNOWLEDGED_IN has no CSV: it is derived from FUNDED_BY and HAS_PUBLICATION, like in 05
+RELATIONSHIPS = {
+    'FUNDED_BY': ('Project', 'Funder', 'project_funder_rel.csv', 'project_key', 'funder_key'),
+    'LOCATED_IN': ('Project', 'Country', 'project_country_rel.csv', 'project_key', 'country_key'),
+    'HAS_PUBLICATION': ('Project', 'Publication', 'publication_project_rel.csv', 'project_key', 'publication_key'),
+    'ACKNOWLEDGED_IN': ('Funder', 'Publication', None, None, None),
+}
+
+
+def csr_from_pairs(sources, targets, n_sources):
+    """
+    Returns (indptr, indices) of the CSR adjacency with an edge for every
+    distinct (source, target) pair; targets are sorted within each row.
+    """
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.lexsort((targets, sources))
+    sources, targets = sources[order], targets[order]
+    if len(sources):
+        distinct = np.ones(len(sources), dtype=bool)
+        distinct[1:] = (sources[1:] != sources[:-1]) | (targets[1:] != targets[:-1])
+        sources, targets = sources[distinct], targets[distinct]
+    indptr = np.zeros(n_sources + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n_sources), out=indptr[1:])
+    return indptr, targets.astype(np.int32)
+
+
+# -------------------------------------------------------------------------------------
+# Export
+# -------------------------------------------------------------------------------------
+
+def _read_dictionary(tables, csv_file, column):
+    """Returns the keys and natural IDs of a dictionary table, sorted by key."""
+    try:
+        dictionary = tables.read(os.path.join(CSV_DIR, csv_file), usecols=['key', column],
+                                 dtype={'key': np.int64, column: str})
+    except FileNotFoundError:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=object)
+    dictionary = dictionary.dropna().drop_duplicates('key').sort_values('key')
+    return dictionary['key'].to_numpy(), dictionary[column].to_numpy(dtype=object)
+
+def _read_pairs(tables, csv_file, source_column, target_column):
+    try:
+        pairs = tables.read(os.path.join(CSV_DIR, csv_file), usecols=[source_column, target_column],
+                            dtype=np.int64)
+    except FileNotFoundError:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return pairs[source_column].to_numpy(), pairs[target_column].to_numpy()
+
+def _local_ids(lookup, keys):
+    """Maps keys to local IDs with a key_lookup() array; -1 for keys not kept."""
+    local = np.full(len(keys), -1, dtype=np.int64)
+    inside = keys < len(lookup)
+    local[inside] = lookup[keys[inside]]
+    return local
+
+def export_snapshot(path=SNAPSHOT_DIR, project_keys=None, tables=None):
+    """
+    Builds the snapshot from the pipeline tables (from tables if given, else the
+    CSVs; restricted to project_keys, if given) and writes it to path.
+    Returns the manifest.
+    """
+    tables = tables or PipelineTables()
+    sample = None if project_keys is None else np.fromiter(project_keys, dtype=np.int64)
+    relation_pairs = {}
+    for rel_type, (_, _, csv_file, source_column, target_column) in RELATIONSHIPS.items():
+        if csv_file is None:
+            continue
+        sources, targets = _read_pairs(tables, csv_file, source_column, target_column)
+        if sample is not None:
+            in_sample = np.isin(sources, sample)
+            sources, targets = sources[in_sample], targets[in_sample]
+        relation_pairs[rel_type] = (sources, targets)
+
+    # Kept keys and natural IDs per label; with a sample, only the nodes linked to sampled projects
+    keys, natural_ids, lookups = {}, {}, {}
+    for label, (_, csv_file, column) in LABELS.items():
+        label_keys, label_ids = _read_dictionary(tables, csv_file, column)
+        if sample is not None:
+            if label == 'Project':
+                kept = np.isin(label_keys, sample)
+            else:
+                linked = [targets for rel_type, (_, targets) in relation_pairs.items()
+                          if RELATIONSHIPS[rel_type][1] == label]
+                kept = np.isin(label_keys, np.concatenate(linked)) if linked else np.zeros(len(label_keys), bool)
+            label_keys, label_ids = label_keys[kept], label_ids[kept]
+        keys[label], natural_ids[label] = label_keys, label_ids
+        lookups[label] = key_lookup(label_keys)
+
+    # Typed edge blocks in local IDs; pairs with an unknown end node are dropped
+    blocks = {}
+    for rel_type, (sources, targets) in relation_pairs.items():
+        source_label, target_label = RELATIONSHIPS[rel_type][:2]
+        sources = _local_ids(lookups[source_label], sources)
+        targets = _local_ids(lookups[target_label], targets)
+        known = (sources >= 0) & (targets >= 0)
+        blocks[rel_type] = (sources[known], targets[known])
+
+    # Funder -> Publication for every publication of a project the funder funded
+    funded_projects, funders = blocks['FUNDED_BY']
+    published_projects, publications = blocks['HAS_PUBLICATION']
+    acknowledged = (pd.DataFrame({'project': funded_projects, 'funder': funders})
+                    .merge(pd.DataFrame({'project': published_projects, 'publication': publications}), on='project'))
+    blocks['ACKNOWLEDGED_IN'] = (acknowledged['funder'].to_numpy(), acknowledged['publication'].to_numpy())
+
+    os.makedirs(path, exist_ok=True)
+    manifest_file = os.path.join(path, 'manifest.json')
+    if os.path.exists(manifest_file):
+        os.remove(manifest_file)
+    manifest = {'version': SNAPSHOT_VERSION, 'labels': {}, 'blocks': {}}
+    offset = 0
+    for label, label_keys in keys.items():
+        with open(os.path.join(path, f'{label}.keys.txt'), 'w', encoding='utf-8') as f:
+            f.write(''.join(f'{natural_id}\n' for natural_id in natural_ids[label].tolist()))
+        manifest['labels'][label] = {'key': LABELS[label][0], 'count': len(label_keys), 'offset': offset}
+        offset += len(label_keys)
+    for rel_type, (sources, targets) in blocks.items():
+        source_label, target_label = RELATIONSHIPS[rel_type][:2]
+        indptr, indices = csr_from_pairs(sources, targets, len(keys[source_label]))
+        np.save(os.path.join(path, f'{rel_type}.indptr.npy'), indptr)
+        np.save(os.path.join(path, f'{rel_type}.indices.npy'), indices)
+        manifest['blocks'][rel_type] = {'source': source_label, 'target': target_label, 'edges': len(indices)}
+
+    # The manifest is written last: a snapshot without it is incomplete
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+# -------------------------------------------------------------------------------------
+# Reading
+# -------------------------------------------------------------------------------------
+
+class GraphSnapshot:
+    """
+    Read access to a snapshot. The edge blocks are memory-mapped (read-only) and
+    the node keys are only read when a key lookup needs them.
+    """
+
+    def __init__(self, path=SNAPSHOT_DIR):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json'), 'r', encoding='utf-8') as f:
+            self.manifest = json.load(f)
+        if self.manifest.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported graph snapshot version {self.manifest.get('version')} in {path}")
+        self.labels = self.manifest['labels']
+        self.node_count = sum(label['count'] for label in self.labels.values())
+        self._blocks = {}
+        self._keys = {}
+
+    @property
+    def edge_types(self):
+        return list(self.manifest['blocks'])
+
+    def block(self, rel_type):
+        """Returns (indptr, indices) of one edge block, in local IDs."""
+        if rel_type not in self._blocks:
+            self._blocks[rel_type] = tuple(
+                np.load(os.path.join(self.path, f'{rel_type}.{part}.npy'), mmap_mode='r')
+                for part in ('indptr', 'indices'))
+        return self._blocks[rel_type]
+
+    def edges(self, rel_type):
+        """Returns the (source, target) global node IDs of every edge of one type."""
+        info = self.manifest['blocks'][rel_type]
+        indptr, indices = self.block(rel_type)
+        sources = np.repeat(np.arange(len(indptr) - 1, dtype=np.int64), np.diff(indptr))
+        return (sources + self.labels[info['source']]['offset'],
+                np.asarray(indices, dtype=np.int64) + self.labels[info['target']]['offset'])
+
+    def label_range(self, label):
+        """Returns the global IDs of all nodes of a label as a range (start, stop)."""
+        info = self.labels[label]
+        return info['offset'], info['offset'] + info['count']
+
+    def label_of(self, node):
+        for label, info in self.labels.items():
+            if info['offset'] <= node < info['offset'] + info['count']:
+                return label
+        raise IndexError(f"Node {node} is not in the snapshot")
+
+    def keys(self, label):
+        """Returns the keys of all nodes of a label, indexed by local ID."""
+        if label not in self._keys:
+            with open(os.path.join(self.path, f'{label}.keys.txt'), 'r', encoding='utf-8') as f:
+                self._keys[label] = pd.Index(f.read().splitlines())
+        return self._keys[label]
+
+    def key(self, node):
+        """Returns (label, key) of a global node ID."""
+        label = self.label_of(node)
+        return label, self.keys(label)[node - self.labels[label]['offset']]
+
+    def node_id(self, label, key):
+        """Returns the global ID of the node with the given key, or None."""
+        local = self.keys(label).get_indexer([key])[0]
+        return None if local < 0 else self.labels[label]['offset'] + int(local)
+
+
+def open_snapshot(path=SNAPSHOT_DIR):
+    return GraphSnapshot(path)
@@ -0,0 +1,221 @@
+import json
+import os
+import time
+
+# =====================================================================================
+# Module: Import metrics for the Neo4j Knowledge Graph creator
+# Date: October 2026
+#
+# Description:
+# Collects per-loader statistics while 05_import_to_neo4j.py writes to the graph:
+# row throughput, a histogram of transaction latencies, transaction retries and the
+# update counters reported by Neo4j (nodes created, relationships created, ...).
+# At the end of a run the numbers are written to a JSON report and to a Prometheus
+# textfile, so slow loaders and loaders that silently matched nothing stand out.
+# =====================================================================================
+
+# Upper bounds (in seconds) of the transaction latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Update counters taken from Neo4j's result.consume().counters
+COUNTER_FIELDS = (
+    'nodes_created', 'nodes_deleted',
+    'relationships_created', 'relationships_deleted',
+    'properties_set'
+)
+
+# Existing nodes/relationships a MERGE matched instead of creating them. Not a Neo4j
+# counter: the sinks derive it from the rows each MERGE statement returns.
+MATCH_FIELDS = ('nodes_matched', 'relationships_matched')
+
+
+class LoaderMetrics:
+    """
+    Statistics of one loader (e.g. "Project" or "FUNDED_BY") during one run.
+    counts_writes is False for sinks that report no counters (the recording
+    stub), so that their empty counters are not taken for failed writes.
+    """
+
+    def __init__(self, name, counts_writes=True):
+        self.name = name
+        self.counts_writes = counts_writes
+        self.status = 'pending'
+        self.error = None
+        self.rows_total = 0       # rows in the current snapshot
+        self.rows_sent = 0        # rows written (inserts and updates)
+        self.rows_deleted = 0     # delete statements sent
+        self.batches = 0
+        self.retries = 0
+        self.counters = {field: 0 for field in COUNTER_FIELDS + MATCH_FIELDS}
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.latency_sum = 0.0
+        self.started = None
+        self.finished = None
+
+    def start(self):
+        self.status = 'running'
+        self.started = time.time()
+
+    def finish(self, error=None):
+        self.finished = time.time()
+        self.status = 'failed' if error else 'ok'
+        self.error = str(error) if error else None
+
+    def record_batch(self, rows, seconds, attempts, counters):
+        """
+        Records one write transaction: its size, duration, the number of
+        attempts the driver needed and the update counters of the final attempt.
+        """
+        self.batches += 1
+        self.retries += max(attempts - 1, 0)
+        self.latency_sum += seconds
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.latency_buckets[i] += 1
+        for field in self.counters:
+            self.counters[field] += counters.get(field, 0)
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def rows_per_second(self):
+        rows = self.rows_sent + self.rows_deleted
+        return rows / self.duration if self.duration > 0 else 0.0
+
+    def warnings(self):
+        """
+        Returns human-readable hints about suspicious results, e.g. a loader
+        that sent rows but did not change anything in the graph.
+        """
+        hints = []
+        if self.status == 'failed':
+            hints.append(f"{self.name}: failed ({self.error})")
+        if not self.counts_writes or not self.rows_sent:
+            return hints
+        # Rows whose MERGE created or matched something; the rest found no end nodes
+        merged = sum(self.counters[field] for field in
+                     ('nodes_created', 'nodes_matched', 'relationships_created', 'relationships_matched'))
+        if merged == 0:
+            hints.append(f"{self.name}: {self.rows_sent} rows sent but nothing was written (MATCH found no nodes?)")
+        elif merged < self.rows_sent:
+            hints.append(f"{self.name}: {self.rows_sent - merged} of {self.rows_sent} rows "
+                         f"created or matched nothing (MATCH found no nodes?)")
+        return hints
+
+    def to_dict(self):
+        return {
+            'status': self.status,
+            'error': self.error,
+            'rows_total': self.rows_total,
+            'rows_sent': self.rows_sent,
+            'rows_deleted': self.rows_deleted,
+            'batches': self.batches,
+            'retries': self.retries,
+            'duration_seconds': round(self.duration, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'counters': dict(self.counters),
+            'transaction_latency': {
+                'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS, self.latency_buckets)},
+                'count': self.batches,
+                'sum_seconds': round(self.latency_sum, 6)
+            },
+            'warnings': self.warnings()
+        }
+
+
+class ImportReport:
+    """
+    Collection of LoaderMetrics for a whole import run.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.loaders = {}
+        self.counts_writes = True   # False for a sink without counters (see LoaderMetrics)
+
+    def loader(self, name):
+        """Returns the metrics of a loader, creating them on first use."""
+        if name not in self.loaders:
+            self.loaders[name] = LoaderMetrics(name, self.counts_writes)
+        return self.loaders[name]
+
+    def warnings(self):
+        return [hint for metrics in self.loaders.values() for hint in metrics.warnings()]
+
+    def to_dict(self):
+        return {
+            'started': self.started,
+            'duration_seconds': round(time.time() - self.started, 3),
+            'loaders': {name: metrics.to_dict() for name, metrics in self.loaders.items()},
+            'warnings': self.warnings()
+        }
+
+    def write_json(self, path):
+        _write_atomically(path, json.dumps(self.to_dict(), indent=2, ensure_ascii=False))
+
+    def write_prometheus(self, path):
+        """
+        Writes the metrics in the Prometheus text exposition format, suitable
+        for the node_exporter textfile collector. All values describe the last
+        run and are reset by the next one, so they are gauges.
+        """
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}")
+
+        loaders = list(self.loaders.values())
+        metric('kg_import_rows_sent', 'gauge', 'Rows written per loader in the last run.',
+               [({'loader': m.name}, m.rows_sent) for m in loaders])
+        metric('kg_import_rows_deleted', 'gauge', 'Delete statements sent per loader in the last run.',
+               [({'loader': m.name}, m.rows_deleted) for m in loaders])
+        metric('kg_import_rows_per_second', 'gauge', 'Write throughput per loader.',
+               [({'loader': m.name}, round(m.rows_per_second, 3)) for m in loaders])
+        metric('kg_import_retries', 'gauge', 'Transaction retries per loader in the last run.',
+               [({'loader': m.name}, m.retries) for m in loaders])
+        metric('kg_import_graph_updates', 'gauge', 'Update counters reported by the graph sink in the last run.',
+               [({'loader': m.name, 'counter': field}, m.counters[field])
+                for m in loaders for field in COUNTER_FIELDS + MATCH_FIELDS])
+        metric('kg_import_loader_duration_seconds', 'gauge', 'Duration of the loader in the last run.',
+               [({'loader': m.name}, round(m.duration, 3)) for m in loaders])
+        metric('kg_import_loader_success', 'gauge', '1 if the loader finished without error.',
+               [({'loader': m.name}, int(m.status == 'ok')) for m in loaders])
+
+        lines.append("# HELP kg_import_transaction_seconds Write transaction latency per loader.")
+        lines.append("# TYPE kg_import_transaction_seconds histogram")
+        for m in loaders:
+            loader = _escape(m.name)
+            for bound, count in zip(LATENCY_BUCKETS, m.latency_buckets):
+                lines.append(f'kg_import_transaction_seconds_bucket{{loader="{loader}",le="{bound}"}} {count}')
+            lines.append(f'kg_import_transaction_seconds_bucket{{loader="{loader}",le="+Inf"}} {m.batches}')
+            lines.append(f'kg_import_transaction_seconds_sum{{loader="{loader}"}} {m.latency_sum:.6f}')
+            lines.append(f'kg_import_transaction_seconds_count{{loader="{loader}"}} {m.batches}')
+
+        lines.append("# HELP kg_import_last_run_timestamp_seconds Start time of the last import run.")
+        lines.append("# TYPE kg_import_last_run_timestamp_seconds gauge")
+        lines.append(f"kg_import_last_run_timestamp_seconds {self.started:.0f}")
+        lines.append("# HELP kg_import_last_run_duration_seconds Duration of the last import run.")
+        lines.append("# TYPE kg_import_last_run_duration_seconds gauge")
+        lines.append(f"kg_import_last_run_duration_seconds {time.time() - self.started:.3f}")
+
+        _write_atomically(path, '\n'.join(lines) + '\n')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _write_atomically(path, text):
+    # The textfile collector may read at any time, so never expose a partial file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
@@ -0,0 +1,256 @@
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# =====================================================================================
+# Module: Run reports with timed spans and optional profiling
+# Date: October 2026
+#
+# Description:
+# Every pipeline stage and the dashboard loader run inside instrumented_run(name).
+# Within a run, span(phase) times the phases of the work; spans nest, e.g.
+# "05_import_to_neo4j/transaction" when 05 is run by run_pipeline.py. Common phases:
+# - read / write: pipeline tables and other files (see pipeline_tables.py)
+# - decode: parsing raw inputs (JSON files, API responses) and decoding integer keys
+# - transform: the computation of a stage
+# - http: API requests, transaction: graph sink writes
+#
+# At the end of a run, a report with the count, total and maximum time of every span,
+# the wall time and the peak RSS of the process is printed and written to
+# RUN_REPORT_DIR/<name>.json (the latest run of each name).
+#
+# Profiling is off by default and enabled with the environment variable KG_PROFILE
+# (or run_pipeline.py --profile):
+# - KG_PROFILE=cprofile: cProfile over the whole run; the report lists the functions
+#   with the highest cumulative time, the full stats are saved to <name>.prof
+#   (e.g. for snakeviz or python -m pstats)
+# - KG_PROFILE=tracemalloc: traces Python allocations; the report lists the source
+#   lines holding the most memory at the end of the run and the traced peak
+# - KG_PROFILE=all (or 1): both. tracemalloc slows the run down considerably.
+#
+# Outside of a run, span() does nothing. Runs are tracked per thread, so concurrent
+# dashboard sessions do not mix their spans.
+# =====================================================================================
+
+PROFILE_ENV = 'KG_PROFILE'
+PROFILE_MODES = ('cprofile', 'tracemalloc')
+
+RUN_REPORT_DIR = 'data/run_reports'
+TOP_ENTRIES = 15    # Spans, functions and allocation sites listed in the printed report
+
+_state = threading.local()
+
+
+def profile_modes(value=None):
+    """
+    Parses a KG_PROFILE value (default: the environment variable) into the
+    set of enabled profilers. Raises ValueError for unknown modes.
+    """
+    value = os.environ.get(PROFILE_ENV, '') if value is None else value
+    modes = {mode.strip().lower() for mode in value.split(',') if mode.strip()}
+    if modes & {'1', 'all', 'true'}:
+        return set(PROFILE_MODES)
+    unknown = modes - set(PROFILE_MODES)
+    if unknown:
+        raise ValueError(f"Unknown {PROFILE_ENV} mode(s): {', '.join(sorted(unknown))} "
+                         f"(use {', '.join(PROFILE_MODES)} or all)")
+    return modes
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class RunReport:
+    """
+    Spans, memory figures and profiler results of one run.
+    """
+
+    def __init__(self, name, profile=()):
+        self.name = name
+        self.profile = set(profile)
+        self.started = time.time()
+        self.finished = None
+        self.status = 'running'
+        self.error = None
+        self.spans = {}     # span path -> [count, total seconds, max seconds]
+        self.stack = []     # names of the open spans
+        self.peak_rss_mb = None
+        self.top_functions = []
+        self.top_allocations = []
+        self.traced_peak_mb = None
+        self._profiler = None
+        self._tracing = False
+
+    def record(self, path, seconds):
+        stats = self.spans.get(path)
+        if stats is None:
+            self.spans[path] = [1, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+
+    def start_profiling(self):
+        if 'tracemalloc' in self.profile:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+        if 'cprofile' in self.profile:
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop_profiling(self):
+        if self._profiler is not None:
+            import pstats
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler).stats
+            # (file, line, function) -> (primitive calls, calls, own time, cumulative time, callers).
+            # The import machinery and builtins ('~') are only in the .prof file.
+            entries = [entry for entry in stats.items() if not entry[0][0].startswith(('<frozen', '~'))]
+            entries = sorted(entries, key=lambda entry: entry[1][3], reverse=True)[:TOP_ENTRIES]
+            self.top_functions = [
+                {'function': _site(filename, line, function), 'calls': calls,
+                 'own_seconds': round(own, 4), 'cumulative_seconds': round(cumulative, 4)}
+                for (filename, line, function), (_, calls, own, cumulative, _) in entries
+            ]
+        if 'tracemalloc' in self.profile:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                self.traced_peak_mb = tracemalloc.get_traced_memory()[1] / 2**20
+                if self._tracing:
+                    tracemalloc.stop()
+                # Leave out the profilers' own bookkeeping
+                snapshot = snapshot.filter_traces([
+                    tracemalloc.Filter(False, tracemalloc.__file__),
+                    tracemalloc.Filter(False, '*/cProfile.py'),
+                    tracemalloc.Filter(False, '<frozen importlib._bootstrap*>'),
+                ])
+                self.top_allocations = [
+                    {'site': _site(stat.traceback[0].filename, stat.traceback[0].lineno),
+                     'size_mb': round(stat.size / 2**20, 3), 'blocks': stat.count}
+                    for stat in snapshot.statistics('lineno')[:TOP_ENTRIES]
+                ]
+
+    def finish(self, error=None):
+        self.finished = time.time()
+        self.status = 'failed' if error else 'ok'
+        self.error = str(error) if error else None
+        self.peak_rss_mb = peak_rss_mb()
+
+    @property
+    def duration(self):
+        return (self.finished or time.time()) - self.started
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'status': self.status,
+            'error': self.error,
+            'started': self.started,
+            'duration_seconds': round(self.duration, 3),
+            'peak_rss_mb': None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            'profile': sorted(self.profile),
+            'spans': [
+                {'name': path, 'count': count, 'total_seconds': round(total, 4), 'max_seconds': round(longest, 4)}
+                for path, (count, total, longest) in self.spans.items()
+            ],
+            'top_functions': self.top_functions,
+            'traced_peak_mb': None if self.traced_peak_mb is None else round(self.traced_peak_mb, 1),
+            'top_allocations': self.top_allocations,
+        }
+
+    def save(self, report_dir=RUN_REPORT_DIR):
+        """Writes <name>.json (and <name>.prof if profiled) to report_dir; returns the JSON path."""
+        os.makedirs(report_dir, exist_ok=True)
+        path = os.path.join(report_dir, f'{self.name}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+        if self._profiler is not None:
+            self._profiler.dump_stats(os.path.join(report_dir, f'{self.name}.prof'))
+        return path
+
+    def print_summary(self, path=None):
+        rss = f", peak RSS {self.peak_rss_mb:.0f} MB" if self.peak_rss_mb is not None else ""
+        print(f"📋 Run report {self.name}: {self.duration:.1f}s{rss}" + (f" ({path})" if path else ""))
+        slowest = sorted(self.spans.items(), key=lambda item: item[1][1], reverse=True)[:TOP_ENTRIES]
+        for span_path, (count, total, longest) in slowest:
+            print(f"   {total:8.2f}s {count:7d}x  max {longest:.3f}s  {span_path}")
+        if self.top_functions:
+            print("🐢 Top functions by cumulative time:")
+            for entry in self.top_functions:
+                print(f"   {entry['cumulative_seconds']:8.2f}s {entry['calls']:9d}x  {entry['function']}")
+        if self.top_allocations:
+            print(f"🧠 Top allocation sites (traced peak {self.traced_peak_mb:.1f} MB):")
+            for entry in self.top_allocations:
+                print(f"   {entry['size_mb']:8.2f} MB {entry['blocks']:9d} blocks  {entry['site']}")
+
+
+def _site(filename, line, function=None):
+    """Short source location: relative to the working directory where possible."""
+    try:
+        relative = os.path.relpath(filename)
+        filename = filename if relative.startswith('..') else relative
+    except ValueError:
+        pass  # e.g. another drive on Windows or a pseudo file name like '~'
+    return f"{filename}:{line}" + (f"({function})" if function else "")
+
+def current_run():
+    """The RunReport of the run active in this thread, or None."""
+    return getattr(_state, 'report', None)
+
+@contextmanager
+def span(name):
+    """Times a phase of the current run (see module description)."""
+    report = current_run()
+    if report is None:
+        yield
+        return
+    report.stack.append(name)
+    path = '/'.join(report.stack)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        report.record(path, time.perf_counter() - started)
+        report.stack.pop()
+
+@contextmanager
+def instrumented_run(name, profile=None, report_dir=RUN_REPORT_DIR):
+    """
+    Runs the enclosed code as a run named name: collects its spans, profiles it
+    if enabled (profile: set of PROFILE_MODES, default from KG_PROFILE) and
+    prints and writes the report at the end, also if the run fails.
+    Inside another run (a stage run by run_pipeline.py) it is a span of that run.
+    """
+    if current_run() is not None:
+        with span(name):
+            yield current_run()
+        return
+
+    report = RunReport(name, profile_modes() if profile is None else profile)
+    _state.report = report
+    report.start_profiling()
+    error = None
+    try:
+        yield report
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _state.report = None
+        report.stop_profiling()
+        report.finish(error)
+        report.print_summary(report.save(report_dir))
@@ -0,0 +1,71 @@
+import re
+import unicodedata
+from surrogate_keys import KeyDictionary
+
+# =====================================================================================
+# Module: Keyword normalisation and dictionary
+# Date: October 2026
+#
+# Description:
+# OpenAIRE stores the keywords of a project as one free-text string, e.g.
+# "Climate change; adaptation, Sea-Level rise". This module splits such strings into
+# single keywords, normalises them (Unicode NFKC, case-folded, whitespace collapsed,
+# surrounding punctuation removed) and interns every distinct keyword once in a
+# keyword dictionary with an integer key (see surrogate_keys.py).
+#
+# 02_extract_projects_to_csv.py hands the dictionary on as keywords.csv and the
+# project-keyword key pairs to project_keyword_rel.csv; 05 imports them
+# as Keyword nodes and HAS_KEYWORD relationships, 07 computes keyword co-occurrence.
+# =====================================================================================
+
+KEYWORDS_CSV = 'data/projects_data_csv/keywords.csv'
+PROJECT_KEYWORD_REL_CSV = 'data/projects_data_csv/project_keyword_rel.csv'
+KEYWORD_RELATED_CSV = 'data/projects_data_csv/keyword_related.csv'   # written by 07
+KEYWORD_TRENDS_CSV = 'data/projects_data_csv/keyword_trends.csv'     # written by 07
+
+# Characters separating the keywords of a project
+KEYWORD_SEPARATORS = re.compile(r'[,;|\n\r\t]+')
+
+# Keywords longer than this are free text, not keywords, and are dropped
+MAX_KEYWORD_LENGTH = 100
+
+
+def normalise_keyword(text):
+    """Returns the normalised form of one keyword, or '' if nothing is left of it."""
+    keyword = ' '.join(unicodedata.normalize('NFKC', text).casefold().split())
+    keyword = keyword.strip(' .:!?"\'`´()[]{}<>*#')
+    if len(keyword) > MAX_KEYWORD_LENGTH or not re.search(r'\w', keyword):
+        return ''
+    return keyword
+
+def split_keywords(raw):
+    """Splits a raw keyword string into its distinct normalised keywords, in order."""
+    keywords = {}
+    for part in KEYWORD_SEPARATORS.split(raw or ''):
+        keyword = normalise_keyword(part)
+        if keyword:
+            keywords[keyword] = None
+    return list(keywords)
+
+
+class KeywordDictionary(KeyDictionary):
+    """Interns normalised keywords and counts the projects per keyword."""
+
+    def __init__(self):
+        super().__init__()
+        self.projects = []
+
+    def project_keyword_keys(self, raw):
+        """Returns the keyword keys of one project's raw keyword string."""
+        keyword_keys = [self.key(keyword) for keyword in split_keywords(raw)]
+        for keyword_key in keyword_keys:
+            if keyword_key == len(self.projects):
+                self.projects.append(0)
+            self.projects[keyword_key] += 1
+        return keyword_keys
+
+    def to_frame(self):
+        """Returns the dictionary as a table key, keyword, projects (keywords.csv)."""
+        import pandas as pd
+        return pd.DataFrame({'key': range(len(self.values)), 'keyword': self.values, 'projects': self.projects},
+                            columns=['key', 'keyword', 'projects'])
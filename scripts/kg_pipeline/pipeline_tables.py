@@ -0,0 +1,108 @@
+import csv
+import os
+from instrumentation import span
+
+# =====================================================================================
+# Module: Tables handed from one pipeline stage to the next
+# Date: October 2026
+#
+# Description:
+# Every pipeline table is identified by the path of its CSV (PROJECTS_CSV etc. of the
+# stages). A stage writes a table with PipelineTables.write() and reads its inputs with
+# PipelineTables.read() / rows():
+# - Tables written in the same process are kept in memory and handed to the next stage
+#   as DataFrames, without writing and parsing the CSV in between
+# - Tables not in memory are read from the CSV, so every stage still runs on its own
+#   (python scripts/kg_pipeline/NN_....py) on the files of an earlier run
+# - A table is written to its CSV only if it is persisted: by default every table is,
+#   run_pipeline.py can restrict this to the configured ones (PERSIST_TABLES)
+#
+# pandas is only imported when a table is read from or written to a CSV.
+# Reads and writes are timed as "read" / "write" spans of the current run
+# (see instrumentation.py).
+# =====================================================================================
+
+
+class PipelineTables:
+    """
+    In-memory tables by CSV path, with the CSV files as fallback and
+    (optionally restricted) persistence.
+    """
+
+    def __init__(self, persist=None):
+        self.frames = {}
+        # CSV paths written to disk; None = all
+        self.persist = None if persist is None else set(persist)
+
+    def persisted(self, path):
+        return self.persist is None or path in self.persist
+
+    def exists(self, path):
+        return path in self.frames or os.path.exists(path)
+
+    def write(self, path, frame):
+        """Hands a table to the later stages and writes it to its CSV if persisted."""
+        self.frames[path] = frame
+        if self.persisted(path):
+            with span('write'):
+                os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+                frame.to_csv(path, index=False)
+
+    def read(self, path, usecols=None, dtype=None, **read_csv_args):
+        """
+        Returns a table as a DataFrame: the in-memory frame (a copy of the
+        requested columns, converted to dtype, empty strings missing like in a
+        parsed CSV) or the CSV read with pd.read_csv.
+        Raises FileNotFoundError if the table is neither in memory nor on disk.
+        """
+        with span('read'):
+            return self._read(path, usecols, dtype, **read_csv_args)
+
+    def _read(self, path, usecols=None, dtype=None, **read_csv_args):
+        import pandas as pd
+        if path not in self.frames:
+            return pd.read_csv(path, usecols=usecols, dtype=dtype, **read_csv_args)
+        frame = self.frames[path]
+        frame = frame[list(usecols)] if usecols is not None else frame.copy()
+        for column in frame.columns:
+            if pd.api.types.is_string_dtype(frame[column].dtype):
+                # Like read_csv: empty fields are missing values
+                frame[column] = frame[column].mask(frame[column] == '')
+        if dtype is None:
+            return frame
+        dtypes = dtype if isinstance(dtype, dict) else {column: dtype for column in frame.columns}
+        for column, column_dtype in dtypes.items():
+            if column in frame.columns:
+                frame[column] = _convert(frame[column], column_dtype)
+        return frame
+
+    def rows(self, path, columns=None):
+        """
+        Returns a table as a list of dicts of strings, exactly like
+        csv.DictReader over its CSV (missing values are '').
+        Raises FileNotFoundError if the table is neither in memory nor on disk.
+        """
+        with span('read'):
+            return self._rows(path, columns)
+
+    def _rows(self, path, columns=None):
+        if path not in self.frames:
+            csv.field_size_limit(2**31 - 1)  # Summaries can exceed the default field limit
+            with open(path, 'r', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+            if columns is not None:
+                rows = [{column: row[column] for column in columns} for row in rows]
+            return rows
+        frame = self.frames[path]
+        columns = list(columns) if columns is not None else list(frame.columns)
+        values = [[('' if missing else str(value)) for value, missing in
+                   zip(frame[column].tolist(), frame[column].isna().tolist())] for column in columns]
+        return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _convert(series, dtype):
+    """Converts an in-memory column like read_csv(dtype=...) would parse it."""
+    if dtype in (str, 'str'):
+        # Missing values stay missing instead of becoming the string 'nan'
+        return series.astype(str).where(series.notna())
+    return series.astype(dtype)
@@ -0,0 +1,144 @@
+import re
+import unicodedata
+
+# =====================================================================================
+# Module: Relevance of CrossRef hits
+# Date: October 2026
+#
+# Description:
+# 04_fetch_project_publications.py searches CrossRef by project title and keeps only the
+# hits that are relevant to the project. Every (project, hit) candidate pair gets a
+# relevance score in [0, 1]:
+#     relevance = TITLE_WEIGHT * title similarity + FUNDER_WEIGHT * funder match
+# - title similarity: Dice coefficient 2|A & B| / (|A| + |B|) of the normalised token
+#   sets of the project title and the hit title (Unicode NFKC, case-folded, markup such
+#   as <i> removed, stopwords and one-character tokens dropped)
+# - funder match: 1 if a funder named in the hit's CrossRef metadata is one of the
+#   project's funders (by normalised name), else 0
+#
+# The token sets of all titles are stored as a sparse 0/1 matrix with one row per text
+# (and the funder names likewise), so the shared tokens of all pairs are one vectorised
+# row-wise product per batch of pairs instead of a Python set operation per pair. The
+# titles themselves are split at whitespace as one joined string, and only the distinct
+# pieces are normalised and tokenised, so millions of pairs are scored in seconds.
+# =====================================================================================
+
+TITLE_WEIGHT = 0.8
+FUNDER_WEIGHT = 0.2
+BATCH_SIZE = 1_000_000   # Candidate pairs scored per vectorised batch
+
+SEPARATOR = '\x01'     # Between the joined texts in token_matrix (not a word or space character)
+# Markup in CrossRef titles, e.g. <i>in vivo</i>, <sub>2</sub> or <jats:p xml:lang="en">.
+# Only tag-shaped text (a name and name=value attributes): in "x<y and z>w" the
+# brackets are plain text and the words between them are kept.
+MARKUP = re.compile(r'</?[A-Za-z][\w:.-]*(?:\s+[\w:.-]+\s*=\s*(?:"[^"<>\x01]*"|\'[^\'<>\x01]*\'|[^\s<>\x01]+))*\s*/?>')
+TOKEN = re.compile(r'\w+')
+
+# Frequent English words that say nothing about the topic of a title
+STOPWORDS = frozenset("""
+    a about above after against all also among an and any are as at be been before being between both but by
+    can could do does during each for from further had has have having how in into is it its itself more most
+    new no nor not of off on once only or other our out over own same should so some such than that the their
+    them then there these they this those through to too towards toward under until up upon using via was we
+    were what when where which while who whom why will with within without would
+""".split())
+
+
+def normalise_name(name):
+    """Normalised funder name: Unicode NFKC, case-folded, whitespace collapsed."""
+    return ' '.join(unicodedata.normalize('NFKC', name).casefold().split())
+
+def token_matrix(texts):
+    """
+    Normalised token sets of texts (None or NaN = no tokens) as a sparse 0/1 matrix
+    with one row per text and one column per distinct token.
+    """
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    # All distinct texts are joined into one string and split at whitespace into pieces
+    # such as "(in" or "state-of-the-art". The separators between the texts are pieces
+    # of their own and give every piece its row.
+    text_rows, distinct = pd.factorize(pd.Series(texts, dtype=object))
+    is_text = np.array([isinstance(text, str) for text in distinct], dtype=bool)
+    distinct = [text if valid else '' for text, valid in zip(distinct, is_text)]
+    glue = f' {SEPARATOR} '
+    joined = glue.join(distinct)
+    if joined.count(SEPARATOR) != max(len(distinct) - 1, 0):    # A text contains the separator itself
+        joined = glue.join(text.replace(SEPARATOR, ' ') for text in distinct)
+    piece_codes, pieces = pd.factorize(np.array(MARKUP.sub(' ', joined).split(), dtype=object))
+    separators = np.flatnonzero(pieces == SEPARATOR)
+    piece_rows = np.cumsum(piece_codes == (separators[0] if len(separators) else -1))
+    text_pieces = sparse.csr_matrix((np.ones(len(piece_codes), dtype=np.int32), (piece_rows, piece_codes)),
+                                    shape=(len(distinct), len(pieces)))
+
+    # Only the distinct pieces are normalised and tokenised: far fewer calls than tokens
+    piece_tokens = [[token for token in TOKEN.findall(unicodedata.normalize('NFKC', piece).casefold())
+                     if len(token) > 1 and token not in STOPWORDS] for piece in pieces]
+    token_codes, tokens = pd.factorize(pd.Series([token for found in piece_tokens for token in found], dtype=object))
+    piece_matrix = sparse.csr_matrix((np.ones(len(token_codes), dtype=np.int32), token_codes,
+                                      np.cumsum([0] + [len(found) for found in piece_tokens])),
+                                     shape=(len(pieces), len(tokens)))
+
+    # Tokens of a text: those of its pieces, each counted once
+    distinct_matrix = (text_pieces @ piece_matrix).tocsr()
+    distinct_matrix.data[:] = 1
+
+    # Rows of the texts; missing texts (-1) get an empty row
+    empty = sparse.csr_matrix((1, len(tokens)), dtype=np.int32)
+    return sparse.vstack([distinct_matrix, empty], format='csr')[np.where(text_rows < 0, len(distinct), text_rows)]
+
+def name_matrix(name_lists):
+    """Sets of normalised names (one list per row) as a sparse 0/1 matrix."""
+    import numpy as np
+    import pandas as pd
+    from scipy import sparse
+
+    # Normalise every distinct name once
+    lengths = [len(names) for names in name_lists]
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    codes, names = pd.factorize(pd.Series([name for names in name_lists for name in names], dtype=object))
+    names_codes, normalised = pd.factorize(pd.Series(
+        [normalise_name(name) if isinstance(name, str) else None for name in names], dtype=object))
+    rows, columns = rows[codes >= 0], names_codes[codes[codes >= 0]]
+    valid = columns >= 0    # Not a name (None, NaN)
+    matrix = sparse.csr_matrix((np.ones(int(valid.sum()), dtype=np.int32), (rows[valid], columns[valid])),
+                               shape=(len(lengths), len(normalised)))
+    matrix.sum_duplicates()
+    matrix.data[:] = 1
+    return matrix
+
+
+def shared_tokens(matrix, left_rows, right_rows):
+    """Number of tokens shared by the rows left_rows[i] and right_rows[i], for all i."""
+    import numpy as np
+    return np.asarray(matrix[left_rows].multiply(matrix[right_rows]).sum(axis=1)).ravel()
+
+def relevance_scores(project_titles, project_funders, hit_projects, hit_titles, hit_funders,
+                     title_weight=TITLE_WEIGHT, funder_weight=FUNDER_WEIGHT, batch_size=BATCH_SIZE):
+    """
+    Scores candidate hits against their projects.
+    - project_titles, project_funders: title and list of funder names of every project
+    - hit_projects: index (into the project lists) of the project of every hit
+    - hit_titles, hit_funders: title and list of funder names of every hit
+    Returns an array with the relevance of every hit.
+    """
+    import numpy as np
+
+    title_matrix = token_matrix(list(project_titles) + list(hit_titles))
+    funder_matrix = name_matrix(list(project_funders) + list(hit_funders))
+    title_sizes = np.diff(title_matrix.indptr)
+
+    # Rows: projects first, then the hits in order
+    left_rows = np.asarray(hit_projects, dtype=np.int64)
+    right_rows = np.arange(len(project_titles), len(project_titles) + len(left_rows), dtype=np.int64)
+    scores = np.zeros(len(left_rows))
+    for start in range(0, len(left_rows), batch_size):
+        left, right = left_rows[start:start + batch_size], right_rows[start:start + batch_size]
+        shared = shared_tokens(title_matrix, left, right)
+        total = title_sizes[left] + title_sizes[right]
+        similarity = np.divide(2 * shared, total, out=np.zeros(len(total)), where=total > 0)
+        funded = shared_tokens(funder_matrix, left, right) > 0
+        scores[start:start + batch_size] = title_weight * similarity + funder_weight * funded
+    return scores
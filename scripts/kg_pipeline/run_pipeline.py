@@ -0,0 +1,105 @@
+import importlib
+import sys
+import time
+from instrumentation import instrumented_run, profile_modes
+from pipeline_tables import PipelineTables
+
+# =====================================================================================
+# Script: In-process Pipeline Runner
+# Date: October 2026
+#
+# Description:
+# Runs the pipeline stages one after the other in a single Python process. The stages
+# hand their tables on in memory (see pipeline_tables.py): e.g. projects.csv is built
+# by 02 and read by 04, 05, 07, 09 and 06 as the same DataFrame, without writing and
+# parsing the CSV in between, and the interpreter and its imports start only once.
+#
+# Every stage is a module with a run(tables) function and still works on its own:
+#     python scripts/kg_pipeline/05_import_to_neo4j.py
+#
+# Usage (from the repository root):
+#     python scripts/kg_pipeline/run_pipeline.py            # all stages
+#     python scripts/kg_pipeline/run_pipeline.py 07 08 05   # only these stages, in order
+#     python scripts/kg_pipeline/run_pipeline.py --profile  # with cProfile and tracemalloc
+#     python scripts/kg_pipeline/run_pipeline.py --profile=cprofile
+#
+# The whole run gets one run report (see instrumentation.py) with every stage as a span,
+# e.g. "05_import_to_neo4j/transaction".
+#
+# Tables not built in the run (e.g. projects.csv when starting at 04) are read from
+# the CSVs of an earlier run.
+#
+# NOTE:
+# - PERSIST_TABLES restricts which tables are written to CSV. Tables that are not
+#   persisted only exist during the run, so later standalone runs of single stages
+#   cannot read them.
+# - The dashboard reads its source tables from the CSVs (and checks their signatures),
+#   so if 06 runs, they must be persisted.
+# =====================================================================================
+
+# -------------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------------
+
+# Stage modules in run order (the stage numbers are the file names, not the run order:
+# 07 and 08 build tables that 05 imports)
+STAGES = [
+    '01_format_openaire_json',
+    '02_extract_projects_to_csv',
+    '03_enrich_funders_with_ror',
+    '04_fetch_project_publications',
+    '07_build_keyword_cooccurrence',
+    '08_build_funder_collaboration',
+    '05_import_to_neo4j',
+    '06_build_dashboard_aggregates',
+    '09_export_graph_snapshot',
+]
+
+# CSV paths of the tables written to disk, None = all tables. Example, keeping only
+# what the dashboard and a later standalone 05 need:
+#     PERSIST_TABLES = {'data/projects_data_csv/projects.csv', ...}
+PERSIST_TABLES = None
+
+
+def select_stages(prefixes):
+    """Returns the stages whose number is in prefixes (all stages if empty)."""
+    if not prefixes:
+        return list(STAGES)
+    unknown = [prefix for prefix in prefixes if not any(stage.startswith(prefix + '_') for stage in STAGES)]
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+    return [stage for stage in STAGES if stage.split('_', 1)[0] in prefixes]
+
+def check_persistence(stages, persist=PERSIST_TABLES):
+    """Raises ValueError if the dashboard would read tables that are not persisted."""
+    if persist is None or '06_build_dashboard_aggregates' not in stages:
+        return
+    from dashboard_aggregates import SOURCE_FILES
+    missing = sorted(path for name, path in SOURCE_FILES.items() if name != 'sample' and path not in persist)
+    if missing:
+        raise ValueError(f"The dashboard reads these tables from disk, add them to PERSIST_TABLES: {', '.join(missing)}")
+
+def run_pipeline(stages=STAGES, persist=PERSIST_TABLES, profile=None):
+    """
+    Runs the stages in order with one shared PipelineTables. profile: set of
+    profilers (see instrumentation.py), default from KG_PROFILE.
+    """
+    check_persistence(stages, persist)
+    tables = PipelineTables(persist=persist)
+    started = time.perf_counter()
+    with instrumented_run('run_pipeline', profile=profile):
+        for stage in stages:
+            print(f"\n▶️ {stage}")
+            stage_started = time.perf_counter()
+            importlib.import_module(stage).run(tables)
+            print(f"⏱️ {stage}: {time.perf_counter() - stage_started:.1f}s")
+        print(f"\n✅ Pipeline done in {time.perf_counter() - started:.1f}s ({len(stages)} stages)")
+    return tables
+
+
+if __name__ == "__main__":
+    # --profile (all profilers) or --profile=cprofile,tracemalloc; the rest are stage numbers
+    profile_args = [arg for arg in sys.argv[1:] if arg.startswith('--profile')]
+    stage_args = [arg for arg in sys.argv[1:] if not arg.startswith('--profile')]
+    profile = profile_modes(profile_args[-1].partition('=')[2] or 'all') if profile_args else None
+    run_pipeline(select_stages(stage_args), profile=profile)
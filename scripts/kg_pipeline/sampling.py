@@ -0,0 +1,141 @@
+import csv
+import os
+import random
+
+# =====================================================================================
+# Module: Consistent project sampling for development runs
+# Date: October 2026
+#
+# Description:
+# Selects one set of project IDs and writes it to a manifest (sample_project_ids.csv,
+# with the project key and ID of every sampled project, see surrogate_keys.py).
+# Every later stage reads the same manifest and restricts its work to that slice:
+# - 04 only searches publications for sampled projects
+# - 05 only imports sampled projects, their funders, countries and publications
+# - the dashboard only shows sampled projects
+# So relationships never point at projects that were not imported.
+#
+# The manifest is written by 02_extract_projects_to_csv.py. After changing the
+# configuration below, it can be rebuilt from the existing CSVs without re-running
+# the extraction:
+#     python scripts/kg_pipeline/sampling.py
+#
+# Sampling is off by default (all options None): the manifest is removed and all stages
+# use all projects. Set e.g. SAMPLE_SIZE = 10000 for faster development runs.
+# =====================================================================================
+
+# -------------------------------------------------------------------------------------
+# Configuration
+# -------------------------------------------------------------------------------------
+SAMPLE_SIZE = None       # Number of projects to keep, e.g. 10000, None = no size limit
+SAMPLE_SEED = None       # Integer seed for a random sample, None = first projects in file order
+SAMPLE_YEARS = None      # (first, last) start year, e.g. (2015, 2020), None = all years
+SAMPLE_FUNDERS = None    # List of funder names, e.g. ["European Commission"], None = all funders
+
+SAMPLE_IDS_CSV = 'data/projects_data_csv/sample_project_ids.csv'
+PROJECTS_CSV = 'data/projects_data_csv/projects.csv'
+FUNDERS_CSV = 'data/projects_data_csv/funders.csv'
+FUNDERS_REL_CSV = 'data/projects_data_csv/project_funder_rel.csv'
+
+
+def sampling_enabled():
+    return any(option is not None for option in (SAMPLE_SIZE, SAMPLE_YEARS, SAMPLE_FUNDERS))
+
+def select_project_ids(projects, project_funders):
+    """
+    Selects the sampled project IDs.
+
+    Arguments:
+    - projects: iterable of (project_id, startDate) pairs in file order
+    - project_funders: iterable of (project_id, funder_name) pairs
+
+    Filters by start year and funder first, then draws SAMPLE_SIZE projects
+    (randomly if SAMPLE_SEED is set). The IDs are returned in file order.
+    """
+    candidates = []
+    for pid, start_date in projects:
+        if SAMPLE_YEARS is not None:
+            year = str(start_date or '')[:4]
+            if not year.isdigit() or not SAMPLE_YEARS[0] <= int(year) <= SAMPLE_YEARS[1]:
+                continue
+        candidates.append(pid)
+
+    if SAMPLE_FUNDERS is not None:
+        wanted = set(SAMPLE_FUNDERS)
+        funded = {pid for pid, funder_name in project_funders if funder_name in wanted}
+        candidates = [pid for pid in candidates if pid in funded]
+
+    if SAMPLE_SIZE is not None and len(candidates) > SAMPLE_SIZE:
+        if SAMPLE_SEED is None:
+            candidates = candidates[:SAMPLE_SIZE]
+        else:
+            chosen = set(random.Random(SAMPLE_SEED).sample(candidates, SAMPLE_SIZE))
+            candidates = [pid for pid in candidates if pid in chosen]
+
+    return candidates
+
+def write_sample_ids(project_ids, project_keys, path=SAMPLE_IDS_CSV):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['project_key', 'project_id'])
+        writer.writerows([project_keys[pid], pid] for pid in project_ids)
+
+def remove_sample_ids(path=SAMPLE_IDS_CSV):
+    if os.path.exists(path):
+        os.remove(path)
+
+def load_sample_ids(path=SAMPLE_IDS_CSV):
+    """
+    Returns the set of sampled project IDs, or None if no sample is active
+    (no manifest), in which case all projects should be used.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return {row['project_id'] for row in csv.DictReader(f)}
+
+def load_sample_keys(path=SAMPLE_IDS_CSV):
+    """
+    Returns the set of integer keys of the sampled projects, or None if no
+    sample is active.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return {int(row['project_key']) for row in csv.DictReader(f)}
+
+def update_sample(projects, project_funders, path=SAMPLE_IDS_CSV):
+    """
+    Writes the manifest for the current configuration (or removes it if
+    sampling is disabled). Returns the sampled IDs, or None.
+    The project keys are the positions of the distinct IDs in projects, like in 02.
+    """
+    if not sampling_enabled():
+        remove_sample_ids(path)
+        return None
+    projects = list(projects)
+    project_keys = {}
+    for pid, _ in projects:
+        project_keys.setdefault(pid, len(project_keys))
+    project_ids = select_project_ids(projects, project_funders)
+    write_sample_ids(project_ids, project_keys, path)
+    return project_ids
+
+
+if __name__ == "__main__":
+    # Rebuild the manifest from the CSVs written by 02
+    with open(PROJECTS_CSV, 'r', encoding='utf-8') as f:
+        rows = [(row['key'], row['id'], row['startDate']) for row in csv.DictReader(f)]
+    projects = [(pid, start_date) for _, pid, start_date in rows]
+    project_ids = {key: pid for key, pid, _ in rows}
+    with open(FUNDERS_CSV, 'r', encoding='utf-8') as f:
+        funder_names = {row['key']: row['name'] for row in csv.DictReader(f)}
+    with open(FUNDERS_REL_CSV, 'r', encoding='utf-8') as f:
+        project_funders = [(project_ids[row['project_key']], funder_names[row['funder_key']])
+                           for row in csv.DictReader(f)]
+
+    sample = update_sample(projects, project_funders)
+    if sample is None:
+        print("Sampling disabled: all projects are used.")
+    else:
+        print(f"Sampled {len(sample)} of {len(projects)} projects into {SAMPLE_IDS_CSV}")
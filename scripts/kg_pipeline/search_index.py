@@ -0,0 +1,203 @@
+import csv
+import hashlib
+import re
+import sqlite3
+import sys
+import time
+
+# =====================================================================================
+# Module: Full-text search over projects
+# Date: October 2026
+#
+# Description:
+# Keeps an on-disk inverted index of the title, summary and keywords of every project
+# in SQLite (FTS5, part of Python's sqlite3). Lookups use the index instead of scanning
+# all projects, rank the hits with BM25 and support phrase and prefix queries:
+#     climate adaptation      both words, anywhere in title, summary or keywords
+#     "sea level rise"        the exact phrase
+#     quantum comput*         words starting with "comput"
+#
+# The index is updated by 02_extract_projects_to_csv.py while it writes projects.csv.
+# Updates are incremental: a content hash per project is stored next to the index,
+# unchanged projects are skipped, changed ones re-indexed and vanished ones removed.
+#
+# Python API: search_projects(query). Command line:
+#     python scripts/kg_pipeline/search_index.py              (update from projects.csv)
+#     python scripts/kg_pipeline/search_index.py "query"      (search)
+# =====================================================================================
+
+SEARCH_INDEX_FILE = 'data/projects_data_csv/search_index.sqlite'
+PROJECTS_CSV = 'data/projects_data_csv/projects.csv'
+
+# Relevance weights of the indexed columns in the BM25 ranking
+TITLE_WEIGHT = 10.0
+SUMMARY_WEIGHT = 1.0
+KEYWORDS_WEIGHT = 5.0
+
+SCHEMA = [
+    # Indexed text; the FTS rowid is the document number of the project
+    "CREATE VIRTUAL TABLE IF NOT EXISTS project_text USING fts5("
+    "title, summary, keywords, tokenize = 'unicode61 remove_diacritics 2')",
+    # Project ID and content hash per document; generation = last update that saw it
+    "CREATE TABLE IF NOT EXISTS documents ("
+    "doc INTEGER PRIMARY KEY, project_id TEXT NOT NULL UNIQUE, fingerprint TEXT NOT NULL, "
+    "generation INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value)",
+]
+
+
+def open_search_index(path=SEARCH_INDEX_FILE, read_only=False):
+    """Opens (and for writing creates) the index database."""
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    con = sqlite3.connect(path)
+    for statement in SCHEMA:
+        con.execute(statement)
+    return con
+
+def fingerprint(title, summary, keywords):
+    return hashlib.sha1('\x1f'.join((title, summary, keywords)).encode('utf-8')).hexdigest()
+
+
+# -------------------------------------------------------------------------------------
+# Indexing
+# -------------------------------------------------------------------------------------
+
+class SearchIndexUpdate:
+    """
+    One incremental update of the index with a full snapshot of the projects.
+    Call add() for every project, then finish(): projects that were not added
+    again are removed from the index.
+    """
+
+    def __init__(self, path=SEARCH_INDEX_FILE, batch_size=5000):
+        self.con = open_search_index(path)
+        self.batch_size = batch_size
+        self.batch = []
+        self.counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0}
+        row = self.con.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        self.generation = (row[0] if row else 0) + 1
+
+    def add(self, project_id, title, summary, keywords):
+        self.batch.append((project_id, title or '', summary or '', keywords or ''))
+        if len(self.batch) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self.batch:
+            return
+        ids = list({row[0] for row in self.batch})
+        known = {}
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            known.update((project_id, (doc, stored)) for project_id, doc, stored in self.con.execute(
+                f"SELECT project_id, doc, fingerprint FROM documents WHERE project_id IN ({','.join('?' * len(chunk))})",
+                chunk))
+
+        with self.con:
+            for project_id, title, summary, keywords in self.batch:
+                current = fingerprint(title, summary, keywords)
+                doc, stored = known.get(project_id, (None, None))
+                if doc is None:
+                    doc = self.con.execute("INSERT INTO documents (project_id, fingerprint, generation) VALUES (?, ?, ?)",
+                                           (project_id, current, self.generation)).lastrowid
+                    self.counts['added'] += 1
+                elif stored == current:
+                    self.con.execute("UPDATE documents SET generation = ? WHERE doc = ?", (self.generation, doc))
+                    self.counts['unchanged'] += 1
+                    continue
+                else:
+                    self.con.execute("DELETE FROM project_text WHERE rowid = ?", (doc,))
+                    self.con.execute("UPDATE documents SET fingerprint = ?, generation = ? WHERE doc = ?",
+                                     (current, self.generation, doc))
+                    self.counts['updated'] += 1
+                self.con.execute("INSERT INTO project_text (rowid, title, summary, keywords) VALUES (?, ?, ?, ?)",
+                                 (doc, title, summary, keywords))
+                known[project_id] = (doc, current)
+        self.batch = []
+
+    def finish(self):
+        """Removes projects that were not added in this update. Returns the counts."""
+        self._flush()
+        with self.con:
+            self.counts['removed'] = self.con.execute(
+                "SELECT count(*) FROM documents WHERE generation < ?", (self.generation,)).fetchone()[0]
+            self.con.execute("DELETE FROM project_text WHERE rowid IN "
+                             "(SELECT doc FROM documents WHERE generation < ?)", (self.generation,))
+            self.con.execute("DELETE FROM documents WHERE generation < ?", (self.generation,))
+            self.con.execute("INSERT OR REPLACE INTO meta VALUES ('generation', ?)", (self.generation,))
+        if self.counts['added'] or self.counts['updated'] or self.counts['removed']:
+            # Merge the index segments written by this update for faster lookups
+            self.con.execute("INSERT INTO project_text (project_text) VALUES ('optimize')")
+            self.con.commit()
+        self.con.close()
+        return self.counts
+
+def index_projects_csv(csv_file=PROJECTS_CSV, path=SEARCH_INDEX_FILE):
+    """Updates the index from projects.csv. Returns the counts."""
+    update = SearchIndexUpdate(path)
+    csv.field_size_limit(2**31 - 1)  # Summaries can exceed the default field limit
+    with open(csv_file, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            update.add(row['id'], row['title'], row['summary'], row['keywords'])
+    return update.finish()
+
+
+# -------------------------------------------------------------------------------------
+# Search
+# -------------------------------------------------------------------------------------
+
+def match_expression(query):
+    """
+    Translates a user query into an FTS5 MATCH expression: every word or
+    "quoted phrase" must occur, a trailing * matches prefixes. Returns None for
+    an empty query. FTS5 operators in the input are searched as plain words.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]*)"|(\S+)', query):
+        text = phrase if phrase else word
+        prefix = not phrase and text.endswith('*')
+        text = text.rstrip('*') if prefix else text
+        if not re.search(r'\w', text):
+            continue
+        terms.append('"' + text.replace('"', '""') + '"' + ('*' if prefix else ''))
+    return ' '.join(terms) or None
+
+def search_projects(query, limit=20, path=SEARCH_INDEX_FILE, con=None):
+    """
+    Returns up to `limit` projects matching the query, best first, as dicts with
+    project_id, title, snippet (matches marked with **) and score (higher = better).
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    own_connection = con is None
+    con = con or open_search_index(path, read_only=True)
+    try:
+        rows = con.execute(f"""
+            SELECT d.project_id,
+                   highlight(project_text, 0, '**', '**'),
+                   snippet(project_text, 1, '**', '**', '…', 16),
+                   bm25(project_text, {TITLE_WEIGHT}, {SUMMARY_WEIGHT}, {KEYWORDS_WEIGHT}) AS rank
+            FROM project_text JOIN documents d ON d.doc = project_text.rowid
+            WHERE project_text MATCH ?
+            ORDER BY rank LIMIT ?
+        """, (expression, limit)).fetchall()
+    finally:
+        if own_connection:
+            con.close()
+    # bm25() is lower for better matches
+    return [{'project_id': project_id, 'title': title, 'snippet': snippet, 'score': -rank}
+            for project_id, title, snippet, rank in rows]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        started = time.perf_counter()
+        results = search_projects(' '.join(sys.argv[1:]))
+        for result in results:
+            print(f"{result['score']:7.2f}  {result['project_id']}  {result['title']}")
+        print(f"🔎 {len(results)} results in {(time.perf_counter() - started) * 1000:.1f} ms")
+    else:
+        counts = index_projects_csv()
+        print(f"🔎 Search index updated: {counts} ({SEARCH_INDEX_FILE})")
@@ -0,0 +1,65 @@
+# =====================================================================================
+# Module: Integer surrogate keys for the pipeline tables
+# Date: October 2026
+#
+# Description:
+# Every project, funder, country, publication and keyword gets a dense integer key
+# (0, 1, 2, ...) in the order it is first seen. The entity tables are the dictionaries:
+# their first column "key" maps the key to the natural ID (projects.csv: key -> id,
+# funders.csv: key -> name, countries.csv: key -> jurisdiction,
+# project_publications.csv: key -> doi, keywords.csv: key -> keyword).
+#
+# The relation tables only hold integer pairs, e.g. project_funder_rel.csv has the
+# columns project_key, funder_key. Joins, group-bys and the graph export compare
+# integers; the natural IDs are looked up by position in the dictionary.
+#
+# Keys are assigned per extraction run: they are stable for the same input, but not
+# across different dumps. The Knowledge Graph is therefore still keyed by the natural
+# IDs, which 05_import_to_neo4j.py decodes from the keys.
+# =====================================================================================
+
+
+class KeyDictionary:
+    """Interns values: every distinct value gets the next integer key."""
+
+    def __init__(self):
+        self.keys = {}
+        self.values = []
+
+    def key(self, value):
+        key = self.keys.get(value)
+        if key is None:
+            key = self.keys[value] = len(self.values)
+            self.values.append(value)
+        return key
+
+    def __contains__(self, value):
+        return value in self.keys
+
+    def __len__(self):
+        return len(self.values)
+
+
+def dictionary_list(rows, field):
+    """
+    Collects the natural IDs of the rows of a dictionary table (dicts with
+    'key' and field, e.g. from csv.DictReader) as a list indexed by key
+    (None for keys that are not in the table).
+    """
+    values = {int(row['key']): row[field] for row in rows}
+    dictionary = [None] * (max(values) + 1 if values else 0)
+    for key, value in values.items():
+        dictionary[key] = value
+    return dictionary
+
+def key_lookup(keys, size=None):
+    """
+    Returns an array mapping every key to its position in `keys`, or -1 for keys
+    not in it. Used to renumber a subset of keys (e.g. the sampled projects) densely.
+    """
+    import numpy as np
+    keys = np.asarray(keys, dtype=np.int64)
+    size = max(size or 0, keys.max() + 1 if len(keys) else 0)
+    lookup = np.full(size, -1, dtype=np.int64)
+    lookup[keys] = np.arange(len(keys))
+    return lookup
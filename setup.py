@@ -69,7 +69,13 @@ def check_required_files():
         "scripts/kg_pipeline/02_extract_projects_to_csv.py", 
         "scripts/kg_pipeline/03_enrich_funders_with_ror.py",
         "scripts/kg_pipeline/04_fetch_project_publications.py",
-        "scripts/kg_pipeline/05_import_to_neo4j.py"
+        "scripts/kg_pipeline/05_import_to_neo4j.py",
+        "scripts/kg_pipeline/06_build_dashboard_aggregates.py",
+        "scripts/kg_pipeline/07_build_keyword_cooccurrence.py",
+        "scripts/kg_pipeline/08_build_funder_collaboration.py",
+        "scripts/kg_pipeline/09_export_graph_snapshot.py",
+        "scripts/kg_pipeline/10_refresh_citation_counts.py",
+        "scripts/kg_pipeline/run_pipeline.py"
     ]
     
     print("\nChecking pipeline scripts...")